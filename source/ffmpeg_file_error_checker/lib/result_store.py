@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    plugins.result_store.py
+
+    Written by:               Josh.5 <jsunnex@gmail.com>
+    Date:                     19 Oct 2026, (2:40 PM)
+
+    Copyright:
+        Copyright (C) 2021 Josh Sunnex
+
+        This program is free software: you can redistribute it and/or modify it under the terms of the GNU General
+        Public License as published by the Free Software Foundation, version 3.
+
+        This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+        implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+        for more details.
+
+        You should have received a copy of the GNU General Public License along with this program.
+        If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import hashlib
+import logging
+import mmap
+import os
+
+from peewee import *
+from playhouse.sqliteq import SqliteQueueDatabase
+from unmanic.libs.singleton import SingletonType
+
+# Configure plugin logger
+logger = logging.getLogger("Unmanic.Plugin.ffmpeg_file_error_checker")
+
+db = DatabaseProxy()
+
+
+class BaseModel(Model):
+    """
+    BaseModel
+
+    Generic configuration and methods used across all Model classes
+    """
+
+    class Meta:
+        database = db
+
+
+class TestedFile(BaseModel):
+    """
+    TestedFile
+
+    The test results of a single file.
+    The file size and modification time are stored so that a modified file is not treated as tested.
+    The content fingerprint allows the record to follow the file when it is moved or renamed.
+    """
+    abspath = TextField(null=False, unique=True)
+    fingerprint = CharField(null=True, index=True)
+    file_size = IntegerField(null=False, default=0)
+    file_mtime = FloatField(null=False, default=0)
+    last_tested = IntegerField(null=True)
+    last_full_decode = IntegerField(null=True)
+    sample_run_index = IntegerField(null=False, default=0)
+    next_due = IntegerField(null=True, index=True)
+
+
+def get_file_stat(path):
+    """
+    Return the size and modification time of a file, or (None, None) if it does not exist
+
+    :param path:
+    :return:
+    """
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None, None
+    return file_stat.st_size, file_stat.st_mtime
+
+
+def get_file_fingerprint(path, file_size=None, block_size=65536):
+    """
+    Generate a fast fingerprint of a file's contents.
+
+    The fingerprint is a hash of the file size and of fixed blocks read from the head, middle and tail of the file.
+    Each block is read through a small mmap window, so the cost is the same regardless of the size of the file.
+    Returns None if the file cannot be read.
+
+    :param path:
+    :param file_size:
+    :param block_size:
+    :return:
+    """
+    try:
+        if file_size is None:
+            file_size = os.path.getsize(path)
+        file_hash = hashlib.md5(str(file_size).encode('utf-8'))
+        if file_size == 0:
+            return file_hash.hexdigest()
+        block_size = min(block_size, file_size)
+        offsets = sorted({0, (file_size - block_size) // 2, file_size - block_size})
+        with open(path, 'rb') as f:
+            for offset in offsets:
+                # mmap offsets must be a multiple of the allocation granularity
+                window_offset = offset - (offset % mmap.ALLOCATIONGRANULARITY)
+                window_length = min(block_size + (offset - window_offset), file_size - window_offset)
+                with mmap.mmap(f.fileno(), window_length, access=mmap.ACCESS_READ, offset=window_offset) as window:
+                    file_hash.update(window[offset - window_offset:offset - window_offset + block_size])
+    except (OSError, ValueError) as e:
+        logger.debug("Unable to generate fingerprint for file '{}' - {}".format(path, e))
+        return None
+    return file_hash.hexdigest()
+
+
+class ResultStore(object, metaclass=SingletonType):
+    """
+    ResultStore
+
+    A central store of file test results kept in the plugin profile directory.
+    """
+
+    def __init__(self, profile_directory):
+        db_file = os.path.abspath(os.path.join(profile_directory, 'test_results.db'))
+
+        # Create the schema with a direct connection. Writes on the queue database are asynchronous
+        logger.debug("Ensuring file test results database schema exists")
+        schema_db = SqliteDatabase(db_file)
+        with schema_db.bind_ctx([TestedFile]):
+            schema_db.create_tables([TestedFile], safe=True)
+        schema_db.close()
+
+        db.initialize(SqliteQueueDatabase(
+            db_file,
+            use_gevent=False,
+            autostart=True,
+            queue_max_size=None,
+            results_timeout=15.0,
+        ))
+
+    def get_record(self, path):
+        """
+        Fetch the test record for a file.
+        Returns None if the file has no record or if it has been modified since it was last tested.
+
+        If the path has no matching record, the file's content fingerprint is used to find a record created
+        for the same file at another path (or before its modification time changed without a content change).
+        The record is then carried over to this path.
+
+        :param path:
+        :return:
+        """
+        file_size, file_mtime = get_file_stat(path)
+        if file_size is None:
+            return None
+        record = TestedFile.get_or_none(TestedFile.abspath == path)
+        if record is not None and record.file_size == file_size and record.file_mtime == file_mtime:
+            return record
+        return self.__carry_over_record(path, file_size, file_mtime)
+
+    def __carry_over_record(self, path, file_size, file_mtime):
+        """
+        Find a record with the same content fingerprint as the file at the given path and attach it to that path.
+        If the record's original file has been moved, the record is moved with it.
+        If the original file still exists (the file was copied), the test results are copied to a new record.
+
+        :param path:
+        :param file_size:
+        :param file_mtime:
+        :return:
+        """
+        fingerprint = get_file_fingerprint(path, file_size=file_size)
+        if fingerprint is None:
+            return None
+        query = TestedFile.select().where((TestedFile.fingerprint == fingerprint) & (TestedFile.file_size == file_size))
+        query = query.order_by(TestedFile.last_tested.desc(nulls='LAST'))
+        candidates = list(query)
+        if not candidates:
+            return None
+
+        # Prefer a record of this path or one whose file no longer exists at the original path
+        record = None
+        for candidate in candidates:
+            if candidate.abspath == path or not os.path.exists(candidate.abspath):
+                record = candidate
+                break
+
+        if record is not None:
+            if record.abspath != path:
+                logger.debug("Moving test record of '{}' to '{}'".format(record.abspath, path))
+                TestedFile.delete().where((TestedFile.abspath == path) & (TestedFile.id != record.id)).execute()
+            TestedFile.update(abspath=path, file_mtime=file_mtime).where(TestedFile.id == record.id).execute()
+            record.abspath = path
+            record.file_mtime = file_mtime
+            return record
+
+        source = candidates[0]
+        logger.debug("Copying test record of '{}' to '{}'".format(source.abspath, path))
+        self.record_tests([
+            {
+                'abspath':          path,
+                'fingerprint':      fingerprint,
+                'last_tested':      source.last_tested,
+                'last_full_decode': source.last_full_decode,
+                'sample_run_index': source.sample_run_index,
+                'next_due':         source.next_due,
+            }
+        ])
+        return TestedFile(
+            abspath=path,
+            fingerprint=fingerprint,
+            file_size=file_size,
+            file_mtime=file_mtime,
+            last_tested=source.last_tested,
+            last_full_decode=source.last_full_decode,
+            sample_run_index=source.sample_run_index,
+            next_due=source.next_due,
+        )
+
+    def has_record(self, path):
+        """
+        Check if any record exists for a file (including records for files that have since been modified)
+
+        :param path:
+        :return:
+        """
+        return TestedFile.select(TestedFile.id).where(TestedFile.abspath == path).exists()
+
+    def import_record(self, path, last_tested=None, last_full_decode=None, sample_run_index=0, next_due=None):
+        """
+        Add a single record for a file (used for importing previous test results)
+
+        :param path:
+        :param last_tested:
+        :param last_full_decode:
+        :param sample_run_index:
+        :param next_due:
+        :return:
+        """
+        self.record_tests([
+            {
+                'abspath':          path,
+                'last_tested':      last_tested,
+                'last_full_decode': last_full_decode,
+                'sample_run_index': sample_run_index,
+                'next_due':         next_due,
+            }
+        ])
+
+    def record_tests(self, results):
+        """
+        Insert or update the test records of a batch of files in a single statement.
+        Each item in the results list is a dictionary of TestedFile fields including the 'abspath'.
+        The file size and modification time are read from disk.
+        The content fingerprint is generated unless it is provided in the result.
+
+        :param results:
+        :return:
+        """
+        rows = []
+        for result in results:
+            file_size, file_mtime = get_file_stat(result.get('abspath'))
+            if file_size is None:
+                continue
+            fingerprint = result.get('fingerprint')
+            if fingerprint is None:
+                fingerprint = get_file_fingerprint(result.get('abspath'), file_size=file_size)
+            rows.append({
+                'abspath':          result.get('abspath'),
+                'fingerprint':      fingerprint,
+                'file_size':        file_size,
+                'file_mtime':       file_mtime,
+                'last_tested':      result.get('last_tested'),
+                'last_full_decode': result.get('last_full_decode'),
+                'sample_run_index': result.get('sample_run_index', 0),
+                'next_due':         result.get('next_due'),
+            })
+        if not rows:
+            return
+        TestedFile.insert_many(rows).on_conflict(
+            conflict_target=[TestedFile.abspath],
+            preserve=[
+                TestedFile.fingerprint,
+                TestedFile.file_size,
+                TestedFile.file_mtime,
+                TestedFile.last_tested,
+                TestedFile.last_full_decode,
+                TestedFile.sample_run_index,
+                TestedFile.next_due,
+            ],
+        ).execute()
+
+    def set_sample_run_index(self, path, run_index):
+        """
+        Set the sampled check run index of a file, adding a record for the file if required
+
+        :param path:
+        :param run_index:
+        :return:
+        """
+        file_size, file_mtime = get_file_stat(path)
+        if file_size is None:
+            return
+        TestedFile.insert(
+            abspath=path,
+            fingerprint=get_file_fingerprint(path, file_size=file_size),
+            file_size=file_size,
+            file_mtime=file_mtime,
+            sample_run_index=run_index,
+        ).on_conflict(
+            conflict_target=[TestedFile.abspath],
+            update={TestedFile.sample_run_index: run_index},
+        ).execute()
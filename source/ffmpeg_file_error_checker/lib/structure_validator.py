@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    plugins.structure_validator.py
+
+    Written by:               Josh.5 <jsunnex@gmail.com>
+    Date:                     19 Oct 2026, (4:15 PM)
+
+    Copyright:
+        Copyright (C) 2021 Josh Sunnex
+
+        This program is free software: you can redistribute it and/or modify it under the terms of the GNU General
+        Public License as published by the Free Software Foundation, version 3.
+
+        This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+        implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+        for more details.
+
+        You should have received a copy of the GNU General Public License along with this program.
+        If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import bisect
+import itertools
+import mmap
+import os
+import struct
+import zlib
+
+# Matroska/WebM element IDs
+EBML_HEADER = 0x1A45DFA3
+EBML_VOID = 0xEC
+EBML_CRC32 = 0xBF
+MKV_SEGMENT = 0x18538067
+MKV_SEEK_HEAD = 0x114D9B74
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_TRACKS = 0x1654AE6B
+MKV_CUES = 0x1C53BB6B
+MKV_CHAPTERS = 0x1043A770
+MKV_TAGS = 0x1254C367
+MKV_ATTACHMENTS = 0x1941A469
+MKV_CLUSTER = 0x1F43B675
+MKV_CLUSTER_TIMECODE = 0xE7
+
+MKV_SEGMENT_CHILDREN = (
+    MKV_SEEK_HEAD,
+    MKV_INFO,
+    MKV_TRACKS,
+    MKV_CUES,
+    MKV_CHAPTERS,
+    MKV_TAGS,
+    MKV_ATTACHMENTS,
+    MKV_CLUSTER,
+)
+
+# MP4 boxes that only contain other boxes
+MP4_CONTAINER_BOXES = (
+    b'moov',
+    b'trak',
+    b'mdia',
+    b'minf',
+    b'stbl',
+    b'edts',
+    b'dinf',
+    b'mvex',
+    b'moof',
+    b'traf',
+)
+MP4_TOP_LEVEL_BOXES = (
+    b'ftyp',
+    b'moov',
+    b'mdat',
+    b'free',
+    b'skip',
+    b'wide',
+    b'pnot',
+    b'uuid',
+)
+
+
+class StructureError(Exception):
+    """
+    A structural error that prevents the rest of the current element from being read
+    """
+
+    def __init__(self, offset, message):
+        super(StructureError, self).__init__(message)
+        self.offset = offset
+        self.message = message
+
+
+class MatroskaValidator(object):
+    """
+    MatroskaValidator
+
+    Walks the EBML element tree of a Matroska/WebM file without decoding any frames.
+    Checks that element sizes fit within their parents and the file, that cluster timecodes do not go
+    backwards and that any CRC-32 elements match the data they cover.
+    """
+
+    def __init__(self, data, file_size):
+        self.data = data
+        self.file_size = file_size
+        self.issues = []
+        self.timecode_scale = 1000000
+        self.last_cluster_timecode = None
+
+    def __seconds(self, timecode):
+        return (timecode * self.timecode_scale) / 1000000000.0
+
+    def __add_issue(self, offset, message):
+        if self.last_cluster_timecode is not None:
+            message = "{} (after {:.2f}s)".format(message, self.__seconds(self.last_cluster_timecode))
+        self.issues.append("Offset {}: {}".format(offset, message))
+
+    def __read_vint(self, pos, end, keep_marker=False):
+        """
+        Read an EBML variable length integer.
+        Returns a tuple of (value, length, unknown) where 'unknown' is True if all value bits are set.
+
+        :param pos:
+        :param end:
+        :param keep_marker:
+        :return:
+        """
+        if pos >= end:
+            raise StructureError(pos, "Unexpected end of data")
+        first = self.data[pos]
+        if first == 0:
+            raise StructureError(pos, "Invalid variable length integer")
+        length = 9 - first.bit_length()
+        if pos + length > end:
+            raise StructureError(pos, "Variable length integer extends past the end of the data")
+        value = int.from_bytes(self.data[pos:pos + length], 'big')
+        if keep_marker:
+            return value, length, False
+        mask = (1 << (7 * length)) - 1
+        value &= mask
+        return value, length, value == mask
+
+    def __read_element_header(self, pos, end):
+        """
+        Returns a tuple of (element_id, data_start, data_size) where 'data_size' is None for unknown sized elements
+
+        :param pos:
+        :param end:
+        :return:
+        """
+        element_id, id_length, _ = self.__read_vint(pos, end, keep_marker=True)
+        if id_length > 4:
+            raise StructureError(pos, "Invalid element ID")
+        data_size, size_length, unknown = self.__read_vint(pos + id_length, end)
+        if size_length > 8:
+            raise StructureError(pos, "Invalid element size")
+        return element_id, pos + id_length + size_length, None if unknown else data_size
+
+    def __read_uint(self, start, size):
+        return int.from_bytes(self.data[start:start + size], 'big')
+
+    def __check_crc(self, element_id, data_start, data_end):
+        """
+        If the first child of a master element is a CRC-32 element, check it against the rest of the element data
+
+        :param element_id:
+        :param data_start:
+        :param data_end:
+        :return:
+        """
+        if data_start >= data_end or self.data[data_start] != EBML_CRC32:
+            return
+        child_id, crc_start, crc_size = self.__read_element_header(data_start, data_end)
+        if crc_size != 4:
+            self.__add_issue(data_start, "Invalid CRC-32 element in element 0x{:X}".format(element_id))
+            return
+        expected = int.from_bytes(self.data[crc_start:crc_start + 4], 'little')
+        actual = zlib.crc32(memoryview(self.data)[crc_start + 4:data_end]) & 0xFFFFFFFF
+        if expected != actual:
+            self.__add_issue(data_start, "CRC-32 mismatch in element 0x{:X}".format(element_id))
+
+    def __resync(self, pos, end):
+        """
+        Find the next cluster after a corrupt region so that the rest of the file can still be checked
+
+        :param pos:
+        :param end:
+        :return:
+        """
+        found = self.data.find(MKV_CLUSTER.to_bytes(4, 'big'), pos + 1, end)
+        return end if found < 0 else found
+
+    def __walk_info(self, data_start, data_end):
+        pos = data_start
+        while pos < data_end:
+            element_id, child_start, child_size = self.__read_element_header(pos, data_end)
+            if child_size is None or child_start + child_size > data_end:
+                raise StructureError(pos, "Element 0x{:X} extends past the end of the segment info".format(element_id))
+            if element_id == MKV_TIMECODE_SCALE and child_size:
+                self.timecode_scale = self.__read_uint(child_start, child_size)
+            pos = child_start + child_size
+
+    def __walk_cluster(self, pos, data_start, data_size, parent_end):
+        """
+        Walk the children of a cluster. Returns the end offset of the cluster.
+
+        :param pos:
+        :param data_start:
+        :param data_size:
+        :param parent_end:
+        :return:
+        """
+        data_end = parent_end if data_size is None else data_start + data_size
+        child_pos = data_start
+        while child_pos < data_end:
+            element_id, child_start, child_size = self.__read_element_header(child_pos, data_end)
+            if data_size is None and element_id in MKV_SEGMENT_CHILDREN:
+                # An unknown sized cluster ends at the start of the next segment level element
+                data_end = child_pos
+                break
+            if child_size is None or child_start + child_size > data_end:
+                raise StructureError(child_pos, "Block extends past the end of the cluster")
+            if element_id == MKV_CLUSTER_TIMECODE:
+                timecode = self.__read_uint(child_start, child_size)
+                if self.last_cluster_timecode is not None and timecode < self.last_cluster_timecode:
+                    self.__add_issue(child_pos, "Cluster timecode {:.2f}s goes backwards".format(
+                        self.__seconds(timecode)))
+                self.last_cluster_timecode = timecode
+            child_pos = child_start + child_size
+        if data_size is not None:
+            self.__check_crc(MKV_CLUSTER, data_start, data_end)
+        return data_end
+
+    def __walk_segment(self, data_start, data_end):
+        pos = data_start
+        while pos < data_end:
+            try:
+                element_id, child_start, child_size = self.__read_element_header(pos, data_end)
+                if child_size is not None and child_start + child_size > data_end:
+                    if child_start + child_size > self.file_size:
+                        self.__add_issue(pos, "Element 0x{:X} extends past the end of the file".format(element_id))
+                        if element_id == MKV_CLUSTER:
+                            # Check what remains of the truncated cluster. The final block is expected to be cut off
+                            try:
+                                self.__walk_cluster(pos, child_start, None, data_end)
+                            except StructureError:
+                                pass
+                        return
+                    raise StructureError(pos, "Element 0x{:X} extends past the end of the segment".format(element_id))
+                if element_id == MKV_CLUSTER:
+                    pos = self.__walk_cluster(pos, child_start, child_size, data_end)
+                    continue
+                if child_size is None:
+                    raise StructureError(pos, "Element 0x{:X} has an unknown size".format(element_id))
+                child_end = child_start + child_size
+                if element_id == MKV_INFO:
+                    self.__walk_info(child_start, child_end)
+                if element_id in MKV_SEGMENT_CHILDREN:
+                    self.__check_crc(element_id, child_start, child_end)
+                pos = child_end
+            except StructureError as e:
+                self.__add_issue(e.offset, e.message)
+                pos = self.__resync(e.offset, data_end)
+
+    def validate(self):
+        pos = 0
+        while pos < self.file_size:
+            try:
+                element_id, data_start, data_size = self.__read_element_header(pos, self.file_size)
+            except StructureError as e:
+                self.__add_issue(e.offset, e.message)
+                break
+            data_end = self.file_size if data_size is None else data_start + data_size
+            if element_id == MKV_SEGMENT:
+                if data_end > self.file_size:
+                    self.__add_issue(pos, "Segment extends past the end of the file by {} bytes".format(
+                        data_end - self.file_size))
+                    data_end = self.file_size
+                self.__walk_segment(data_start, data_end)
+            elif element_id not in (EBML_HEADER, EBML_VOID):
+                self.__add_issue(pos, "Unexpected top level element 0x{:X}".format(element_id))
+                break
+            elif data_end > self.file_size:
+                self.__add_issue(pos, "Element 0x{:X} extends past the end of the file".format(element_id))
+                break
+            pos = data_end
+        return self.issues
+
+
+class Mp4Validator(object):
+    """
+    Mp4Validator
+
+    Walks the box tree of an MP4/MOV file without decoding any frames.
+    Checks that box sizes fit within their parents and the file and that the chunks referenced by each
+    track's sample tables lie within the media data.
+    """
+
+    def __init__(self, data, file_size):
+        self.data = data
+        self.file_size = file_size
+        self.issues = []
+        self.tracks = []
+        self.mdat_ranges = []
+        self.found_moov = False
+        self.fragmented = False
+
+    def __add_issue(self, offset, message):
+        self.issues.append("Offset {}: {}".format(offset, message))
+
+    def __read_table(self, box_type, pos, data_start, data_end, entry_format):
+        """
+        Read the entries of a full box table that starts with an entry count
+
+        :param box_type:
+        :param pos:
+        :param data_start:
+        :param data_end:
+        :param entry_format:
+        :return:
+        """
+        entry_count = struct.unpack_from('>I', self.data, data_start + 4)[0]
+        entry_size = struct.calcsize('>' + entry_format)
+        if data_start + 8 + entry_count * entry_size > data_end:
+            self.__add_issue(pos, "'{}' table is larger than its box".format(box_type.decode('latin-1')))
+            return None
+        return struct.unpack_from('>' + (entry_format * entry_count), self.data, data_start + 8)
+
+    def __parse_table_box(self, box_type, pos, data_start, data_end):
+        track = self.tracks[-1] if self.tracks else None
+        if track is None or data_end - data_start < 8:
+            return
+        if box_type == b'mdhd':
+            version = self.data[data_start]
+            offset = data_start + (20 if version == 1 else 12)
+            if offset + 4 <= data_end:
+                track['timescale'] = struct.unpack_from('>I', self.data, offset)[0]
+        elif box_type == b'stsz':
+            if data_end - data_start < 12:
+                self.__add_issue(pos, "'stsz' box is too small")
+                return
+            sample_size, sample_count = struct.unpack_from('>II', self.data, data_start + 4)
+            if sample_size:
+                track['sample_sizes'] = (sample_size,) * sample_count
+            elif data_start + 12 + sample_count * 4 > data_end:
+                self.__add_issue(pos, "'stsz' table is larger than its box")
+            else:
+                track['sample_sizes'] = struct.unpack_from('>{}I'.format(sample_count), self.data, data_start + 12)
+        elif box_type == b'stco':
+            track['chunk_offsets'] = self.__read_table(box_type, pos, data_start, data_end, 'I')
+        elif box_type == b'co64':
+            track['chunk_offsets'] = self.__read_table(box_type, pos, data_start, data_end, 'Q')
+        elif box_type == b'stsc':
+            track['sample_to_chunk'] = self.__read_table(box_type, pos, data_start, data_end, 'III')
+        elif box_type == b'stts':
+            track['time_to_sample'] = self.__read_table(box_type, pos, data_start, data_end, 'II')
+
+    def __walk_boxes(self, start, end, depth=0):
+        pos = start
+        while pos < end:
+            if end - pos < 8:
+                self.__add_issue(pos, "{} trailing bytes are too small to be a box".format(end - pos))
+                return
+            box_size, box_type = struct.unpack_from('>I4s', self.data, pos)
+            header_size = 8
+            if box_size == 1:
+                if end - pos < 16:
+                    self.__add_issue(pos, "Box '{}' has a truncated header".format(box_type.decode('latin-1')))
+                    return
+                box_size = struct.unpack_from('>Q', self.data, pos + 8)[0]
+                header_size = 16
+            elif box_size == 0:
+                box_size = end - pos
+            if box_size < header_size:
+                self.__add_issue(pos, "Box '{}' has an invalid size {}".format(box_type.decode('latin-1'), box_size))
+                return
+            if depth == 0 and box_type not in MP4_TOP_LEVEL_BOXES and box_type not in (b'moof', b'mfra', b'sidx',
+                                                                                       b'styp', b'meta'):
+                self.__add_issue(pos, "Unexpected top level box '{}'".format(box_type.decode('latin-1')))
+            box_end = pos + box_size
+            if box_end > end:
+                if box_end > self.file_size:
+                    self.__add_issue(pos, "Box '{}' extends past the end of the file by {} bytes".format(
+                        box_type.decode('latin-1'), box_end - self.file_size))
+                    # Keep the media data that is present so that the chunk checks report the time of the truncation
+                    if box_type == b'mdat':
+                        self.mdat_ranges.append((pos + header_size, min(box_end, self.file_size)))
+                else:
+                    self.__add_issue(pos, "Box '{}' extends past the end of its parent".format(
+                        box_type.decode('latin-1')))
+                return
+            data_start = pos + header_size
+            if box_type == b'moov':
+                self.found_moov = True
+            elif box_type == b'mdat':
+                self.mdat_ranges.append((data_start, box_end))
+            elif box_type == b'moof':
+                self.fragmented = True
+            if box_type == b'trak':
+                self.tracks.append({'offset': pos})
+            if box_type in MP4_CONTAINER_BOXES:
+                self.__walk_boxes(data_start, box_end, depth + 1)
+            elif box_type in (b'mdhd', b'stsz', b'stco', b'co64', b'stsc', b'stts'):
+                self.__parse_table_box(box_type, pos, data_start, box_end)
+            pos = box_end
+
+    @staticmethod
+    def __sample_time(track, sample_index):
+        """
+        Return the time in seconds of a sample using the track's time to sample table
+
+        :param track:
+        :param sample_index:
+        :return:
+        """
+        time_to_sample = track.get('time_to_sample') or ()
+        timescale = track.get('timescale') or 1
+        elapsed = 0
+        remaining = sample_index
+        for i in range(0, len(time_to_sample), 2):
+            sample_count, sample_delta = time_to_sample[i], time_to_sample[i + 1]
+            if remaining < sample_count:
+                return (elapsed + remaining * sample_delta) / float(timescale)
+            elapsed += sample_count * sample_delta
+            remaining -= sample_count
+        return elapsed / float(timescale)
+
+    def __check_track_chunks(self, track_number, track):
+        """
+        Check that every chunk referenced by a track's sample tables lies within the media data
+
+        :param track_number:
+        :param track:
+        :return:
+        """
+        sample_sizes = track.get('sample_sizes')
+        chunk_offsets = track.get('chunk_offsets')
+        sample_to_chunk = track.get('sample_to_chunk')
+        if not sample_sizes or chunk_offsets is None or sample_to_chunk is None:
+            return
+        # Running totals of the sample sizes make the size of any run of samples a single subtraction
+        size_totals = [0] + list(itertools.accumulate(sample_sizes))
+        mdat_starts = [start for start, end in self.mdat_ranges]
+
+        sample_index = 0
+        chunk_count = len(chunk_offsets)
+        for entry in range(0, len(sample_to_chunk), 3):
+            first_chunk, samples_per_chunk = sample_to_chunk[entry], sample_to_chunk[entry + 1]
+            if entry + 3 < len(sample_to_chunk):
+                last_chunk = sample_to_chunk[entry + 3] - 1
+            else:
+                last_chunk = chunk_count
+            for chunk in range(first_chunk, last_chunk + 1):
+                if chunk < 1 or chunk > chunk_count:
+                    self.__add_issue(track['offset'], "Track {} references chunk {} of {}".format(
+                        track_number, chunk, chunk_count))
+                    return
+                if sample_index + samples_per_chunk > len(sample_sizes):
+                    self.__add_issue(track['offset'], "Track {} references more samples than it contains".format(
+                        track_number))
+                    return
+                chunk_start = chunk_offsets[chunk - 1]
+                chunk_end = chunk_start + size_totals[sample_index + samples_per_chunk] - size_totals[sample_index]
+                mdat = bisect.bisect_right(mdat_starts, chunk_start) - 1
+                if mdat < 0 or chunk_end > self.mdat_ranges[mdat][1]:
+                    reason = "past the end of the file" if chunk_end > self.file_size else "outside of the media data"
+                    self.__add_issue(chunk_start, "Track {} data at {:.2f}s is {}".format(
+                        track_number, self.__sample_time(track, sample_index), reason))
+                    return
+                sample_index += samples_per_chunk
+
+    def validate(self):
+        self.__walk_boxes(0, self.file_size)
+        if not self.found_moov:
+            self.__add_issue(0, "No 'moov' box found")
+            return self.issues
+        if not self.fragmented:
+            for track_number, track in enumerate(self.tracks, start=1):
+                self.__check_track_chunks(track_number, track)
+        return self.issues
+
+
+def validate_file_structure(path):
+    """
+    Validate the container structure of a Matroska/WebM or MP4/MOV file without decoding it.
+
+    Returns a list of issues found, or None if the container format is not supported.
+
+    :param path:
+    :return:
+    """
+    file_size = os.path.getsize(path)
+    if file_size == 0:
+        return ["The file is empty"]
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:4] == EBML_HEADER.to_bytes(4, 'big'):
+                validator = MatroskaValidator(data, file_size)
+            elif data[4:8] in MP4_TOP_LEVEL_BOXES:
+                validator = Mp4Validator(data, file_size)
+            else:
+                return None
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                data.madvise(mmap.MADV_SEQUENTIAL)
+            return validator.validate()
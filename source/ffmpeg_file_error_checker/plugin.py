@@ -22,8 +22,15 @@
 
 """
 
+import concurrent.futures
+import hashlib
+import json
 import logging
+import math
 import os
+import random
+import re
+import subprocess
 import time
 from configparser import NoSectionError, NoOptionError
 
@@ -33,9 +40,14 @@ from unmanic.libs.directoryinfo import UnmanicDirectoryInfo
 
 # Configure plugin logger
 from ffmpeg_file_error_checker.lib.ffmpeg import StreamMapper, Probe, Parser
+from ffmpeg_file_error_checker.lib.structure_validator import validate_file_structure
+from ffmpeg_file_error_checker.lib.result_store import ResultStore, get_file_fingerprint
 
 logger = logging.getLogger("Unmanic.Plugin.ffmpeg_file_error_checker")
 
+# The task data store key of the check level that the worker ran for a task
+TASK_CHECK_LEVEL_KEY = 'ffmpeg_file_error_checker.check_level'
+
 
 class Settings(PluginSettings):
     settings = {
@@ -44,6 +56,19 @@ class Settings(PluginSettings):
         "retest_files":          False,
         "test_frequency":        '4 weeks',
         "always_run":            True,
+        "check_level":           'full',
+        "full_decode_frequency": '26 weeks',
+        "escalate_on_anomalies": True,
+        "sample_windows":        8,
+        "sample_window_length":  60,
+        "sample_concurrency":    4,
+        "generate_previews":     False,
+        "preview_interval":      10,
+        "preview_width":         160,
+        "sprite_columns":        10,
+        "sprite_rows":           10,
+        "detect_truncation":     True,
+        "validate_structure":    True,
     }
 
     def __init__(self, *args, **kwargs):
@@ -82,6 +107,49 @@ class Settings(PluginSettings):
             "always_run":            {
                 "label": "Always run this plugin against video files, even if that file was added to the task list by another plugin?",
             },
+            "check_level":           {
+                "label":          "Check level",
+                "input_type":     "select",
+                "select_options": [
+                    {
+                        'value': "container",
+                        'label': "Container - Only check the container structure (seconds)",
+                    },
+                    {
+                        'value': "packet",
+                        'label': "Packet - Read and check every packet without decoding (minutes)",
+                    },
+                    {
+                        'value': "sampled",
+                        'label': "Sampled - Decode a rotating selection of segments across the file",
+                    },
+                    {
+                        'value': "full",
+                        'label': "Full - Decode every frame (slowest)",
+                    },
+                ],
+            },
+            "full_decode_frequency": self.__set_full_decode_frequency_form_settings(),
+            "escalate_on_anomalies": self.__set_escalate_on_anomalies_form_settings(),
+            "sample_windows":        self.__set_sample_windows_form_settings(),
+            "sample_window_length":  self.__set_sample_window_length_form_settings(),
+            "sample_concurrency":    self.__set_sample_concurrency_form_settings(),
+            "generate_previews":     {
+                "label":       "Generate preview images during a full decode",
+                "description": "Writes a poster image and thumbnail sprite sheets from the frames decoded by the full decode check.",
+            },
+            "preview_interval":      self.__set_preview_interval_form_settings(),
+            "preview_width":         self.__set_preview_width_form_settings(),
+            "sprite_columns":        self.__set_sprite_columns_form_settings(),
+            "sprite_rows":           self.__set_sprite_rows_form_settings(),
+            "detect_truncation":     {
+                "label":       "Check for truncated files during library scans",
+                "description": "Reads only the end of each file to detect partially copied or downloaded files.",
+            },
+            "validate_structure":    {
+                "label":       "Validate the container structure before running any FFmpeg checks",
+                "description": "Walks the MKV/WebM elements or MP4 boxes of the file without decoding. Runs at disk speed.",
+            },
         }
 
     def __set_test_frequency_form_settings(self):
@@ -92,6 +160,126 @@ class Settings(PluginSettings):
             values["display"] = 'hidden'
         return values
 
+    def __set_full_decode_frequency_form_settings(self):
+        values = {
+            "label":       "Full decode frequency",
+            "description": "When using a faster check level, a full decode is still run on this slower schedule.",
+        }
+        if self.get_setting('check_level') == 'full':
+            values["display"] = 'hidden'
+        return values
+
+    def __set_escalate_on_anomalies_form_settings(self):
+        values = {
+            "label": "Run a full decode if the faster check level finds any anomalies",
+        }
+        if self.get_setting('check_level') == 'full':
+            values["display"] = 'hidden'
+        return values
+
+    def __set_sample_windows_form_settings(self):
+        values = {
+            "label":          "Number of segments to decode on each check",
+            "sub_setting":    True,
+            "input_type":     "slider",
+            "slider_options": {
+                "min": 1,
+                "max": 32,
+            },
+        }
+        if self.get_setting('check_level') != 'sampled':
+            values["display"] = 'hidden'
+        return values
+
+    def __set_sample_window_length_form_settings(self):
+        values = {
+            "label":          "Length of each segment",
+            "sub_setting":    True,
+            "input_type":     "slider",
+            "slider_options": {
+                "min":    10,
+                "max":    600,
+                "step":   10,
+                "suffix": "s"
+            },
+        }
+        if self.get_setting('check_level') != 'sampled':
+            values["display"] = 'hidden'
+        return values
+
+    def __set_sample_concurrency_form_settings(self):
+        values = {
+            "label":          "Number of segments to decode at the same time",
+            "sub_setting":    True,
+            "input_type":     "slider",
+            "slider_options": {
+                "min": 1,
+                "max": 16,
+            },
+        }
+        if self.get_setting('check_level') != 'sampled':
+            values["display"] = 'hidden'
+        return values
+
+    def __set_preview_interval_form_settings(self):
+        values = {
+            "label":          "Seconds between sprite thumbnails",
+            "sub_setting":    True,
+            "input_type":     "slider",
+            "slider_options": {
+                "min":    1,
+                "max":    60,
+                "suffix": "s"
+            },
+        }
+        if not self.get_setting('generate_previews'):
+            values["display"] = 'hidden'
+        return values
+
+    def __set_preview_width_form_settings(self):
+        values = {
+            "label":          "Sprite thumbnail width",
+            "sub_setting":    True,
+            "input_type":     "slider",
+            "slider_options": {
+                "min":    80,
+                "max":    480,
+                "step":   16,
+                "suffix": "px"
+            },
+        }
+        if not self.get_setting('generate_previews'):
+            values["display"] = 'hidden'
+        return values
+
+    def __set_sprite_columns_form_settings(self):
+        values = {
+            "label":          "Thumbnail columns per sprite sheet",
+            "sub_setting":    True,
+            "input_type":     "slider",
+            "slider_options": {
+                "min": 1,
+                "max": 20,
+            },
+        }
+        if not self.get_setting('generate_previews'):
+            values["display"] = 'hidden'
+        return values
+
+    def __set_sprite_rows_form_settings(self):
+        values = {
+            "label":          "Thumbnail rows per sprite sheet",
+            "sub_setting":    True,
+            "input_type":     "slider",
+            "slider_options": {
+                "min": 1,
+                "max": 20,
+            },
+        }
+        if not self.get_setting('generate_previews'):
+            values["display"] = 'hidden'
+        return values
+
 
 class PluginStreamMapper(StreamMapper):
 
@@ -184,26 +372,553 @@ class PluginStreamMapper(StreamMapper):
         }
         self.set_ffmpeg_advanced_options(**advanced_kwargs)
 
+    def generate_packet_test_args(self, settings):
+        """
+        Read every packet of every stream without decoding
 
-def needs_testing(path, settings):
+        ffmpeg -hide_banner -loglevel error -xerror -err_detect crccheck+bitstream+buffer -i "${1}" -map 0 -c copy -f null -
+
+        :param settings:
+        :return:
+        """
+        generic_args = [
+            "-xerror",
+        ]
+        generic_kwargs = {
+            "-loglevel":   "error",
+            "-err_detect": "crccheck+bitstream+buffer",
+        }
+        self.set_ffmpeg_generic_options(*generic_args, **generic_kwargs)
+
+        advanced_kwargs = {
+            '-max_muxing_queue_size': str(settings.get_setting('max_muxing_queue_size')),
+            '-map':                   '0',
+            '-c':                     'copy',
+        }
+        self.set_ffmpeg_advanced_options(**advanced_kwargs)
+
+    def generate_sample_test_args(self, settings, start_time, duration):
+        """
+        Decode a single segment of the file.
+        Input seeking without accurate seek starts decoding from the keyframe before the start time.
+
+        ffmpeg -hide_banner -loglevel error -xerror -noaccurate_seek -ss 600 -t 60 -i "${1}" -f null -
+
+        :param settings:
+        :param start_time:
+        :param duration:
+        :return:
+        """
+        generic_args = [
+            "-xerror",
+            "-noaccurate_seek",
+        ]
+        generic_kwargs = {
+            "-loglevel": "error",
+            "-ss":       str(int(start_time)),
+            "-t":        str(int(duration)),
+        }
+        self.set_ffmpeg_generic_options(*generic_args, **generic_kwargs)
+
+        # Check if we are using a VAAPI encoder also...
+        if settings.get_setting('decoding_type') == 'vaapi':
+            self.generate_vaapi_decoding_args()
+        elif settings.get_setting('decoding_type') == 'nvdec':
+            self.generate_nvdec_decoding_args()
+
+        advanced_kwargs = {
+            '-max_muxing_queue_size': str(settings.get_setting('max_muxing_queue_size'))
+        }
+        self.set_ffmpeg_advanced_options(**advanced_kwargs)
+
+    @staticmethod
+    def generate_preview_output_args(settings, preview_directory, duration, download_format=None):
+        """
+        Generate the args for additional outputs that write preview images from the frames of the full decode.
+        These are appended to the command after the null output so that a single decode serves both.
+
+        ffmpeg ... -f null - \
+            -map 0:v:0 -an -sn -vf fps=1/10,scale=160:-2,tile=10x10 -q:v 5 -y previews/sprite_%03d.jpg \
+            -map 0:v:0 -an -sn -ss 60 -vf scale=640:-2 -frames:v 1 -q:v 3 -y previews/poster.jpg
+
+        :param settings:
+        :param preview_directory:
+        :param duration:
+        :param download_format: The pixel format to download VAAPI frames as (see get_vaapi_download_format)
+        :return:
+        """
+        # Frames decoded with VAAPI remain in GPU memory unless they are downloaded
+        download_filter = ''
+        if settings.get_setting('decoding_type') == 'vaapi':
+            download_filter = 'hwdownload,format={},'.format(download_format)
+
+        sprite_filter = "{}fps=1/{},scale={}:-2,tile={}x{}".format(
+            download_filter,
+            int(settings.get_setting('preview_interval')),
+            int(settings.get_setting('preview_width')),
+            int(settings.get_setting('sprite_columns')),
+            int(settings.get_setting('sprite_rows')),
+        )
+        args = [
+            '-map', '0:v:0', '-an', '-sn',
+            '-vf', sprite_filter,
+            '-q:v', '5',
+            '-y', os.path.join(preview_directory, 'sprite_%03d.jpg'),
+        ]
+
+        # Take the poster from 10% into the file to skip past any intro or black frames
+        poster_time = int(duration * 0.1) if duration else 0
+        args += [
+            '-map', '0:v:0', '-an', '-sn',
+            '-ss', str(poster_time),
+            '-vf', "{}scale=640:-2".format(download_filter),
+            '-frames:v', '1',
+            '-q:v', '3',
+            '-y', os.path.join(preview_directory, 'poster.jpg'),
+        ]
+        return args
+
+
+def prepare_preview_directory(abspath, duration, settings):
     """
-    Ensure this file does not need to be added due to frequent retesting
+    Create an empty directory for the preview images of a file and write a manifest describing the sprite layout.
+    Previews are stored in the plugin profile directory under the file's content fingerprint,
+    so they remain valid when the file is moved or renamed.
+
+    Returns the path to the directory, or None if it could not be created.
+
+    :param abspath:
+    :param duration:
+    :param settings:
+    :return:
+    """
+    fingerprint = get_file_fingerprint(abspath)
+    if fingerprint is None:
+        return None
+    preview_directory = os.path.join(settings.get_profile_directory(), 'previews', fingerprint)
+    try:
+        os.makedirs(preview_directory, exist_ok=True)
+        # Remove sprite sheets from a previous run in case the settings now produce fewer of them
+        for file_name in os.listdir(preview_directory):
+            if file_name.startswith('sprite_') and file_name.endswith('.jpg'):
+                os.remove(os.path.join(preview_directory, file_name))
+        manifest = {
+            'source':         abspath,
+            'duration':       duration,
+            'interval':       int(settings.get_setting('preview_interval')),
+            'width':          int(settings.get_setting('preview_width')),
+            'columns':        int(settings.get_setting('sprite_columns')),
+            'rows':           int(settings.get_setting('sprite_rows')),
+            'sprite_pattern': 'sprite_%03d.jpg',
+            'poster':         'poster.jpg',
+        }
+        with open(os.path.join(preview_directory, 'previews.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+    except OSError as e:
+        logger.error("Unable to create preview directory '{}' - {}".format(preview_directory, e))
+        return None
+    return preview_directory
+
+
+def generate_container_test_command(abspath):
+    """
+    Read the container structure only
+
+    :param abspath:
+    :return:
+    """
+    return [
+        'ffprobe',
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-show_format',
+        '-show_streams',
+        abspath,
+    ]
+
+
+def generate_packet_test_command(abspath, settings):
+    mapper = PluginStreamMapper()
+    mapper.set_input_file(abspath)
+    mapper.set_output_null()
+    mapper.generate_packet_test_args(settings)
+    return ['ffmpeg'] + mapper.get_ffmpeg_args()
+
+
+def generate_tail_read_command(abspath, start_time):
+    """
+    Read the packets at the end of the file only
+
+    ffprobe -hide_banner -loglevel error -read_intervals 5390.0% -show_entries packet=pts_time,dts_time,duration_time,pos,size -of json "${1}"
+
+    :param abspath:
+    :param start_time:
+    :return:
+    """
+    return [
+        'ffprobe',
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-read_intervals', "{}%".format(start_time),
+        '-show_entries', 'packet=pts_time,dts_time,duration_time,pos,size',
+        '-of', 'json',
+        abspath,
+    ]
+
+
+def detect_truncation(abspath, probe, tail_seconds=10):
+    """
+    Check if a file has been truncated (partially copied or downloaded) by reading only the packets at its end.
+
+    The file is truncated if the last packet ends before the duration declared by the container,
+    if the container index points to packets beyond the end of the file, or if the tail could not be read cleanly.
+
+    Returns a tuple of (truncated, message). If the file duration is unknown, 'truncated' will be None.
+
+    :param abspath:
+    :param probe:
+    :param tail_seconds:
+    :return:
+    """
+    duration = get_file_duration(probe)
+    if duration <= 0:
+        return None, "Unable to determine the file duration"
+    try:
+        start_time = float(probe.get('format', {}).get('start_time', 0))
+    except (TypeError, ValueError):
+        start_time = 0.0
+    file_size = os.path.getsize(abspath)
+
+    command = generate_tail_read_command(abspath, start_time + max(0.0, duration - tail_seconds))
+    try:
+        pipe = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = pipe.communicate(timeout=30)
+    except subprocess.TimeoutExpired:
+        pipe.kill()
+        pipe.communicate()
+        return None, "Timed out reading the end of the file"
+    errors = err.decode("utf-8", errors='replace').strip()
+    if pipe.returncode != 0 or errors:
+        return True, "Errors reading the end of the file: {}".format(errors)
+
+    try:
+        packets = json.loads(out.decode("utf-8", errors='replace')).get('packets', [])
+    except ValueError:
+        return None, "Unable to parse the packets read from the end of the file"
+    if not packets:
+        return True, "No packets found in the last {} seconds of the declared duration {}s".format(tail_seconds,
+                                                                                                    duration)
+
+    last_packet_end = 0.0
+    last_byte = 0
+    for packet in packets:
+        timestamp = packet.get('pts_time', packet.get('dts_time'))
+        if timestamp not in (None, 'N/A'):
+            packet_duration = packet.get('duration_time')
+            packet_end = float(timestamp) + (float(packet_duration) if packet_duration not in (None, 'N/A') else 0)
+            last_packet_end = max(last_packet_end, packet_end)
+        if packet.get('pos') not in (None, 'N/A') and packet.get('size') not in (None, 'N/A'):
+            last_byte = max(last_byte, int(packet.get('pos')) + int(packet.get('size')))
+
+    if last_byte > file_size:
+        return True, "Packets are indexed up to byte {} but the file is only {} bytes".format(last_byte, file_size)
+    # Allow for the final packet durations not being reported and for streams that end slightly early
+    tolerance = max(2.0, duration * 0.005)
+    if last_packet_end and (last_packet_end - start_time) < (duration - tolerance):
+        return True, "Last packet ends at {:.2f}s but the declared duration is {:.2f}s".format(
+            last_packet_end - start_time, duration)
+    return False, ''
+
+
+def run_check_command(command):
+    """
+    Run a check command and return a tuple of (passed, output).
+    Any output at the 'error' log level or a non-zero exit code is treated as an anomaly.
+
+    :param command:
+    :return:
+    """
+    pipe = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = pipe.communicate()
+    output = err.decode("utf-8", errors='replace').strip()
+    return (pipe.returncode == 0 and not output), output
+
+
+def get_file_duration(probe):
+    """
+    Return the duration of the file in seconds from the probe data, or 0 if it is unknown
+
+    :param probe:
+    :return:
+    """
+    try:
+        return float(probe.get('format', {}).get('duration', 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def has_video_stream(probe):
+    """
+    Check if the probe data contains a video stream that is not an attached picture (cover art)
+
+    :param probe:
+    :return:
+    """
+    for stream_info in probe.get('streams', []):
+        if stream_info.get('codec_type') == 'video' and not stream_info.get('disposition', {}).get('attached_pic'):
+            return True
+    return False
+
+
+def get_vaapi_download_format(probe):
+    """
+    Return the software pixel format that VAAPI decoded frames of the first video stream are downloaded as.
+    Sources with more than 8 bits per component are decoded to 'p010' surfaces, all others to 'nv12'.
+    Returns None if the bit depth of the stream is not known.
+
+    :param probe:
+    :return:
+    """
+    for stream_info in probe.get('streams', []):
+        if stream_info.get('codec_type') != 'video':
+            continue
+        pix_fmt = stream_info.get('pix_fmt')
+        if pix_fmt:
+            # eg. 'yuv420p10le' or 'p010le'
+            match = re.search(r'p0?(\d{2})[lb]e$', pix_fmt)
+            bit_depth = int(match.group(1)) if match else 8
+        else:
+            try:
+                bit_depth = int(stream_info.get('bits_per_raw_sample'))
+            except (TypeError, ValueError):
+                return None
+        return 'p010' if bit_depth > 8 else 'nv12'
+    return None
+
+
+def select_sample_windows(path, duration, settings, run_index):
+    """
+    Select the start times of the segments to decode for this run.
+
+    The file is split into slots of the configured segment length. The slots are shuffled with a seed
+    derived from the file name, then each run takes the next block of slots in that order.
+    This rotates the coverage so that the whole file is decoded over successive runs.
 
     :param path:
+    :param duration:
     :param settings:
+    :param run_index:
     :return:
     """
-    directory_info = UnmanicDirectoryInfo(os.path.dirname(path))
+    window_length = int(settings.get_setting('sample_window_length'))
+    window_count = int(settings.get_setting('sample_windows'))
+    slot_count = max(1, int(math.ceil(duration / window_length)))
 
+    seed = int(hashlib.md5(os.path.basename(path).encode('utf-8')).hexdigest()[:8], 16)
+    slots = list(range(slot_count))
+    random.Random(seed).shuffle(slots)
+
+    first_slot = (run_index * window_count) % slot_count
+    selected_slots = [slots[(first_slot + i) % slot_count] for i in range(min(window_count, slot_count))]
+    return sorted([slot * window_length for slot in selected_slots])
+
+
+def read_directory_info_value(path, section):
+    """
+    Read a legacy per-directory info value for a file
+
+    :param path:
+    :param section:
+    :return:
+    """
+    directory_info = UnmanicDirectoryInfo(os.path.dirname(path))
     try:
-        previous_tested = directory_info.get('ffmpeg_file_error_checker', os.path.basename(path))
-    except NoSectionError as e:
-        previous_tested = ''
-    except NoOptionError as e:
-        previous_tested = ''
+        value = directory_info.get(section, os.path.basename(path))
+    except NoSectionError:
+        value = ''
+    except NoOptionError:
+        value = ''
     except Exception as e:
         logger.debug("Unknown exception {}.".format(e))
-        previous_tested = ''
+        value = ''
+    return value
+
+
+def get_test_record(path, settings):
+    """
+    Fetch the test record for a file from the test results store.
+
+    Previous versions of this plugin saved test times in the directory info files.
+    The first time a file is looked up, any of these previous test times are imported into the store.
+
+    :param path:
+    :param settings:
+    :return:
+    """
+    result_store = ResultStore(settings.get_profile_directory())
+    record = result_store.get_record(path)
+    if record is None and not result_store.has_record(path):
+        previous_tested = read_directory_info_value(path, 'ffmpeg_file_error_checker')
+        previous_full_decode = read_directory_info_value(path, 'ffmpeg_file_error_checker_full_decode')
+        previous_sample_run_index = read_directory_info_value(path, 'ffmpeg_file_error_checker_sampled')
+        result_store.import_record(
+            path,
+            last_tested=int(previous_tested) if previous_tested else None,
+            last_full_decode=int(previous_full_decode) if previous_full_decode else None,
+            sample_run_index=int(previous_sample_run_index) if previous_sample_run_index else 0,
+        )
+        record = result_store.get_record(path)
+    return record
+
+
+def run_sampled_check(abspath, probe, settings):
+    """
+    Decode a rotating selection of segments across the file concurrently and merge the results into one verdict.
+
+    Returns a tuple of (passed, output). If the file duration is unknown, 'passed' will be None.
+
+    :param abspath:
+    :param probe:
+    :param settings:
+    :return:
+    """
+    duration = get_file_duration(probe)
+    if duration <= 0:
+        return None, "Unable to determine the file duration"
+
+    record = get_test_record(abspath, settings)
+    run_index = record.sample_run_index if record else 0
+    window_length = int(settings.get_setting('sample_window_length'))
+    start_times = select_sample_windows(abspath, duration, settings, run_index)
+
+    def decode_window(start_time):
+        mapper = PluginStreamMapper()
+        mapper.set_input_file(abspath)
+        mapper.set_output_null()
+        mapper.generate_sample_test_args(settings, start_time, window_length)
+        return start_time, run_check_command(['ffmpeg'] + mapper.get_ffmpeg_args())
+
+    # Each segment is decoded in its own FFmpeg process
+    max_workers = max(1, int(settings.get_setting('sample_concurrency')))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(decode_window, start_times))
+
+    # Merge the results
+    passed = True
+    output = []
+    for start_time, (window_passed, window_output) in results:
+        if not window_passed:
+            passed = False
+            output.append("Segment at {}s: {}".format(start_time, window_output))
+
+    # Move on to the next block of segments for the next run
+    if passed:
+        ResultStore(settings.get_profile_directory()).set_sample_run_index(abspath, run_index + 1)
+    return passed, '\n'.join(output)
+
+
+def run_structure_check(abspath):
+    """
+    Validate the container structure of the file without decoding it.
+
+    Returns a tuple of (passed, output). If the container format is not supported, 'passed' will be None.
+
+    :param abspath:
+    :return:
+    """
+    try:
+        issues = validate_file_structure(abspath)
+    except (OSError, ValueError) as e:
+        return None, "Unable to read the file structure - {}".format(e)
+    if issues is None:
+        return None, "Container format is not supported"
+    return (not issues), '\n'.join(issues)
+
+
+def run_quick_check(abspath, settings):
+    """
+    Run the container or packet check level against a file.
+
+    Returns a tuple of (passed, output)
+
+    :param abspath:
+    :param settings:
+    :return:
+    """
+    if settings.get_setting('check_level') == 'container':
+        command = generate_container_test_command(abspath)
+    else:
+        command = generate_packet_test_command(abspath, settings)
+    return run_check_command(command)
+
+
+def full_decode_due(path, settings):
+    """
+    Check if the slower full decode schedule is due for this file
+
+    :param path:
+    :param settings:
+    :return:
+    """
+    if settings.get_setting('check_level') == 'full':
+        return True
+
+    record = get_test_record(path, settings)
+    if not record or not record.last_full_decode:
+        return True
+    full_decode_frequency = settings.get_setting('full_decode_frequency')
+    timestamp_for_next_full_decode = (
+            int(record.last_full_decode) + int(humanfriendly.parse_timespan(full_decode_frequency)))
+    return int(time.time()) > timestamp_for_next_full_decode
+
+
+def set_task_check_level(data, check_level):
+    """
+    Save the check level that the worker ran for a task so that it can be recorded by the task results runner.
+    The worker runner data is not passed on to the post-processor, so this uses the Unmanic task data store.
+    Versions of Unmanic without a task data store are ignored.
+
+    :param data:
+    :param check_level:
+    :return:
+    """
+    if data.get('task_id') is None:
+        return
+    try:
+        from unmanic.libs.task import TaskDataStore
+        TaskDataStore.set_task_state(TASK_CHECK_LEVEL_KEY, check_level, task_id=data.get('task_id'))
+    except Exception as e:
+        logger.debug("Unable to save the check level of task {} - {}".format(data.get('task_id'), e))
+
+
+def get_task_check_level(data):
+    """
+    Fetch the check level that the worker ran for a task (see set_task_check_level).
+    Returns None if it is not known.
+
+    :param data:
+    :return:
+    """
+    if data.get('task_id') is None:
+        return None
+    try:
+        from unmanic.libs.task import TaskDataStore
+        return TaskDataStore.get_task_state(TASK_CHECK_LEVEL_KEY, task_id=data.get('task_id'))
+    except Exception as e:
+        logger.debug("Unable to read the check level of task {} - {}".format(data.get('task_id'), e))
+        return None
+
+
+def needs_testing(path, settings):
+    """
+    Ensure this file does not need to be added due to frequent retesting
+
+    :param path:
+    :param settings:
+    :return:
+    """
+    record = get_test_record(path, settings)
+    previous_tested = record.last_tested if record else None
 
     if previous_tested:
         logger.debug("File was previously tested for errors on {}.".format(time.ctime(int(previous_tested))))
@@ -253,6 +968,14 @@ def on_library_management_file_test(data):
     else:
         settings = Settings()
 
+    if settings.get_setting('detect_truncation'):
+        truncated, message = detect_truncation(abspath, probe)
+        if truncated:
+            # Add the file to the pending tasks regardless of the test schedule. The worker will fail the task
+            data['add_file_to_pending_tasks'] = True
+            logger.warning("File '{}' appears to be truncated. {}.".format(abspath, message))
+            return data
+
     if needs_testing(abspath, settings):
         # Mark this file to be added to the pending tasks
         data['add_file_to_pending_tasks'] = True
@@ -300,6 +1023,12 @@ def on_worker_process(data):
     else:
         settings = Settings()
 
+    # Fail truncated files before spending time decoding them
+    if settings.get_setting('detect_truncation'):
+        truncated, message = detect_truncation(abspath, probe)
+        if truncated:
+            raise Exception("File '{}' is truncated. {}.".format(abspath, message))
+
     # Check if this plugin should run every time against files or only when scheduled
     if settings.get_setting('retest_files') and not settings.get_setting('always_run'):
         logger.debug("Plugin configured to only run against video files that are required.")
@@ -307,6 +1036,40 @@ def on_worker_process(data):
             # This video file has been tested within the configured frequency time
             return data
 
+    # Validate the container structure before launching any FFmpeg process
+    escalated = False
+    if settings.get_setting('validate_structure'):
+        passed, output = run_structure_check(abspath)
+        if passed is None:
+            logger.debug("Skipping structure validation of file '{}'. {}.".format(abspath, output))
+        elif not passed:
+            logger.warning("File '{}' failed the structure validation:\n{}".format(abspath, output))
+            if settings.get_setting('check_level') != 'full' and not settings.get_setting('escalate_on_anomalies'):
+                raise Exception("File '{}' failed the structure validation.".format(abspath))
+            logger.info("Escalating to a full decode of file '{}'.".format(abspath))
+            escalated = True
+
+    # Run the faster check level unless a full decode is due
+    if not escalated and not full_decode_due(abspath, settings):
+        if settings.get_setting('check_level') == 'sampled':
+            passed, output = run_sampled_check(abspath, probe, settings)
+        else:
+            passed, output = run_quick_check(abspath, settings)
+        if passed is None:
+            logger.info("Unable to run the '{}' check on file '{}'. {}. Running a full decode.".format(
+                settings.get_setting('check_level'), abspath, output))
+        elif passed:
+            logger.debug("File '{}' passed the '{}' check.".format(abspath, settings.get_setting('check_level')))
+            set_task_check_level(data, settings.get_setting('check_level'))
+            return data
+        else:
+            logger.warning("File '{}' failed the '{}' check:\n{}".format(abspath, settings.get_setting('check_level'),
+                                                                         output))
+            if not settings.get_setting('escalate_on_anomalies'):
+                raise Exception(
+                    "File '{}' failed the '{}' check.".format(abspath, settings.get_setting('check_level')))
+            logger.info("Escalating to a full decode of file '{}'.".format(abspath))
+
     # Get stream mapper
     mapper = PluginStreamMapper()
     mapper.set_probe(probe)
@@ -323,9 +1086,25 @@ def on_worker_process(data):
     # Get generated ffmpeg args
     ffmpeg_args = mapper.get_ffmpeg_args()
 
+    # Write preview images from the same decode
+    if settings.get_setting('generate_previews') and has_video_stream(probe):
+        download_format = None
+        if settings.get_setting('decoding_type') == 'vaapi':
+            download_format = get_vaapi_download_format(probe)
+        if settings.get_setting('decoding_type') == 'vaapi' and download_format is None:
+            # A wrong download format fails the whole command, which would be reported as a corrupt file
+            logger.info("Skipping previews for file '{}'. The bit depth of the video is unknown.".format(abspath))
+        else:
+            duration = get_file_duration(probe)
+            preview_directory = prepare_preview_directory(abspath, duration, settings)
+            if preview_directory:
+                ffmpeg_args += mapper.generate_preview_output_args(settings, preview_directory, duration,
+                                                                   download_format=download_format)
+
     # Apply ffmpeg args to command
     data['exec_command'] = ['ffmpeg']
     data['exec_command'] += ffmpeg_args
+    set_task_check_level(data, 'full')
 
     # Set the parser
     parser = Parser(logger)
@@ -360,14 +1139,32 @@ def on_postprocessor_task_results(data):
         settings = Settings(library_id=data.get('library_id'))
     else:
         settings = Settings()
-    # Loop over the destination_files list and update the directory info file for each one
-    if settings.get_setting('retest_files'):
-        current_timestamp = time.time()
+    # Record the test results of all destination files in the test results store
+    # When using a faster check level, the test times are also needed to follow the full decode schedule
+    if settings.get_setting('retest_files') or settings.get_setting('check_level') != 'full':
+        current_timestamp = int(time.time())
+        next_due = None
+        if settings.get_setting('retest_files'):
+            next_due = current_timestamp + int(humanfriendly.parse_timespan(settings.get_setting('test_frequency')))
+        check_level = get_task_check_level(data)
+        results = []
         for destination_file in data.get('destination_files'):
-            directory_info = UnmanicDirectoryInfo(os.path.dirname(destination_file))
-            directory_info.set('ffmpeg_file_error_checker', os.path.basename(destination_file),
-                               str(int(current_timestamp)))
-            directory_info.save()
-            logger.debug("Error check timestamp info written for '{}'.".format(destination_file))
+            if check_level is not None:
+                # A full decode may have been run early by escalating from a faster check level
+                ran_full_decode = (check_level == 'full')
+            else:
+                # Without the check level of the task, assume that the worker followed the full decode schedule
+                ran_full_decode = full_decode_due(destination_file, settings)
+            record = get_test_record(destination_file, settings)
+            last_full_decode = record.last_full_decode if record else None
+            results.append({
+                'abspath':          destination_file,
+                'last_tested':      current_timestamp,
+                'last_full_decode': current_timestamp if ran_full_decode else last_full_decode,
+                'sample_run_index': record.sample_run_index if record else 0,
+                'next_due':         next_due,
+            })
+        ResultStore(settings.get_profile_directory()).record_tests(results)
+        logger.debug("Error check results written for '{}'.".format(', '.join(data.get('destination_files'))))
 
     return data
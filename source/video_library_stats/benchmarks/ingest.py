@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    plugins.ingest.py
+
+    Written by:               Josh.5 <jsunnex@gmail.com>
+    Date:                     19 Oct 2026, (9:40 AM)
+
+    Copyright:
+        Copyright (C) 2021 Josh Sunnex
+
+        This program is free software: you can redistribute it and/or modify it under the terms of the GNU General
+        Public License as published by the Free Software Foundation, version 3.
+
+        This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+        implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+        for more details.
+
+        You should have received a copy of the GNU General Public License along with this program.
+        If not, see <https://www.gnu.org/licenses/>.
+
+    Measure the rate at which a library scan saves file data to the stats database.
+    Each run saves the data of a synthetic library twice: once into an empty table (the first scan)
+    and once more over the existing rows (a rescan).
+
+    The 'batched' mode uses Data.save_video_file_item (batched upserts). The 'legacy' mode repeats the
+    create, select and save per file that earlier versions of the plugin used, for comparison.
+    A new database is created in a temporary directory, so the stats of the plugin profile are not modified.
+    Run from the Unmanic plugins directory:
+
+        python3 -m video_library_stats.benchmarks.ingest --files 100000
+        python3 -m video_library_stats.benchmarks.ingest --files 100000 --mode legacy
+
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from peewee import IntegrityError
+
+from video_library_stats import plugin
+from video_library_stats.plugin import Data, VideoFile, VideoFileWriter
+
+BENCHMARK_MODES = ('batched', 'legacy')
+
+
+def legacy_save_video_file_item(abspath, container_name, video_codec, video_width, video_height, metrics):
+    """
+    Save a file the way that earlier versions of the plugin did, with up to three queries per file
+
+    :param abspath:
+    :param container_name:
+    :param video_codec:
+    :param video_width:
+    :param video_height:
+    :param metrics:
+    :return:
+    """
+    try:
+        VideoFile.create(
+            abspath=abspath,
+            basename=os.path.basename(abspath),
+            directory=os.path.dirname(abspath),
+            container_name=container_name,
+            video_codec=video_codec,
+            video_width=video_width,
+            video_height=video_height,
+            **metrics
+        )
+    except IntegrityError:
+        video_file = VideoFile.select().where(VideoFile.abspath == abspath).limit(1).get()
+        video_file.last_tested = datetime.datetime.now()
+        video_file.container_name = container_name
+        video_file.video_codec = video_codec
+        video_file.video_width = video_width
+        video_file.video_height = video_height
+        for name, value in metrics.items():
+            setattr(video_file, name, value)
+        video_file.save()
+
+
+def generate_library(file_count, files_per_directory=25):
+    """
+    Yield the data of each file of a synthetic library
+
+    :param file_count:
+    :param files_per_directory:
+    :return:
+    """
+    video_codecs = ['h264', 'hevc', 'av1']
+    for i in range(file_count):
+        abspath = '/library/show_{:05d}/file_{:07d}.mkv'.format(i // files_per_directory, i)
+        metrics = {
+            'file_size':      1000000000 + i,
+            'duration':       2700.0,
+            'bit_rate':       3000000,
+            'video_bit_rate': 2800000,
+        }
+        yield abspath, 'matroska,webm', video_codecs[i % len(video_codecs)], 1920, 1080, metrics
+
+
+def run_scan(mode, file_count):
+    """
+    Save the data of every file of the library and return the number of files saved per second
+
+    :param mode:
+    :param file_count:
+    :return:
+    """
+    data = Data()
+    start_time = time.monotonic()
+    for abspath, container_name, video_codec, video_width, video_height, metrics in generate_library(file_count):
+        if mode == 'legacy':
+            legacy_save_video_file_item(abspath, container_name, video_codec, video_width, video_height, metrics)
+        else:
+            data.save_video_file_item(abspath, container_name, video_codec, video_width, video_height, metrics)
+    # The final batch waits for its result, and the queue database writer runs writes in order
+    VideoFileWriter().flush()
+    return file_count / (time.monotonic() - start_time)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='video_library_stats.benchmarks.ingest',
+                                     description="Measure the rate at which file data is saved to the stats database")
+    parser.add_argument('--files', type=int, default=100000, help="The number of files in the synthetic library")
+    parser.add_argument('--mode', choices=BENCHMARK_MODES, default='batched',
+                        help="Save with batched upserts or with the create, select and save of earlier versions")
+    args = parser.parse_args(argv)
+
+    # Point the plugin at a new database before the schema is created
+    temp_directory = tempfile.mkdtemp(prefix='video_library_stats_benchmark_')
+    plugin.db_file = os.path.join(temp_directory, 'library_stats.db')
+    plugin.db.init(plugin.db_file)
+    try:
+        first_scan = run_scan(args.mode, args.files)
+        rescan = run_scan(args.mode, args.files)
+        print("{} mode, {} files: first scan {:.0f} files/s, rescan {:.0f} files/s".format(
+            args.mode, args.files, first_scan, rescan))
+    finally:
+        plugin.db.stop()
+        shutil.rmtree(temp_directory, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
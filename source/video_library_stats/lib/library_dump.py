@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    plugins.library_dump.py
+
+    Written by:               Josh.5 <jsunnex@gmail.com>
+    Date:                     19 Oct 2026, (4:10 PM)
+
+    Copyright:
+        Copyright (C) 2021 Josh Sunnex
+
+        This program is free software: you can redistribute it and/or modify it under the terms of the GNU General
+        Public License as published by the Free Software Foundation, version 3.
+
+        This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+        implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+        for more details.
+
+        You should have received a copy of the GNU General Public License along with this program.
+        If not, see <https://www.gnu.org/licenses/>.
+
+    Export the video library stats to an NDJSON or CSV dump, or import a dump into the stats of another node.
+    Run from the Unmanic plugins directory:
+
+        python3 -m video_library_stats.lib.library_dump export /tmp/library.ndjson.gz
+        python3 -m video_library_stats.lib.library_dump import /tmp/library.ndjson.gz --replace-prefix /old /new
+
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+
+from peewee import BigIntegerField, FloatField, IntegerField
+
+from video_library_stats.plugin import Data, VideoFile, parse_float, parse_int
+
+DUMP_FORMATS = ('ndjson', 'csv')
+
+
+def get_dump_fields():
+    return [f.name for f in VideoFile._meta.sorted_fields if f.name != 'id']
+
+
+def get_format_from_path(path):
+    """
+    Return the dump format from a file name, ignoring any '.gz' extension. Defaults to NDJSON.
+
+    :param path:
+    :return:
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    return 'ndjson'
+
+
+def open_dump(path, mode):
+    """
+    Open a dump file as text. A path of '-' uses stdin or stdout and a path ending in '.gz' is compressed.
+
+    :param path:
+    :param mode: 'r' or 'w'
+    :return:
+    """
+    if path == '-':
+        stream = sys.stdin if mode == 'r' else sys.stdout
+        return os.fdopen(os.dup(stream.fileno()), mode, encoding='utf-8', newline='')
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def write_rows(rows, stream, dump_format):
+    """
+    Write each row from an iterable of row dictionaries to a stream as it is read
+
+    :param rows:
+    :param stream:
+    :param dump_format:
+    :return: The number of rows written
+    """
+    count = 0
+    if dump_format == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=get_dump_fields())
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+    for row in rows:
+        stream.write(json.dumps(row, default=str, separators=(',', ':')))
+        stream.write('\n')
+        count += 1
+    return count
+
+
+def read_rows(stream, dump_format):
+    """
+    Yield a row dictionary for each record of a dump stream.
+    CSV values are converted back to the type of their field and empty CSV values are read as None.
+
+    :param stream:
+    :param dump_format:
+    :return:
+    """
+    if dump_format == 'csv':
+        converters = {}
+        for field in VideoFile._meta.sorted_fields:
+            if isinstance(field, (IntegerField, BigIntegerField)):
+                converters[field.name] = parse_int
+            elif isinstance(field, FloatField):
+                converters[field.name] = parse_float
+        for record in csv.DictReader(stream):
+            row = {}
+            for name, value in record.items():
+                if value == '':
+                    value = None
+                elif name in converters:
+                    value = converters[name](value)
+                row[name] = value
+            yield row
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def replace_path_prefix(rows, old_prefix, new_prefix):
+    """
+    Move the paths of the rows from one library location to another.
+    Only whole path components are matched, so a prefix of '/lib' does not match '/library'.
+
+    :param rows:
+    :param old_prefix:
+    :param new_prefix:
+    :return:
+    """
+    old_prefix = old_prefix.rstrip('/')
+    new_prefix = new_prefix.rstrip('/')
+    for row in rows:
+        abspath = row.get('abspath') or ''
+        if abspath == old_prefix or abspath.startswith(old_prefix + '/'):
+            row['abspath'] = new_prefix + abspath[len(old_prefix):]
+            row['directory'] = os.path.dirname(row['abspath'])
+        yield row
+
+
+def export_library(path, dump_format=None):
+    """
+    Stream the video file table to a dump file
+
+    :param path:
+    :param dump_format:
+    :return: The number of rows exported
+    """
+    if dump_format is None:
+        dump_format = get_format_from_path(path)
+    with open_dump(path, 'w') as stream:
+        return write_rows(Data().iter_video_files(), stream, dump_format)
+
+
+def import_library(path, dump_format=None, replace_prefix=None, batch_size=5000):
+    """
+    Load a dump file into the video file table in batched transactions
+
+    :param path:
+    :param dump_format:
+    :param replace_prefix: An optional tuple of the old and new path prefix of the library
+    :param batch_size:
+    :return: The number of rows imported
+    """
+    if dump_format is None:
+        dump_format = get_format_from_path(path)
+    with open_dump(path, 'r') as stream:
+        rows = read_rows(stream, dump_format)
+        if replace_prefix:
+            rows = replace_path_prefix(rows, *replace_prefix)
+        return Data().import_video_files(rows, batch_size=batch_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='video_library_stats.lib.library_dump',
+                                     description="Export or import the video library stats")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="Export the video library stats to a dump file")
+    export_parser.add_argument('path', help="The dump file path. Use '-' for stdout and a '.gz' extension to compress")
+    export_parser.add_argument('--format', choices=DUMP_FORMATS, help="Defaults to the format of the file extension")
+
+    import_parser = subparsers.add_parser('import', help="Import a dump file into the video library stats")
+    import_parser.add_argument('path', help="The dump file path. Use '-' for stdin")
+    import_parser.add_argument('--format', choices=DUMP_FORMATS, help="Defaults to the format of the file extension")
+    import_parser.add_argument('--replace-prefix', nargs=2, metavar=('OLD', 'NEW'),
+                               help="Replace the library path prefix of each imported file")
+    import_parser.add_argument('--batch-size', type=int, default=5000, help="The number of rows per transaction")
+
+    args = parser.parse_args(argv)
+    if args.command == 'export':
+        count = export_library(args.path, dump_format=args.format)
+        print("Exported {} video files".format(count), file=sys.stderr)
+    else:
+        count = import_library(args.path, dump_format=args.format, replace_prefix=args.replace_prefix,
+                               batch_size=args.batch_size)
+        print("Imported {} video files".format(count), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -21,14 +21,23 @@
         If not, see <https://www.gnu.org/licenses/>.
 
 """
+import atexit
+import base64
+import functools
+import hashlib
 import json
 import logging
 import os
+import re
+import sqlite3
 import threading
+import time
 import uuid
+import zlib
 import datetime
 
 from peewee import *
+from playhouse.migrate import SqliteMigrator, migrate
 from playhouse.shortcuts import model_to_dict
 from playhouse.sqliteq import SqliteQueueDatabase
 from unmanic.libs.singleton import SingletonType
@@ -48,12 +57,20 @@ class Settings(PluginSettings):
 settings = Settings()
 profile_directory = settings.get_profile_directory()
 db_file = os.path.abspath(os.path.join(profile_directory, 'library_stats.db'))
+db_pragmas = (
+    ('journal_mode', 'wal'),
+    ('synchronous', 'normal'),
+    ('cache_size', -1024 * 32),
+    ('temp_store', 'memory'),
+)
+# The writer thread is started once the schema has been created (see Data.create_db_schema)
 db = SqliteQueueDatabase(
     db_file,
     use_gevent=False,
-    autostart=True,
+    autostart=False,
     queue_max_size=None,
     results_timeout=15.0,
+    pragmas=db_pragmas,
 )
 
 
@@ -88,17 +105,525 @@ class VideoFile(BaseModel):
     video_codec = TextField(null=False, default='UNKNOWN')
     video_width = IntegerField(null=True)
     video_height = IntegerField(null=True)
+    directory = TextField(null=True, index=True)
+    video_codec_name = TextField(null=True)
+    file_size = BigIntegerField(null=True)
+    duration = FloatField(null=True)
+    bit_rate = BigIntegerField(null=True)
+    video_bit_rate = BigIntegerField(null=True)
+    video_frame_rate = FloatField(null=True)
+    audio_codecs = TextField(null=True)
+    audio_channels = IntegerField(null=True)
+    estimated_savings = BigIntegerField(null=True, index=True)
+
+    class Meta:
+        # Indexes for the file browser. Each filter column is paired with each sort column so that a page of results
+        # is read in order straight from an index. SQLite appends the row ID to every index, which provides the
+        # keyset pagination tie-breaker.
+        indexes = (
+            (('file_size',), False),
+            (('video_bit_rate',), False),
+            (('video_codec',), False),
+            (('video_codec', 'file_size'), False),
+            (('video_codec', 'video_bit_rate'), False),
+            (('container_name', 'file_size'), False),
+            (('container_name', 'video_bit_rate'), False),
+            (('container_name', 'video_codec'), False),
+            (('video_width', 'video_height', 'file_size'), False),
+            (('video_width', 'video_height', 'video_bit_rate'), False),
+            (('video_width', 'video_height', 'video_codec'), False),
+        )
+
+
+# Fields added to the VideoFile model after its first release. These are added to existing tables by a migration
+VIDEO_FILE_MIGRATED_FIELDS = (
+    'directory',
+    'video_codec_name',
+    'file_size',
+    'duration',
+    'bit_rate',
+    'video_bit_rate',
+    'video_frame_rate',
+    'audio_codecs',
+    'audio_channels',
+    'estimated_savings',
+)
+
+# The bits per pixel that a file is expected to need after it has been transcoded, by the file's current video codec.
+# Files with a video bitrate above this target are estimated to save the difference when transcoded.
+SAVINGS_TARGET_BITS_PER_PIXEL = {
+    'av1':        0.04,
+    'hevc':       0.05,
+    'vp9':        0.05,
+    'h264':       0.06,
+    'vc1':        0.06,
+    'wmv3':       0.06,
+    'mpeg4':      0.06,
+    'msmpeg4v3':  0.06,
+    'mpeg2video': 0.06,
+    'mpeg1video': 0.06,
+}
+SAVINGS_DEFAULT_TARGET_BITS_PER_PIXEL = 0.06
+
+# Separates the names of the worker plugins that ran on a task in the savings ledger
+PLUGIN_CHAIN_SEPARATOR = ' > '
+
+
+class VideoFileStat(BaseModel):
+    """
+    VideoFileStat
+
+    The number and total size of files for each value of a dimension (container name, video codec or resolution).
+    These counts are maintained by triggers on the videofile table.
+    """
+    dimension = TextField(null=False)
+    value = TextField(null=False)
+    sort_order = IntegerField(null=False, default=0)
+    count = IntegerField(null=False, default=0)
+    total_size = BigIntegerField(null=True, default=0)
+
+    class Meta:
+        table_name = 'videofile_stats'
+        primary_key = CompositeKey('dimension', 'value')
+
+
+class DirectoryStat(BaseModel):
+    """
+    DirectoryStat
+
+    The number and total size of the files of each video codec within a directory, including all subdirectories.
+    Each directory path is stored as a materialized path with a trailing '/', so the subdirectories of a directory
+    are a range of paths that start with the directory's path.
+    These rollups are maintained by triggers on the videofile table.
+    """
+    path = TextField(null=False)
+    depth = IntegerField(null=False)
+    video_codec = TextField(null=False)
+    count = IntegerField(null=False, default=0)
+    total_size = BigIntegerField(null=False, default=0)
+
+    class Meta:
+        table_name = 'directory_stats'
+        primary_key = CompositeKey('path', 'video_codec')
+        indexes = (
+            (('depth', 'path'), False),
+            (('video_codec', 'depth', 'path'), False),
+        )
+
+
+class LibrarySnapshot(BaseModel):
+    """
+    LibrarySnapshot
+
+    The aggregate counts and sizes of the library at a point in time.
+    The counters of every dimension value are packed into a single compressed field (see pack_snapshot_counters).
+    """
+    taken_at = DateTimeField(null=False, default=datetime.datetime.now, index=True)
+    file_count = IntegerField(null=False, default=0)
+    total_size = BigIntegerField(null=False, default=0)
+    counters = BlobField(null=False)
+
+    class Meta:
+        table_name = 'library_snapshots'
+
+
+class SavingsLedgerEntry(BaseModel):
+    """
+    SavingsLedgerEntry
+
+    The result of a single processed task: the size and video codec of the file before and after processing,
+    the worker plugins that ran on it and the time taken.
+    """
+    finished_at = DateTimeField(null=False, default=datetime.datetime.now, index=True)
+    library_id = IntegerField(null=True)
+    source_path = TextField(null=False)
+    destination_path = TextField(null=True)
+    success = BooleanField(null=False, default=False)
+    source_size = BigIntegerField(null=True)
+    destination_size = BigIntegerField(null=True)
+    size_saved = BigIntegerField(null=True)
+    source_video_codec = TextField(null=True)
+    destination_video_codec = TextField(null=True)
+    plugin_chain = TextField(null=False, default='')
+    wall_time = FloatField(null=True)
+
+    class Meta:
+        table_name = 'savings_ledger'
+        indexes = (
+            (('library_id', 'plugin_chain'), False),
+        )
+
+
+def fts5_trigram_available():
+    """
+    Check if the SQLite library supports FTS5 with the trigram tokenizer (SQLite 3.34+)
+
+    :return:
+    """
+    try:
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE VIRTUAL TABLE trigram_test USING fts5(value, tokenize='trigram')")
+        conn.close()
+    except sqlite3.Error:
+        return False
+    return True
+
+
+def create_path_index(database, rebuild=False):
+    """
+    Create an FTS5 trigram index of the file paths.
+    The index is an external content table that is kept in sync with the videofile table by triggers.
+
+    :param database:
+    :param rebuild:
+    :return:
+    """
+    index_exists = database.table_exists('videofile_path_fts')
+    database.execute_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS videofile_path_fts "
+        "USING fts5(abspath, content='videofile', content_rowid='id', tokenize='trigram')"
+    )
+    database.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS videofile_path_fts_ai AFTER INSERT ON videofile BEGIN "
+        "INSERT INTO videofile_path_fts(rowid, abspath) VALUES (new.id, new.abspath); "
+        "END"
+    )
+    database.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS videofile_path_fts_ad AFTER DELETE ON videofile BEGIN "
+        "INSERT INTO videofile_path_fts(videofile_path_fts, rowid, abspath) VALUES ('delete', old.id, old.abspath); "
+        "END"
+    )
+    database.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS videofile_path_fts_au AFTER UPDATE OF abspath ON videofile BEGIN "
+        "INSERT INTO videofile_path_fts(videofile_path_fts, rowid, abspath) VALUES ('delete', old.id, old.abspath); "
+        "INSERT INTO videofile_path_fts(rowid, abspath) VALUES (new.id, new.abspath); "
+        "END"
+    )
+    if rebuild or not index_exists:
+        # Index any rows that were added before the index existed
+        logger.info("Building video file path index")
+        database.execute_sql("INSERT INTO videofile_path_fts(videofile_path_fts) VALUES ('rebuild')")
+
+
+def create_aggregate_triggers(database, rebuild=False):
+    """
+    Create the triggers that keep the counts and sizes in the videofile_stats table up to date.
+    The triggers run in the same transaction as the statement that modifies the videofile table.
+    Rows are counted when inserted, uncounted when deleted, and moved between values when an update changes them.
+    A rebuild replaces any existing triggers and recounts the table.
+
+    :param database:
+    :param rebuild:
+    :return:
+    """
+    dimensions = {
+        'container_name': {
+            'value':      "{row}.container_name",
+            'sort_order': "0",
+            'condition':  "1",
+            'columns':    "container_name",
+        },
+        'video_codec':    {
+            'value':      "{row}.video_codec",
+            'sort_order': "0",
+            'condition':  "1",
+            'columns':    "video_codec",
+        },
+        'resolution':     {
+            'value':      "{row}.video_width || 'x' || {row}.video_height",
+            'sort_order': "{row}.video_width",
+            'condition':  "{row}.video_width IS NOT NULL AND {row}.video_height IS NOT NULL",
+            'columns':    "video_width, video_height",
+        },
+    }
+
+    def increment(dimension, row):
+        # An 'INSERT ... SELECT' needs a WHERE clause before its 'ON CONFLICT' clause
+        d = dimensions[dimension]
+        return (
+            "INSERT INTO videofile_stats (dimension, value, sort_order, count, total_size) "
+            "SELECT '{dimension}', {value}, {sort_order}, 1, COALESCE({{row}}.file_size, 0) WHERE {condition} "
+            "ON CONFLICT (dimension, value) DO UPDATE "
+            "SET count = count + 1, total_size = total_size + excluded.total_size; "
+        ).format(dimension=dimension, value=d['value'], sort_order=d['sort_order'],
+                 condition=d['condition']).format(row=row)
+
+    def decrement(dimension, row):
+        d = dimensions[dimension]
+        return (
+            "UPDATE videofile_stats SET count = count - 1, total_size = total_size - COALESCE({{row}}.file_size, 0) "
+            "WHERE dimension = '{dimension}' AND value = {value} AND {condition}; "
+            "DELETE FROM videofile_stats WHERE dimension = '{dimension}' AND count <= 0; "
+        ).format(dimension=dimension, value=d['value'], condition=d['condition']).format(row=row)
+
+    trigger_names = ['videofile_stats_ai', 'videofile_stats_ad']
+    trigger_names += ['videofile_stats_au_{}'.format(dimension) for dimension in dimensions]
+    if rebuild:
+        for name in trigger_names:
+            database.execute_sql("DROP TRIGGER IF EXISTS {}".format(name))
+
+    database.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS videofile_stats_ai AFTER INSERT ON videofile BEGIN {} END".format(
+            ''.join(increment(dimension, 'new') for dimension in dimensions))
+    )
+    database.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS videofile_stats_ad AFTER DELETE ON videofile BEGIN {} END".format(
+            ''.join(decrement(dimension, 'old') for dimension in dimensions))
+    )
+    for dimension, d in dimensions.items():
+        # A change to the file size moves the size between totals in the same way as a change of value
+        columns = [column.strip() for column in d['columns'].split(',')] + ['file_size']
+        changed = " OR ".join("old.{0} IS NOT new.{0}".format(column) for column in columns)
+        database.execute_sql(
+            "CREATE TRIGGER IF NOT EXISTS videofile_stats_au_{dimension} AFTER UPDATE OF {columns} ON videofile "
+            "WHEN {changed} BEGIN {decrement}{increment} END".format(
+                dimension=dimension,
+                columns=', '.join(columns),
+                changed=changed,
+                decrement=decrement(dimension, 'old'),
+                increment=increment(dimension, 'new'),
+            )
+        )
+
+    if rebuild:
+        # Count any rows that were added before the aggregate table existed
+        logger.info("Building video file stats aggregates")
+        database.execute_sql("DELETE FROM videofile_stats")
+        for dimension, d in dimensions.items():
+            database.execute_sql(
+                "INSERT INTO videofile_stats (dimension, value, sort_order, count, total_size) "
+                "SELECT '{dimension}', {value}, MIN({sort_order}), COUNT(id), SUM(COALESCE(file_size, 0)) "
+                "FROM videofile "
+                "WHERE {condition} GROUP BY {value}".format(
+                    dimension=dimension,
+                    value=d['value'],
+                    sort_order=d['sort_order'],
+                    condition=d['condition'],
+                ).format(row='videofile')
+            )
+
+
+def create_directory_rollup_triggers(database, rebuild=False):
+    """
+    Create the triggers that keep the directory_stats rollups up to date.
+
+    A file is counted in every directory above it. SQLite does not allow recursive queries in triggers, so the
+    directories of a file are found by joining the positions of each '/' in its path from the path_positions table.
+    A rebuild replaces any existing triggers and recounts the table.
+
+    :param database:
+    :param rebuild:
+    :return:
+    """
+    # A table of the character positions of a path up to the maximum path length
+    if not database.table_exists('path_positions'):
+        database.execute_sql("CREATE TABLE path_positions (pos INTEGER PRIMARY KEY)")
+        database.execute_sql(
+            "INSERT INTO path_positions (pos) "
+            "WITH RECURSIVE positions(pos) AS (SELECT 1 UNION ALL SELECT pos + 1 FROM positions WHERE pos < 4096) "
+            "SELECT pos FROM positions"
+        )
+
+    directory = "substr({row}.abspath, 1, p.pos)"
+    depth = "length({0}) - length(replace({0}, '/', '')) - 1".format(directory)
+    directories = (
+        "FROM path_positions p "
+        "WHERE p.pos < length({row}.abspath) AND substr({row}.abspath, p.pos, 1) = '/'"
+    )
+
+    def increment(row):
+        return (
+            "INSERT INTO directory_stats (path, depth, video_codec, count, total_size) "
+            "SELECT {directory}, {depth}, {row}.video_codec, 1, COALESCE({row}.file_size, 0) {directories} "
+            "ON CONFLICT (path, video_codec) DO UPDATE "
+            "SET count = count + 1, total_size = total_size + excluded.total_size; "
+        ).format(directory=directory, depth=depth, directories=directories, row='{row}').format(row=row)
+
+    def decrement(row):
+        return (
+            "UPDATE directory_stats SET count = count - 1, total_size = total_size - COALESCE({row}.file_size, 0) "
+            "WHERE video_codec = {row}.video_codec AND path IN (SELECT {directory} {directories}); "
+            "DELETE FROM directory_stats "
+            "WHERE video_codec = {row}.video_codec AND path IN (SELECT {directory} {directories}) AND count <= 0; "
+        ).format(directory=directory, directories=directories, row='{row}').format(row=row)
+
+    trigger_names = ['directory_stats_ai', 'directory_stats_ad', 'directory_stats_au']
+    if rebuild:
+        for name in trigger_names:
+            database.execute_sql("DROP TRIGGER IF EXISTS {}".format(name))
+
+    database.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS directory_stats_ai AFTER INSERT ON videofile BEGIN {} END".format(
+            increment('new'))
+    )
+    database.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS directory_stats_ad AFTER DELETE ON videofile BEGIN {} END".format(
+            decrement('old'))
+    )
+    database.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS directory_stats_au AFTER UPDATE OF abspath, video_codec, file_size ON videofile "
+        "WHEN old.abspath IS NOT new.abspath OR old.video_codec IS NOT new.video_codec "
+        "OR old.file_size IS NOT new.file_size "
+        "BEGIN {}{} END".format(decrement('old'), increment('new'))
+    )
+
+    if rebuild:
+        # Count any rows that were added before the rollups existed
+        logger.info("Building video file directory rollups")
+        database.execute_sql("DELETE FROM directory_stats")
+        database.execute_sql(
+            "INSERT INTO directory_stats (path, depth, video_codec, count, total_size) "
+            "SELECT {directory} AS directory_path, {depth}, videofile.video_codec, COUNT(videofile.id), "
+            "SUM(COALESCE(videofile.file_size, 0)) "
+            "FROM videofile JOIN path_positions p "
+            "ON p.pos < length(videofile.abspath) AND substr(videofile.abspath, p.pos, 1) = '/' "
+            "GROUP BY directory_path, videofile.video_codec".format(
+                directory=directory, depth=depth).format(row='videofile')
+        )
+
+
+def suspend_video_file_indexes(database):
+    """
+    Drop the triggers and secondary indexes of the videofile table before a bulk load.
+    The unique path index is kept as it is required by the upserts.
+    Call restore_video_file_indexes() once the load is complete.
+
+    :param database:
+    :return:
+    """
+    triggers = database.execute_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (VideoFile._meta.table_name,))
+    for (name,) in list(triggers):
+        database.execute_sql('DROP TRIGGER IF EXISTS "{}"'.format(name))
+    for index in VideoFile._meta.fields_to_index():
+        if not index._unique:
+            database.execute_sql('DROP INDEX IF EXISTS "{}"'.format(index._name))
+
+
+def restore_video_file_indexes(database):
+    """
+    Recreate the triggers and secondary indexes dropped by suspend_video_file_indexes()
+    and rebuild the path index and aggregate counts from the table
+
+    :param database:
+    :return:
+    """
+    VideoFile._schema.create_indexes(safe=True)
+    create_aggregate_triggers(database, rebuild=True)
+    create_directory_rollup_triggers(database, rebuild=True)
+    if Data.path_index_available:
+        create_path_index(database, rebuild=True)
+
+
+def migrate_video_file_table(database):
+    """
+    Add any fields to an existing videofile table that were not present when it was created
+
+    :param database:
+    :return:
+    """
+    if not VideoFile.table_exists():
+        return
+    columns = [c.name for c in database.get_columns(VideoFile._meta.table_name)]
+    missing_fields = [name for name in VIDEO_FILE_MIGRATED_FIELDS if name not in columns]
+    if not missing_fields:
+        return
+    logger.info("Migrating video file stats database. Adding fields: {}".format(', '.join(missing_fields)))
+    migrator = SqliteMigrator(database)
+    with database.atomic():
+        migrate(*[migrator.add_column(VideoFile._meta.table_name, name, VideoFile._meta.fields[name])
+                  for name in missing_fields])
 
 
 class Data(object):
+    schema_lock = threading.Lock()
+    schema_created = False
+    path_index_available = False
+    # Counts the writes made to the database by this process. Used to version the panel payloads
+    write_lock = threading.Lock()
+    write_count = 0
+    # Distinguishes the write counts of this process from those of any previous process
+    process_token = uuid.uuid4().hex[:8]
+    # A connection only used to read the 'data_version' pragma
+    version_connection = None
+
+    @classmethod
+    def mark_written(cls):
+        with cls.write_lock:
+            cls.write_count += 1
+
+    @classmethod
+    def get_data_version(cls):
+        """
+        Return a version string that changes whenever the database is written to.
+
+        The 'data_version' pragma of a connection changes when any other connection commits to the database,
+        including connections of other processes such as a library_dump import.
+        It is read from a connection that is kept open for this purpose, as the value is only comparable within
+        a single connection.
+
+        :return:
+        """
+        with cls.write_lock:
+            if cls.version_connection is None:
+                cls.version_connection = sqlite3.connect(db_file, check_same_thread=False)
+            data_version = cls.version_connection.execute('PRAGMA data_version').fetchone()[0]
+            return "{}-{}-{}".format(cls.process_token, data_version, cls.write_count)
 
     def __init__(self):
         self.create_db_schema()
 
     def create_db_schema(self):
-        # Create required tables in new DB
-        logger.debug("Ensuring video file stats database schema exists")
-        db.create_tables([VideoFile], safe=True)
+        """
+        Create the required tables in the DB once per process.
+        This uses a direct connection as writes through the queue database are asynchronous
+        and the tables must exist before they are read.
+        The queue database writer thread is only started after this connection is closed, otherwise it may fail to
+        set the journal mode while the schema is locked.
+
+        :return:
+        """
+        with Data.schema_lock:
+            if Data.schema_created:
+                return
+            logger.debug("Ensuring video file stats database schema exists")
+            schema_db = SqliteDatabase(db_file, pragmas=db_pragmas)
+            models = [VideoFile, VideoFileStat, DirectoryStat, LibrarySnapshot, SavingsLedgerEntry]
+            with schema_db.bind_ctx(models):
+                aggregates_exist = VideoFileStat.table_exists()
+                rollups_exist = DirectoryStat.table_exists()
+                # Migrate before creating the tables so that the indexes of any new fields can be created
+                migrate_video_file_table(schema_db)
+                schema_db.create_tables(models, safe=True)
+                with schema_db.atomic():
+                    create_aggregate_triggers(schema_db, rebuild=not aggregates_exist)
+                    create_directory_rollup_triggers(schema_db, rebuild=not rollups_exist)
+                if fts5_trigram_available():
+                    create_path_index(schema_db)
+                    Data.path_index_available = True
+                else:
+                    logger.info("SQLite FTS5 trigram support is not available. Path filters will not be indexed")
+            schema_db.close()
+            Data.schema_created = True
+            # Start the queue database writer thread now that no other connection is changing the schema
+            db.start()
+
+    def path_filter_condition(self, path_filter):
+        """
+        Return a condition that matches files with a path containing the path filter.
+
+        Filters of 3 or more characters are looked up in the trigram path index.
+        Shorter filters cannot be matched by trigrams and fall back to a 'LIKE' table scan.
+
+        :param path_filter:
+        :return:
+        """
+        if Data.path_index_available and len(path_filter) >= 3:
+            # Quote the filter as an FTS5 string so that it is matched as a substring and not parsed as a query
+            match = '"{}"'.format(path_filter.replace('"', '""'))
+            return VideoFile.id.in_(
+                SQL("(SELECT rowid FROM videofile_path_fts WHERE videofile_path_fts MATCH ?)", [match]))
+        return VideoFile.abspath.contains(path_filter)
 
     def fetch_outdated_file_paths(self):
         """
@@ -123,9 +648,21 @@ class Data(object):
                                  VideoFile.video_width,
                                  VideoFile.video_height)
         if path_filter:
-            query = query.where(VideoFile.abspath.contains(path_filter))
+            query = query.where(self.path_filter_condition(path_filter))
         return query
 
+    def get_aggregate_counts(self, dimension):
+        """
+        Fetch the maintained counts of a dimension without scanning the videofile table
+
+        :param dimension:
+        :return:
+        """
+        query = VideoFileStat.select(VideoFileStat.value.alias(dimension), VideoFileStat.count)
+        query = query.where(VideoFileStat.dimension == dimension)
+        query = query.order_by(VideoFileStat.sort_order, VideoFileStat.value)
+        return list(query.dicts())
+
     def get_container_names(self, path_filter=None):
         """
         SELECT
@@ -136,11 +673,15 @@ class Data(object):
         GROUP BY container_name
         ;
 
+        Unfiltered counts are read from the aggregate table.
+
         :return:
         """
+        if not path_filter:
+            return self.get_aggregate_counts('container_name')
         query = VideoFile.select(VideoFile.container_name, fn.Count(VideoFile.id).alias('count'))
         if path_filter:
-            query = query.where(VideoFile.abspath.contains(path_filter))
+            query = query.where(self.path_filter_condition(path_filter))
         query = query.group_by(VideoFile.container_name)
         results = query.dicts()
         return list(results)
@@ -155,11 +696,15 @@ class Data(object):
         GROUP BY video_codec
         ;
 
+        Unfiltered counts are read from the aggregate table.
+
         :return:
         """
+        if not path_filter:
+            return self.get_aggregate_counts('video_codec')
         query = VideoFile.select(VideoFile.video_codec, fn.Count(VideoFile.id).alias('count'))
         if path_filter:
-            query = query.where(VideoFile.abspath.contains(path_filter))
+            query = query.where(self.path_filter_condition(path_filter))
         query = query.group_by(VideoFile.video_codec)
         results = query.dicts()
         return list(results)
@@ -178,13 +723,17 @@ class Data(object):
         GROUP BY (video_width || 'x' || video_height)
         ;
 
+        Unfiltered counts are read from the aggregate table.
+
         :return:
         """
+        if not path_filter:
+            return self.get_aggregate_counts('resolution')
         resolution = VideoFile.video_width.concat('x').concat(VideoFile.video_height)
         query = VideoFile.select(resolution.alias('resolution'), fn.Count(VideoFile.id).alias('count'))
         query = query.where(VideoFile.video_width.is_null(False) & VideoFile.video_height.is_null(False))
         if path_filter:
-            query = query.where(VideoFile.abspath.contains(path_filter))
+            query = query.where(self.path_filter_condition(path_filter))
         query = query.group_by(resolution)
         query = query.order_by(VideoFile.video_width)
         results = query.dicts()
@@ -203,7 +752,7 @@ class Data(object):
         """
         query = VideoFile.select(VideoFile.abspath)
         if path_filter:
-            query = query.where(VideoFile.abspath.contains(path_filter))
+            query = query.where(self.path_filter_condition(path_filter))
         # query = query.where(VideoFile.abspath.is_null(False))
         # query = query.where(VideoFile.abspath != '')
         query = query.limit(10)
@@ -211,108 +760,732 @@ class Data(object):
         return list(results)
 
     def save_video_file_item(self, abspath: str, container_name: str, video_codec: str, video_width,
-                             video_height):
+                             video_height, metrics=None):
+        """
+        Queue a file's data to be inserted or updated in the next batched write
+
+        :param abspath:
+        :param container_name:
+        :param video_codec:
+        :param video_width:
+        :param video_height:
+        :param metrics: A dictionary of the file's size, bitrate and audio data (see get_file_metrics)
+        :return:
+        """
+        if metrics is None:
+            metrics = {}
+        row = {
+            'abspath':        abspath,
+            'last_tested':    datetime.datetime.now(),
+            'basename':       os.path.basename(abspath),
+            'directory':      os.path.dirname(abspath),
+            'container_name': container_name,
+            'video_codec':    video_codec,
+            'video_width':    video_width,
+            'video_height':   video_height,
+        }
+        # Every row of a batched insert must have the same fields
+        for name in VIDEO_FILE_MIGRATED_FIELDS:
+            row.setdefault(name, metrics.get(name))
+        row['estimated_savings'] = estimate_savings(row)
+        VideoFileWriter().add(row)
+        return True
+
+    def get_file_page(self, path_filter=None, sort='file_size', order='desc', video_codec=None, container_name=None,
+                      resolution=None, cursor=None, limit=50):
+        """
+        Fetch a page of files using keyset pagination.
+
+        Rather than an offset, each page continues from the sort value and ID of the last row of the previous page.
+        The query reads straight from the composite index for the sort column, so deep pages are as fast as the first.
+        Files with no value for the sort column are not listed.
+
+        :param path_filter:
+        :param sort: One of 'file_size', 'video_bit_rate' or 'video_codec'
+        :param order: 'asc' or 'desc'
+        :param video_codec:
+        :param container_name:
+        :param resolution: A resolution in the format 'WIDTHxHEIGHT'
+        :param cursor: The 'next_cursor' returned with the previous page
+        :param limit:
+        :return:
+        """
+        if sort not in ('file_size', 'video_bit_rate', 'video_codec'):
+            raise ValueError("Unable to sort files by '{}'".format(sort))
+        sort_field = getattr(VideoFile, sort)
+        descending = (order != 'asc')
+
+        query = VideoFile.select(VideoFile.id,
+                                 VideoFile.abspath,
+                                 VideoFile.container_name,
+                                 VideoFile.video_codec,
+                                 VideoFile.video_width,
+                                 VideoFile.video_height,
+                                 VideoFile.file_size,
+                                 VideoFile.duration,
+                                 VideoFile.video_bit_rate,
+                                 VideoFile.estimated_savings)
+        query = query.where(sort_field.is_null(False))
+        if video_codec:
+            query = query.where(VideoFile.video_codec == video_codec)
+        if container_name:
+            query = query.where(VideoFile.container_name == container_name)
+        if resolution:
+            width, height = [int(x) for x in resolution.lower().split('x', 1)]
+            query = query.where((VideoFile.video_width == width) & (VideoFile.video_height == height))
+        if path_filter:
+            query = query.where(self.path_filter_condition(path_filter))
+        if descending:
+            query = query.order_by(sort_field.desc(), VideoFile.id.desc())
+        else:
+            query = query.order_by(sort_field.asc(), VideoFile.id.asc())
+
+        # Fetch one extra row to find out if there is another page
+        if cursor:
+            last_value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')).decode('utf-8'))
+            # SQLite only seeks on the first column of a row value comparison, which would scan every row that shares
+            # the last sort value. Instead, finish the rows that share the last sort value with a seek on the row ID,
+            # then continue from the next sort value.
+            if descending:
+                files = list(query.where((sort_field == last_value) & (VideoFile.id < last_id)).limit(limit + 1).dicts())
+                if len(files) <= limit:
+                    files += list(query.where(sort_field < last_value).limit(limit + 1 - len(files)).dicts())
+            else:
+                files = list(query.where((sort_field == last_value) & (VideoFile.id > last_id)).limit(limit + 1).dicts())
+                if len(files) <= limit:
+                    files += list(query.where(sort_field > last_value).limit(limit + 1 - len(files)).dicts())
+        else:
+            files = list(query.limit(limit + 1).dicts())
+
+        next_cursor = None
+        if len(files) > limit:
+            files = files[:limit]
+            last_row = files[-1]
+            next_cursor = base64.urlsafe_b64encode(
+                json.dumps([last_row[sort], last_row['id']]).encode('utf-8')).decode('utf-8')
+        return {
+            'files':       files,
+            'next_cursor': next_cursor,
+        }
+
+    def get_savings_ranking(self, path_filter=None, limit=25):
+        """
+        Rank the files and directories with the largest estimated savings
+
+        :param path_filter:
+        :param limit:
+        :return:
+        """
+        query = VideoFile.select(VideoFile.abspath,
+                                 VideoFile.video_codec_name,
+                                 VideoFile.video_width,
+                                 VideoFile.video_height,
+                                 VideoFile.file_size,
+                                 VideoFile.video_bit_rate,
+                                 VideoFile.estimated_savings)
+        query = query.where(VideoFile.estimated_savings > 0)
+        if path_filter:
+            query = query.where(self.path_filter_condition(path_filter))
+        query = query.order_by(VideoFile.estimated_savings.desc())
+        query = query.limit(limit)
+        files = list(query.dicts())
+
+        total_savings = fn.SUM(VideoFile.estimated_savings)
+        query = VideoFile.select(VideoFile.directory,
+                                 fn.Count(VideoFile.id).alias('count'),
+                                 fn.SUM(VideoFile.file_size).alias('file_size'),
+                                 total_savings.alias('estimated_savings'))
+        query = query.where(VideoFile.estimated_savings > 0)
+        if path_filter:
+            query = query.where(self.path_filter_condition(path_filter))
+        query = query.group_by(VideoFile.directory)
+        query = query.order_by(total_savings.desc())
+        query = query.limit(limit)
+        directories = list(query.dicts())
+
+        return {
+            'files':       files,
+            'directories': directories,
+        }
+
+    def get_directory_rollups(self, parent='/', video_codec=None, limit=100):
+        """
+        Fetch the totals of a directory by video codec and the totals of each of its subdirectories.
+
+        The subdirectories are read with a range scan of the materialized paths that start with the parent path.
+        If a video codec is given, only the files of that codec are counted in the subdirectory totals
+        (for example, to find the folders that still contain H.264 files and how large they are).
+
+        :param parent:
+        :param video_codec:
+        :param limit:
+        :return:
+        """
+        if not parent.endswith('/'):
+            parent += '/'
+        depth = parent.count('/') - 1
+
+        query = DirectoryStat.select(DirectoryStat.video_codec, DirectoryStat.count, DirectoryStat.total_size)
+        query = query.where(DirectoryStat.path == parent)
+        query = query.order_by(DirectoryStat.total_size.desc())
+        codecs = list(query.dicts())
+
+        # Every path that starts with the parent path sorts before the parent path with its trailing '/' replaced
+        # by the next character ('0')
+        total_size = fn.SUM(DirectoryStat.total_size)
+        query = DirectoryStat.select(DirectoryStat.path,
+                                     fn.SUM(DirectoryStat.count).alias('count'),
+                                     total_size.alias('total_size'))
+        query = query.where((DirectoryStat.depth == depth + 1) &
+                            (DirectoryStat.path > parent) &
+                            (DirectoryStat.path < parent[:-1] + '0'))
+        if video_codec:
+            query = query.where(DirectoryStat.video_codec == video_codec)
+        query = query.group_by(DirectoryStat.path)
+        query = query.order_by(total_size.desc())
+        query = query.limit(limit)
+        directories = list(query.dicts())
+
+        return {
+            'parent':      parent,
+            'codecs':      codecs,
+            'directories': directories,
+        }
+
+    def record_task_result(self, entry):
+        """
+        Add an entry to the savings ledger
+
+        :param entry: A dictionary of SavingsLedgerEntry fields
+        :return:
+        """
+        SavingsLedgerEntry.insert(**entry).execute()
+        Data.mark_written()
+
+    def get_processing_returns(self):
+        """
+        Summarise the savings ledger by library and worker plugin chain, and by worker plugin.
+
+        The plugin settings used for a task are those of the task's library, so a library and plugin chain
+        identifies the settings that the results were achieved with.
+        Each plugin is credited with the results of every task that it ran on.
+
+        :return:
+        """
+        query = SavingsLedgerEntry.select(SavingsLedgerEntry.library_id,
+                                          SavingsLedgerEntry.plugin_chain,
+                                          fn.COUNT(SavingsLedgerEntry.id).alias('tasks'),
+                                          fn.SUM(SavingsLedgerEntry.success).alias('successful_tasks'),
+                                          fn.SUM(SavingsLedgerEntry.source_size).alias('source_size'),
+                                          fn.SUM(SavingsLedgerEntry.size_saved).alias('size_saved'),
+                                          fn.SUM(SavingsLedgerEntry.wall_time).alias('wall_time'))
+        query = query.group_by(SavingsLedgerEntry.library_id, SavingsLedgerEntry.plugin_chain)
+        chains = list(query.dicts())
+
+        plugins = {}
+        for chain in chains:
+            for plugin_name in filter(None, chain['plugin_chain'].split(PLUGIN_CHAIN_SEPARATOR)):
+                plugin = plugins.setdefault(plugin_name, {
+                    'plugin':           plugin_name,
+                    'tasks':            0,
+                    'successful_tasks': 0,
+                    'source_size':      0,
+                    'size_saved':       0,
+                    'wall_time':        0,
+                })
+                for key in ('tasks', 'successful_tasks', 'source_size', 'size_saved', 'wall_time'):
+                    plugin[key] += chain[key] or 0
+        plugins = list(plugins.values())
+
+        for item in chains + plugins:
+            # Failed tasks count towards the time spent, but only successful tasks save space
+            hours = (item['wall_time'] or 0) / 3600
+            item['gb_saved_per_hour'] = round((item['size_saved'] or 0) / 1e9 / hours, 3) if hours else None
+        chains.sort(key=lambda item: item['gb_saved_per_hour'] or 0, reverse=True)
+        plugins.sort(key=lambda item: item['gb_saved_per_hour'] or 0, reverse=True)
+        return {
+            'chains':  chains,
+            'plugins': plugins,
+        }
+
+    def iter_video_files(self, batch_size=1000):
+        """
+        Yield every row of the video file table as a dictionary without loading the table into memory.
+
+        Rows are read in batches ordered by ID. Each batch is streamed from the SQLite cursor without being cached,
+        and a new batch continues from the last ID so that no read transaction is held open for the whole table.
+
+        :param batch_size:
+        :return:
+        """
+        fields = [f for f in VideoFile._meta.sorted_fields if f.name != 'id']
+        last_id = 0
+        while True:
+            query = VideoFile.select(VideoFile.id, *fields)
+            query = query.where(VideoFile.id > last_id)
+            query = query.order_by(VideoFile.id)
+            query = query.limit(batch_size)
+            count = 0
+            for row in query.dicts().iterator():
+                count += 1
+                last_id = row.pop('id')
+                yield row
+            if count < batch_size:
+                return
+
+    def import_video_files(self, rows, batch_size=5000):
+        """
+        Insert or update the video file table from an iterable of row dictionaries (such as those yielded by
+        iter_video_files). Rows are written in batches, each in a single transaction.
+
+        The import uses its own direct connection so that each batch can be wrapped in a transaction.
+        When importing into an empty table (such as when seeding a new node), the triggers and secondary indexes
+        are dropped for the duration of the import and rebuilt once at the end, which is several times faster
+        than maintaining them for each row.
+        Fields missing from a row are set to their default value and unknown fields are ignored.
+
+        :param rows:
+        :param batch_size:
+        :return: The number of rows imported
+        """
+        fields = [f for f in VideoFile._meta.sorted_fields if f.name != 'id']
+        # Generating a query per batch is slower than the insert itself, so a single row upsert is prepared once
+        # and executed for every row of a batch
+        upsert_sql = (
+            'INSERT INTO "{table}" ({columns}) VALUES ({values}) '
+            'ON CONFLICT ("abspath") DO UPDATE SET {updates}'
+        ).format(
+            table=VideoFile._meta.table_name,
+            columns=', '.join('"{}"'.format(f.column_name) for f in fields),
+            values=', '.join('?' for f in fields),
+            updates=', '.join('"{0}" = excluded."{0}"'.format(f.column_name) for f in fields if f.name != 'abspath'),
+        )
+
+        def row_params(row):
+            if not row.get('abspath'):
+                raise ValueError("Unable to import a row without an 'abspath'")
+            params = []
+            for field in fields:
+                value = row.get(field.name)
+                if value is None and not field.null:
+                    value = field.default() if callable(field.default) else field.default
+                params.append(field.db_value(value))
+            return params
+
+        count = 0
+        import_db = SqliteDatabase(db_file, pragmas=db_pragmas, timeout=30)
+        with import_db.bind_ctx([VideoFile, VideoFileStat]):
+            bulk_load = not VideoFile.select().exists()
+            if bulk_load:
+                with import_db.atomic():
+                    suspend_video_file_indexes(import_db)
+            try:
+                for batch in chunked((row_params(row) for row in rows), batch_size):
+                    with import_db.atomic():
+                        import_db.cursor().executemany(upsert_sql, batch)
+                    count += len(batch)
+                    logger.debug("Imported {} video files".format(count))
+            finally:
+                if bulk_load:
+                    logger.info("Rebuilding video file stats indexes")
+                    with import_db.atomic():
+                        restore_video_file_indexes(import_db)
+                Data.mark_written()
+        import_db.close()
+        return count
+
+
+class VideoFileWriter(object, metaclass=SingletonType):
+    """
+    VideoFileWriter
+
+    Coalesces the file data saved during a library scan into batched upserts.
+    Each batch is a single 'INSERT ... ON CONFLICT(abspath) DO UPDATE' statement, so the queue database
+    writer thread commits many files in one transaction.
+    Pending rows are written once the batch is full or when the flush interval has passed.
+    """
+
+    # Keep the number of bound parameters of a batch (one per column of each row) within the limit of 999 that
+    # SQLite applies by default before version 3.32
+    max_variables = 999
+    batch_size = max_variables // len(VideoFile._meta.sorted_fields)
+    flush_interval = 2.0
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.timer = None
+        atexit.register(self.flush)
+
+    def add(self, row):
+        """
+        Add a row to the pending batch. Newer data for the same path replaces any pending row.
+
+        :param row:
+        :return:
+        """
+        with self.lock:
+            self.pending[row['abspath']] = row
+            batch_full = len(self.pending) >= self.batch_size
+            if not batch_full and self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if batch_full:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all pending rows
+
+        :return:
+        """
+        with self.lock:
+            rows = list(self.pending.values())
+            self.pending = {}
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not rows:
+            return
+        # Rows added by other threads while a full batch is being flushed can take the pending rows past the batch size
+        for batch in chunked(rows, self.max_variables // len(rows[0])):
+            try:
+                VideoFile.insert_many(batch).on_conflict(
+                    conflict_target=[VideoFile.abspath],
+                    preserve=[getattr(VideoFile, name) for name in batch[0] if name != 'abspath'],
+                ).execute()
+                Data.mark_written()
+            except Exception:
+                logger.exception("Failed to save video metrics for {} files".format(len(batch)))
+
+
+class DataCleanup(object, metaclass=SingletonType):
+    """
+    DataCleanup
+
+    Removes entries for files that no longer exist on disk.
+
+    The sweep runs in a background thread so that it never blocks a library scan.
+    Rows are walked in batches ordered by ID (keyset pagination), and the files of each batch are grouped by directory
+    so that each directory is listed only once with os.scandir.
+    Each sweep has a time budget. If the budget runs out, the next sweep continues from the last checked row.
+    """
+
+    # Minimum time between the start of each sweep
+    sweep_interval = 60
+    # Maximum time that a single sweep may run for
+    time_budget = 30
+    batch_size = 500
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.last_run = None
+        self.last_id = 0
+
+    def start_background_sweep(self):
+        """
+        Start a sweep in a background thread if one is due and no other sweep is running
+
+        :return:
+        """
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            if self.last_run is not None and (time.monotonic() - self.last_run) < self.sweep_interval:
+                return
+            self.last_run = time.monotonic()
+            self.thread = threading.Thread(target=self.sweep, name='VideoLibraryStatsCleanup', daemon=True)
+            self.thread.start()
+
+    @staticmethod
+    def find_missing_files(rows):
+        """
+        Return the IDs of the rows whose files no longer exist.
+        Each directory is listed once. Directories that cannot be read (other than those that no longer exist)
+        are skipped so that an unavailable network share does not remove its entries.
+
+        :param rows:
+        :return:
+        """
+        rows_by_directory = {}
+        for row in rows:
+            abspath = os.path.abspath(row['abspath'])
+            rows_by_directory.setdefault(os.path.dirname(abspath), []).append((row['id'], os.path.basename(abspath)))
+
+        missing_ids = []
+        for directory, directory_rows in rows_by_directory.items():
+            try:
+                with os.scandir(directory) as entries:
+                    file_names = set(entry.name for entry in entries)
+            except FileNotFoundError:
+                file_names = set()
+            except OSError as e:
+                logger.debug("Unable to list directory '{}' - {}".format(directory, e))
+                continue
+            for row_id, basename in directory_rows:
+                if basename not in file_names:
+                    logger.info("Removing link in db because the file longer exists on disk: '{}'".format(
+                        os.path.join(directory, basename)))
+                    missing_ids.append(row_id)
+        return missing_ids
+
+    def sweep(self):
+        """
+        Check the database for files that no longer exist on disk and remove them
+
+        :return:
+        """
+        # Write any pending file data before checking for removed files
+        VideoFileWriter().flush()
+
+        deadline = time.monotonic() + self.time_budget
+        removed = 0
         try:
-            # First try to add the abs path
-            VideoFile.create(
-                abspath=abspath,
-                basename=os.path.basename(abspath),
-                container_name=container_name,
-                video_codec=video_codec,
-                video_width=video_width,
-                video_height=video_height,
-            )
-        except IntegrityError:
-            video_file = VideoFile.select().where(VideoFile.abspath == abspath).limit(1).get()
-            video_file.last_tested = datetime.datetime.now()
-            video_file.basename = os.path.basename(abspath)
-            video_file.container_name = container_name
-            video_file.video_codec = video_codec
-            video_file.video_width = video_width
-            video_file.video_height = video_height
-            video_file.save()
-            return True
+            while time.monotonic() < deadline:
+                query = VideoFile.select(VideoFile.id, VideoFile.abspath)
+                query = query.where(VideoFile.id > self.last_id)
+                query = query.order_by(VideoFile.id)
+                query = query.limit(self.batch_size)
+                rows = list(query.dicts())
+                if not rows:
+                    # Reached the end of the table. Start from the beginning on the next sweep
+                    self.last_id = 0
+                    break
+
+                missing_ids = self.find_missing_files(rows)
+                if missing_ids:
+                    VideoFile.delete().where(VideoFile.id.in_(missing_ids)).execute()
+                    Data.mark_written()
+                    removed += len(missing_ids)
+                self.last_id = rows[-1]['id']
         except Exception:
-            logger.exception("Failed to save video metrics for file: '{}'".format(abspath))
-            return False
+            logger.exception("Failed to remove outdated video file stats")
+        if removed:
+            logger.debug("Removed {} outdated video file stats entries".format(removed))
 
+        LibrarySnapshots().take_snapshot_if_due()
 
-class DataCleanup(object, metaclass=SingletonType):
-    last_run = None
 
-    def test_outdated_files_still_exist(self):
+def pack_snapshot_counters(rows):
+    """
+    Pack the counters of a snapshot into a compressed JSON list of [dimension, value, count, total_size] items
+
+    :param rows:
+    :return:
+    """
+    counters = [[row['dimension'], row['value'], row['count'], row['total_size']] for row in rows]
+    return zlib.compress(json.dumps(counters, separators=(',', ':')).encode('utf-8'))
+
+
+def group_snapshot_counters(items):
+    """
+    Group a list of [dimension, value, count, total_size] items into a dictionary of
+    {dimension: {value: {'count', 'total_size'}}}
+
+    :param items:
+    :return:
+    """
+    counters = {}
+    for dimension, value, count, total_size in items:
+        counters.setdefault(dimension, {})[value] = {'count': count, 'total_size': total_size}
+    return counters
+
+
+def unpack_snapshot_counters(packed):
+    """
+    Unpack the counters packed by pack_snapshot_counters
+
+    :param packed:
+    :return:
+    """
+    return group_snapshot_counters(json.loads(zlib.decompress(bytes(packed)).decode('utf-8')))
+
+
+class LibrarySnapshots(object, metaclass=SingletonType):
+    """
+    LibrarySnapshots
+
+    Periodically records the aggregate counts and sizes of the library so that changes can be measured over time.
+
+    Each snapshot is read from the maintained videofile_stats aggregates, so taking one does not scan the videofile
+    table. A snapshot is only stored if the library has changed since the previous snapshot.
+    """
+
+    # Minimum time between snapshots
+    snapshot_interval = 60 * 60
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_run = None
+
+    @staticmethod
+    def get_current_counters():
+        query = VideoFileStat.select(VideoFileStat.dimension,
+                                     VideoFileStat.value,
+                                     VideoFileStat.count,
+                                     VideoFileStat.total_size)
+        query = query.order_by(VideoFileStat.dimension, VideoFileStat.sort_order, VideoFileStat.value)
+        return list(query.dicts())
+
+    def take_snapshot_if_due(self):
         """
-        Check database for any outdated files
-        If there are any, ensure that these files still exist on disk
-        If they do not exist on disk, remove them
+        Take a snapshot if the snapshot interval has passed since the last one
 
         :return:
         """
-        lock = threading.RLock()
-        lock.acquire()
+        with self.lock:
+            if self.last_run is not None and (time.monotonic() - self.last_run) < self.snapshot_interval:
+                return
+            self.last_run = time.monotonic()
+        try:
+            self.take_snapshot()
+        except Exception:
+            logger.exception("Failed to take a video library stats snapshot")
 
-        # Only run this check once a min
-        # This prevents multiple threads from running it before the SqliteQueueDatabase can commit any deletes
-        x_min_ago = datetime.datetime.now() - datetime.timedelta(minutes=1)
-        if self.last_run is None:
-            self.last_run = x_min_ago
-        if self.last_run > x_min_ago:
-            lock.release()
-            return
+    def take_snapshot(self):
+        """
+        Store a snapshot of the current aggregates unless they are unchanged since the last snapshot
 
-        # Fetch items that are more than a day old since last checked
-        db_data = Data()
-        # outdated_file_paths = db_data.fetch_outdated_file_paths()
-        all_file_paths = db_data.fetch_all_video_file_data()
+        :return: The ID of the new snapshot, or None if nothing changed
+        """
+        rows = self.get_current_counters()
+        counters = pack_snapshot_counters(rows)
+        last_snapshot = LibrarySnapshot.select(LibrarySnapshot.counters).order_by(LibrarySnapshot.id.desc()).first()
+        if last_snapshot is not None and bytes(last_snapshot.counters) == counters:
+            return None
+        # Every file has a container name, so the container totals are the library totals
+        container_rows = [row for row in rows if row['dimension'] == 'container_name']
+        snapshot_id = LibrarySnapshot.insert(
+            file_count=sum(row['count'] for row in container_rows),
+            total_size=sum(row['total_size'] for row in container_rows),
+            counters=counters,
+        ).execute()
+        Data.mark_written()
+        logger.debug("Saved video library stats snapshot {}".format(snapshot_id))
+        return snapshot_id
+
+    def get_snapshots(self, limit=100):
+        """
+        Fetch the most recent snapshots in the order they were taken, including the total size of each video codec
 
-        # Loop over these items and ensure that their paths still exist on disk
-        for item in all_file_paths:
-            abspath = os.path.abspath(item.abspath)
-            if not os.path.exists(abspath):
-                # This item does not exist any longer, remove it from the database
-                logger.info("Removing link in db because the file longer exists on disk: '{}'".format(abspath))
-                item.delete_instance()
+        :param limit:
+        :return:
+        """
+        query = LibrarySnapshot.select().order_by(LibrarySnapshot.taken_at.desc(), LibrarySnapshot.id.desc())
+        query = query.limit(limit)
+        snapshots = []
+        for snapshot in query:
+            counters = unpack_snapshot_counters(snapshot.counters)
+            snapshots.append({
+                'id':           snapshot.id,
+                'taken_at':     snapshot.taken_at.strftime('%Y-%m-%d %H:%M'),
+                'file_count':   snapshot.file_count,
+                'total_size':   snapshot.total_size,
+                'video_codecs': {
+                    value: item['total_size'] for value, item in counters.get('video_codec', {}).items()
+                },
+            })
+        snapshots.reverse()
+        return snapshots
+
+    def get_snapshot_diff(self, from_id, to_id=None):
+        """
+        Compare the counters of two snapshots.
+        If no 'to' snapshot is given, the first snapshot is compared with the current aggregates.
 
-        # Mark the last run as now and release the lock
-        self.last_run = datetime.datetime.now()
-        lock.release()
+        :param from_id:
+        :param to_id:
+        :return:
+        """
+        from_snapshot = LibrarySnapshot.get_or_none(LibrarySnapshot.id == from_id)
+        if from_snapshot is None:
+            raise ValueError("Snapshot '{}' does not exist".format(from_id))
+        from_counters = unpack_snapshot_counters(from_snapshot.counters)
+        if to_id:
+            to_snapshot = LibrarySnapshot.get_or_none(LibrarySnapshot.id == to_id)
+            if to_snapshot is None:
+                raise ValueError("Snapshot '{}' does not exist".format(to_id))
+            to_counters = unpack_snapshot_counters(to_snapshot.counters)
+            to_taken_at = to_snapshot.taken_at
+        else:
+            to_counters = group_snapshot_counters(
+                [row['dimension'], row['value'], row['count'], row['total_size']] for row in self.get_current_counters())
+            to_taken_at = datetime.datetime.now()
+
+        dimensions = {}
+        for dimension in ('container_name', 'video_codec', 'resolution'):
+            before = from_counters.get(dimension, {})
+            after = to_counters.get(dimension, {})
+            changes = []
+            for value in sorted(set(before) | set(after)):
+                item_before = before.get(value, {'count': 0, 'total_size': 0})
+                item_after = after.get(value, {'count': 0, 'total_size': 0})
+                if item_before == item_after:
+                    continue
+                changes.append({
+                    'value':             value,
+                    'count_before':      item_before['count'],
+                    'count_after':       item_after['count'],
+                    'count_change':      item_after['count'] - item_before['count'],
+                    'total_size_before': item_before['total_size'],
+                    'total_size_after':  item_after['total_size'],
+                    'total_size_change': item_after['total_size'] - item_before['total_size'],
+                })
+            changes.sort(key=lambda item: abs(item['total_size_change']), reverse=True)
+            dimensions[dimension] = changes
+
+        total_size_before = sum(item['total_size'] for item in from_counters.get('container_name', {}).values())
+        total_size_after = sum(item['total_size'] for item in to_counters.get('container_name', {}).values())
+        weeks = (to_taken_at - from_snapshot.taken_at).total_seconds() / (7 * 24 * 60 * 60)
+        total_size_change = total_size_after - total_size_before
+        return {
+            'from_taken_at':              from_snapshot.taken_at.strftime('%Y-%m-%d %H:%M'),
+            'to_taken_at':                to_taken_at.strftime('%Y-%m-%d %H:%M'),
+            'total_size_change':          total_size_change,
+            'total_size_change_per_week': int(total_size_change / weeks) if weeks > 0 else None,
+            'dimensions':                 dimensions,
+        }
+
+
+IMAGE_VIDEO_CODECS = [
+    'alias_pix',
+    'apng',
+    'brender_pix',
+    'dds',
+    'dpx',
+    'exr',
+    'fits',
+    'gif',
+    'mjpeg',
+    'mjpegb',
+    'pam',
+    'pbm',
+    'pcx',
+    'pfm',
+    'pgm',
+    'pgmyuv',
+    'pgx',
+    'photocd',
+    'pictor',
+    'pixlet',
+    'png',
+    'ppm',
+    'ptx',
+    'sgi',
+    'sunrast',
+    'tiff',
+    'vc1image',
+    'wmv3image',
+    'xbm',
+    'xface',
+    'xpm',
+    'xwd',
+]
 
 
 def get_video_codec_and_resolution_from_streams(file_probe: dict):
-    image_video_codecs = [
-        'alias_pix',
-        'apng',
-        'brender_pix',
-        'dds',
-        'dpx',
-        'exr',
-        'fits',
-        'gif',
-        'mjpeg',
-        'mjpegb',
-        'pam',
-        'pbm',
-        'pcx',
-        'pfm',
-        'pgm',
-        'pgmyuv',
-        'pgx',
-        'photocd',
-        'pictor',
-        'pixlet',
-        'png',
-        'ppm',
-        'ptx',
-        'sgi',
-        'sunrast',
-        'tiff',
-        'vc1image',
-        'wmv3image',
-        'xbm',
-        'xface',
-        'xpm',
-        'xwd',
-    ]
     # Require a list of probe streams to continue
     file_probe_streams = file_probe.get('streams', [])
     if not file_probe_streams:
@@ -322,7 +1495,7 @@ def get_video_codec_and_resolution_from_streams(file_probe: dict):
         # Check if this is a video stream
         if stream_info.get('codec_type').lower() == "video":
             # If this is a image stream - ignore it
-            if stream_info.get('codec_name').lower() in image_video_codecs:
+            if stream_info.get('codec_name').lower() in IMAGE_VIDEO_CODECS:
                 continue
             codec_name = stream_info.get('codec_name', '')
             codec_long_name = stream_info.get('codec_long_name')
@@ -335,11 +1508,300 @@ def get_video_codec_and_resolution_from_streams(file_probe: dict):
     return 'No Video Codec', None, None
 
 
-def generate_all_video_stats(data):
-    arguments = data.get('arguments')
+def parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_frame_rate(value):
+    """
+    Parse an FFprobe frame rate such as '24000/1001'
+
+    :param value:
+    :return:
+    """
+    if not value or '/' not in str(value):
+        return parse_float(value)
+    numerator, denominator = str(value).split('/', 1)
+    numerator, denominator = parse_float(numerator), parse_float(denominator)
+    if not numerator or not denominator:
+        return None
+    return numerator / denominator
+
+
+def get_stream_bit_rate(stream_info: dict):
+    """
+    Return the bitrate of a stream. Matroska files store this in the statistics tags instead of the stream data.
+
+    :param stream_info:
+    :return:
+    """
+    bit_rate = parse_int(stream_info.get('bit_rate'))
+    if bit_rate:
+        return bit_rate
+    tags = stream_info.get('tags', {})
+    for key in ('BPS', 'BPS-eng'):
+        bit_rate = parse_int(tags.get(key))
+        if bit_rate:
+            return bit_rate
+    return None
+
+
+def get_file_metrics(abspath: str, file_probe: dict):
+    """
+    Collect the size, duration, bitrates and audio data of a file for the savings analytics
+
+    :param abspath:
+    :param file_probe:
+    :return:
+    """
+    file_format = file_probe.get('format', {})
+    file_size = parse_int(file_format.get('size'))
+    if file_size is None:
+        try:
+            file_size = os.path.getsize(abspath)
+        except OSError:
+            file_size = None
+    duration = parse_float(file_format.get('duration'))
+    bit_rate = parse_int(file_format.get('bit_rate'))
+    if not bit_rate and file_size and duration:
+        bit_rate = int(file_size * 8 / duration)
+
+    video_stream = None
+    audio_codecs = []
+    audio_channels = None
+    audio_bit_rates = []
+    for stream_info in file_probe.get('streams', []):
+        codec_type = str(stream_info.get('codec_type', '')).lower()
+        if codec_type == 'video' and video_stream is None:
+            if str(stream_info.get('codec_name', '')).lower() not in IMAGE_VIDEO_CODECS:
+                video_stream = stream_info
+        elif codec_type == 'audio':
+            codec_name = stream_info.get('codec_name')
+            if codec_name and codec_name not in audio_codecs:
+                audio_codecs.append(codec_name)
+            channels = parse_int(stream_info.get('channels'))
+            if channels:
+                audio_channels = max(audio_channels or 0, channels)
+            audio_bit_rates.append(get_stream_bit_rate(stream_info))
+
+    metrics = {
+        'file_size':      file_size,
+        'duration':       duration,
+        'bit_rate':       bit_rate,
+        'audio_codecs':   ','.join(audio_codecs) if audio_codecs else None,
+        'audio_channels': audio_channels,
+    }
+    if video_stream is not None:
+        video_bit_rate = get_stream_bit_rate(video_stream)
+        if not video_bit_rate and bit_rate and all(audio_bit_rates):
+            # Estimate the video bitrate as the remainder of the overall bitrate once all audio is accounted for
+            video_bit_rate = max(0, bit_rate - sum(audio_bit_rates)) or None
+        metrics['video_codec_name'] = video_stream.get('codec_name')
+        metrics['video_bit_rate'] = video_bit_rate
+        metrics['video_frame_rate'] = parse_frame_rate(video_stream.get('avg_frame_rate')) or parse_frame_rate(
+            video_stream.get('r_frame_rate'))
+    return metrics
+
+
+def get_task_details(abspath: str):
+    """
+    Read the processing time and the names of the worker plugin runners of a task from the Unmanic task queue.
+    The task is still in the queue while the post-processor task result runners are run.
+
+    :param abspath:
+    :return: A tuple of the wall time in seconds (or None) and the list of plugin names
+    """
+    try:
+        from unmanic.libs.unmodels import Tasks
+        task = Tasks.get_or_none(Tasks.abspath == abspath)
+    except Exception as e:
+        logger.debug("Unable to read the task details of '{}' - {}".format(abspath, e))
+        return None, []
+    if task is None:
+        return None, []
+
+    def timestamp(value):
+        if isinstance(value, datetime.datetime):
+            return value.timestamp()
+        return parse_float(value)
+
+    wall_time = None
+    start_time, finish_time = timestamp(task.start_time), timestamp(task.finish_time)
+    if start_time is not None and finish_time is not None and finish_time >= start_time:
+        wall_time = finish_time - start_time
+
+    # The worker logs a header for each pass of each plugin runner
+    plugin_names = []
+    for name in re.findall(r"RUNNER: \n(.+?) \[Pass #\d+\]", task.log or ''):
+        if name not in plugin_names:
+            plugin_names.append(name)
+    return wall_time, plugin_names
+
+
+def estimate_savings(row: dict):
+    """
+    Estimate the number of bytes that transcoding the video stream of a file would save.
+
+    The target bitrate is the target bits per pixel for the file's video codec multiplied by the number of pixels
+    per second. Returns 0 if the file is already at or below its target, or None if the required data is unknown.
+
+    :param row:
+    :return:
+    """
+    width = row.get('video_width')
+    height = row.get('video_height')
+    frame_rate = row.get('video_frame_rate')
+    video_bit_rate = row.get('video_bit_rate')
+    duration = row.get('duration')
+    if not (width and height and frame_rate and video_bit_rate and duration):
+        return None
+    target_bits_per_pixel = SAVINGS_TARGET_BITS_PER_PIXEL.get(
+        str(row.get('video_codec_name', '')).lower(), SAVINGS_DEFAULT_TARGET_BITS_PER_PIXEL)
+    target_bit_rate = target_bits_per_pixel * width * height * frame_rate
+    return int(max(0.0, video_bit_rate - target_bit_rate) * duration / 8)
+
+
+class PanelPayloadCache(object, metaclass=SingletonType):
+    """
+    PanelPayloadCache
+
+    Memoizes the JSON payloads of the data panel for a short time.
+    Payloads are keyed by the request type, the path filter and the data version, so a payload is never served
+    after the database has been written to. The TTL only limits how long unused payloads are kept in memory.
+    """
+
+    ttl = 30
+    max_entries = 64
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get(self, key, builder):
+        """
+        Return the memoized payload for a key, or build and store it
+
+        :param key:
+        :param builder:
+        :return:
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        payload = builder()
+        with self.lock:
+            # Drop expired entries, and the oldest entries if there are still too many
+            self.entries = {k: v for k, v in self.entries.items() if v[0] > now}
+            while len(self.entries) >= self.max_entries:
+                del self.entries[min(self.entries, key=lambda k: self.entries[k][0])]
+            self.entries[key] = (now + self.ttl, payload)
+        return payload
+
+
+def generate_panel_payload(data, name, builder):
+    """
+    Build the JSON payload for a data panel request.
+
+    Every payload includes a 'version' of the data it was built from. If the request's 'version' argument matches the
+    current version, a small payload marked 'unchanged' is returned instead so the client can keep what it has.
+
+    :param data:
+    :param name:
+    :param builder: A function that takes the path filter and returns the payload data
+    :return:
+    """
+    arguments = data.get('arguments', {})
     filter = arguments.get('filter')
     if filter:
         filter = str(filter[0].decode("utf-8"))
+    client_version = arguments.get('version')
+    if client_version:
+        client_version = str(client_version[0].decode("utf-8"))
+
+    # Write any pending file data first so that it is included in the version
+    VideoFileWriter().flush()
+    version = Data.get_data_version()
+    if client_version == version:
+        return json.dumps({'version': version, 'unchanged': True})
+
+    def build():
+        payload = builder(filter)
+        payload['version'] = version
+        return json.dumps(payload, separators=(',', ':'))
+
+    return PanelPayloadCache().get((name, filter, version), build)
+
+
+def generate_file_page(data):
+    arguments = data.get('arguments', {})
+
+    def argument(name, default=None):
+        value = arguments.get(name)
+        return str(value[0].decode("utf-8")) if value else default
+
+    options = {
+        'sort':           argument('sort', 'file_size'),
+        'order':          argument('order', 'desc'),
+        'video_codec':    argument('video_codec'),
+        'container_name': argument('container_name'),
+        'resolution':     argument('resolution'),
+        'cursor':         argument('cursor'),
+        'limit':          max(1, min(500, int(argument('limit', 50)))),
+    }
+    key = ('files',) + tuple(sorted(options.items()))
+    return generate_panel_payload(data, key, lambda filter: Data().get_file_page(filter, **options))
+
+
+def generate_snapshots(data):
+    # Snapshots are of the whole library, so the path filter does not apply
+    return generate_panel_payload(data, 'snapshots', lambda filter: {
+        'snapshots': LibrarySnapshots().get_snapshots(),
+    })
+
+
+def generate_snapshot_diff(data):
+    arguments = data.get('arguments', {})
+    if not arguments.get('from'):
+        raise ValueError("A 'from' snapshot ID is required")
+    from_id = int(arguments.get('from')[0].decode("utf-8"))
+    to_id = arguments.get('to')
+    to_id = int(to_id[0].decode("utf-8")) if to_id and to_id[0] else None
+    return generate_panel_payload(data, ('snapshotDiff', from_id, to_id),
+                                  lambda filter: LibrarySnapshots().get_snapshot_diff(from_id, to_id))
+
+
+def generate_directory_rollups(data):
+    arguments = data.get('arguments', {})
+    parent = arguments.get('parent')
+    parent = str(parent[0].decode("utf-8")) if parent and parent[0] else '/'
+    video_codec = arguments.get('video_codec')
+    video_codec = str(video_codec[0].decode("utf-8")) if video_codec and video_codec[0] else None
+    return generate_panel_payload(data, ('directories', parent, video_codec),
+                                  lambda filter: Data().get_directory_rollups(parent, video_codec))
+
+
+def generate_processing_returns(data):
+    # The ledger covers all processed tasks, so the path filter does not apply
+    return generate_panel_payload(data, 'processingReturns', lambda filter: Data().get_processing_returns())
+
+
+def generate_savings_ranking(data):
+    return generate_panel_payload(data, 'savings', lambda filter: Data().get_savings_ranking(filter))
+
+
+def build_all_video_stats(filter):
     db_data = Data()
 
     container_names = db_data.get_container_names(filter)
@@ -354,7 +1816,69 @@ def generate_all_video_stats(data):
         'top_file_paths':    top_file_paths,
     }
 
-    return json.dumps(return_data, indent=2)
+    return return_data
+
+
+def generate_all_video_stats(data):
+    return generate_panel_payload(data, 'videoStats', build_all_video_stats)
+
+
+@functools.lru_cache(maxsize=None)
+def get_static_content_hash():
+    """
+    Generate a hash of the panel's static files and vendor package versions for use as a cache buster.
+    Assets only change when the plugin is updated, so this is calculated once per process.
+
+    :return:
+    """
+    plugin_directory = os.path.dirname(os.path.abspath(__file__))
+    static_hash = hashlib.sha1()
+    paths = [os.path.join(plugin_directory, 'package-lock.json')]
+    for root, dirs, files in os.walk(os.path.join(plugin_directory, 'static')):
+        # The vendor directory contents are covered by the package lock file
+        dirs[:] = sorted(d for d in dirs if d != 'vendor')
+        paths += [os.path.join(root, f) for f in sorted(files)]
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                static_hash.update(f.read())
+        except OSError:
+            continue
+    return static_hash.hexdigest()[:12]
+
+
+@functools.lru_cache(maxsize=None)
+def get_panel_template():
+    """
+    Read the panel HTML template once and apply the cache buster.
+    A stable page also allows the web server to answer repeat requests with its ETag and a '304 Not Modified'.
+
+    :return:
+    """
+    with open(os.path.abspath(os.path.join(os.path.dirname(__file__), 'static', 'index.html'))) as f:
+        return f.read().replace("{cache_buster}", get_static_content_hash())
+
+
+def save_file_stats(abspath: str):
+    """
+    Probe a file and save its data to the database
+
+    :param abspath:
+    :return: The file's metrics (see get_file_metrics), or None if the file could not be probed
+    """
+    probe = Probe(logger, allowed_mimetypes=['video'])
+    if not probe.file(abspath):
+        return None
+
+    file_probe = probe.get_probe()
+
+    container_name = file_probe.get('format', {}).get('format_long_name')
+    video_codec, video_width, video_height = get_video_codec_and_resolution_from_streams(file_probe)
+    metrics = get_file_metrics(abspath, file_probe)
+
+    db_data = Data()
+    db_data.save_video_file_item(abspath, container_name, video_codec, video_width, video_height, metrics=metrics)
+    return metrics
 
 
 def on_library_management_file_test(data):
@@ -373,24 +1897,85 @@ def on_library_management_file_test(data):
     # Get the path to the file
     abspath = data.get('path')
 
-    # Get file probe
-    probe = Probe(logger, allowed_mimetypes=['video'])
-    if not probe.file(abspath):
+    # Add this file's data to the database
+    if save_file_stats(abspath) is None:
         # File probe failed, skip the rest of this test
         return data
 
-    file_probe = probe.get_probe()
+    # Remove files that no longer exist (runs in the background at most once a minute)
+    data_cleanup = DataCleanup()
+    data_cleanup.start_background_sweep()
 
-    container_name = file_probe.get('format', {}).get('format_long_name')
-    video_codec, video_width, video_height = get_video_codec_and_resolution_from_streams(file_probe)
+    return data
 
-    # Remove files that no longer exist (tested only once a day)
-    data_cleanup = DataCleanup()
-    data_cleanup.test_outdated_files_still_exist()
 
-    # Add this file's data to the database
+def on_postprocessor_task_results(data):
+    """
+    Runner function - provides a means for additional postprocessor functions based on the task success.
+
+    The 'data' object argument includes:
+        library_id                      - The library that the current task is associated with
+        task_processing_success         - Boolean, did all task processes complete successfully.
+        file_move_processes_success     - Boolean, did all postprocessor movement tasks complete successfully.
+        destination_files               - List containing all file paths created by postprocessor file movements.
+        source_data                     - Dictionary containing data pertaining to the original source file.
+
+    :param data:
+    :return:
+    
+    """
+    source_abspath = data.get('source_data', {}).get('abspath')
+    if not source_abspath:
+        return data
+
+    # The source file may already have been replaced, so its size and codec are read from the stats recorded
+    # when it was last scanned
     db_data = Data()
-    db_data.save_video_file_item(abspath, container_name, video_codec, video_width, video_height)
+    VideoFileWriter().flush()
+    source_row = VideoFile.get_or_none(VideoFile.abspath == source_abspath)
+    source_size = None
+    source_video_codec = None
+    if source_row is not None:
+        source_size = source_row.file_size
+        source_video_codec = source_row.video_codec_name or source_row.video_codec
+    if source_size is None and source_abspath not in data.get('destination_files', []):
+        # The file was not scanned. Its size can still be read if it was not replaced
+        try:
+            source_size = os.path.getsize(source_abspath)
+        except OSError:
+            pass
+
+    entry = {
+        'library_id':         data.get('library_id'),
+        'source_path':        source_abspath,
+        'success':            bool(data.get('task_processing_success') and data.get('file_move_processes_success')),
+        'source_size':        source_size,
+        'source_video_codec': source_video_codec,
+    }
+
+    if entry['success']:
+        # Refresh the stats of the new files. The first video file is the task's output
+        for destination in data.get('destination_files', []):
+            metrics = save_file_stats(destination)
+            if metrics is not None and entry.get('destination_path') is None:
+                entry['destination_path'] = destination
+                entry['destination_size'] = metrics.get('file_size')
+                entry['destination_video_codec'] = metrics.get('video_codec_name')
+        if entry.get('destination_path') != source_abspath and not os.path.exists(source_abspath):
+            # The source file was removed by the post-processor
+            VideoFile.delete().where(VideoFile.abspath == source_abspath).execute()
+            Data.mark_written()
+        if entry['source_size'] is not None and entry.get('destination_size') is not None:
+            entry['size_saved'] = entry['source_size'] - entry['destination_size']
+
+    wall_time, plugin_names = get_task_details(source_abspath)
+    entry['wall_time'] = wall_time
+    entry['plugin_chain'] = PLUGIN_CHAIN_SEPARATOR.join(plugin_names)
+
+    try:
+        db_data.record_task_result(entry)
+    except Exception:
+        logger.exception("Failed to record the savings of task '{}'".format(source_abspath))
 
     return data
 
@@ -400,9 +1985,37 @@ def render_frontend_panel(data):
         data['content_type'] = 'application/json'
         data['content'] = generate_all_video_stats(data)
         return
+    if data.get('path') in ['files', '/files', '/files/']:
+        data['content_type'] = 'application/json'
+        try:
+            data['content'] = generate_file_page(data)
+        except ValueError as e:
+            data['content'] = json.dumps({'error': str(e)})
+        return
+    if data.get('path') in ['snapshots', '/snapshots', '/snapshots/']:
+        data['content_type'] = 'application/json'
+        data['content'] = generate_snapshots(data)
+        return
+    if data.get('path') in ['snapshotDiff', '/snapshotDiff', '/snapshotDiff/']:
+        data['content_type'] = 'application/json'
+        try:
+            data['content'] = generate_snapshot_diff(data)
+        except ValueError as e:
+            data['content'] = json.dumps({'error': str(e)})
+        return
+    if data.get('path') in ['directories', '/directories', '/directories/']:
+        data['content_type'] = 'application/json'
+        data['content'] = generate_directory_rollups(data)
+        return
+    if data.get('path') in ['processingReturns', '/processingReturns', '/processingReturns/']:
+        data['content_type'] = 'application/json'
+        data['content'] = generate_processing_returns(data)
+        return
+    if data.get('path') in ['savings', '/savings', '/savings/']:
+        data['content_type'] = 'application/json'
+        data['content'] = generate_savings_ranking(data)
+        return
 
-    with open(os.path.abspath(os.path.join(os.path.dirname(__file__), 'static', 'index.html'))) as f:
-        content = f.read()
-        data['content'] = content.replace("{cache_buster}", str(uuid.uuid4()))
+    data['content'] = get_panel_template()
 
     return data
@@ -178,13 +178,26 @@ var VideoStats = function () {
         }
     }
 
+    // The version of the data currently displayed and the filter it was fetched with
+    let lastVersion = '';
+    let lastFilter = null;
+
     const fetchVideoStats = function () {
         let filter = encodeURI(document.getElementById("pathFilter").value);
-        jQuery.get('videoStats?filter=' + filter, function (data) {
+        // Only send the current version if the filter has not changed
+        let version = (filter === lastFilter) ? lastVersion : '';
+        jQuery.get('videoStats?filter=' + filter + '&version=' + version, function (data) {
+            lastFilter = filter;
+            lastVersion = data.version;
+            if (data.unchanged) {
+                return;
+            }
             processContainerNames(data.container_names)
             processVideoCodecs(data.video_codecs)
             processResoloutions(data.video_resolutions)
             processTopPathsList(data.top_file_paths)
+            FileBrowser.setFilterOptions(data)
+            DirectoryStats.setFilterOptions(data)
         });
     };
 
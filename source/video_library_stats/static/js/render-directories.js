@@ -0,0 +1,144 @@
+var DirectoryStats = function () {
+
+    // Format a number of bytes as a human readable size
+    const formatBytes = function (bytes) {
+        if (!bytes) {
+            return '-';
+        }
+        const units = ['B', 'KB', 'MB', 'GB', 'TB', 'PB'];
+        let i = Math.min(Math.floor(Math.log(bytes) / Math.log(1024)), units.length - 1);
+        return (bytes / Math.pow(1024, i)).toFixed(i > 1 ? 1 : 0) + ' ' + units[i];
+    };
+
+    // The directory currently being browsed
+    let parent = '/';
+    // The version of the data currently displayed and the query it was fetched with
+    let lastVersion = '';
+    let lastQuery = null;
+
+    // Replace the options of a select element, keeping the current selection if it is still available
+    const setSelectOptions = function (select, values) {
+        let selected = select.value;
+        select.innerHTML = '';
+        let option = document.createElement("option");
+        option.value = '';
+        option.appendChild(document.createTextNode('All codecs'));
+        select.appendChild(option);
+        for (let i = 0; i < values.length; i++) {
+            option = document.createElement("option");
+            option.value = values[i];
+            option.appendChild(document.createTextNode(values[i]));
+            if (values[i] === selected) {
+                option.selected = true;
+            }
+            select.appendChild(option);
+        }
+    };
+
+    // Render the parent path as a list of links to each of its ancestor directories
+    const processBreadcrumb = function (path) {
+        let breadcrumb = document.getElementById("directoryBreadcrumb");
+        breadcrumb.innerHTML = '';
+        let names = path.split('/').filter(function (name) {
+            return name !== '';
+        });
+        let ancestor = '/';
+        for (let i = -1; i < names.length; i++) {
+            if (i >= 0) {
+                ancestor += names[i] + '/';
+            }
+            let li = document.createElement("li");
+            li.className = 'breadcrumb-item';
+            let label = (i < 0) ? '/' : names[i];
+            if (i === names.length - 1) {
+                li.className += ' active';
+                li.appendChild(document.createTextNode(label));
+            } else {
+                let a = document.createElement("a");
+                a.href = '#';
+                a.dataset.path = ancestor;
+                a.appendChild(document.createTextNode(label));
+                a.addEventListener('click', openDirectory);
+                li.appendChild(a);
+            }
+            breadcrumb.appendChild(li);
+        }
+    };
+
+    const processCodecSummary = function (codecs) {
+        let summary = document.getElementById("directoryCodecs");
+        summary.innerHTML = '';
+        for (let i = 0; i < codecs.length; i++) {
+            let item = codecs[i];
+            let span = document.createElement("span");
+            span.className = 'badge badge-light mr-2';
+            span.appendChild(document.createTextNode(
+                item.video_codec + ': ' + item.count + ' files, ' + formatBytes(item.total_size)
+            ));
+            summary.appendChild(span);
+        }
+    };
+
+    const processDirectoriesList = function (directories) {
+        let tbody = document.getElementById("directoryList");
+        // Clear out list
+        tbody.innerHTML = '';
+        for (let i = 0; i < directories.length; i++) {
+            let item = directories[i];
+            let tr = document.createElement("tr");
+            let td = document.createElement("td");
+            let a = document.createElement("a");
+            a.href = '#';
+            a.dataset.path = item.path;
+            a.appendChild(document.createTextNode(item.path.substring(parent.length)));
+            a.addEventListener('click', openDirectory);
+            td.appendChild(a);
+            tr.appendChild(td);
+            let values = [item.count, formatBytes(item.total_size)];
+            for (let j = 0; j < values.length; j++) {
+                td = document.createElement("td");
+                td.appendChild(document.createTextNode(values[j]));
+                tr.appendChild(td);
+            }
+            tbody.appendChild(tr);
+        }
+    };
+
+    const fetchDirectories = function () {
+        let query = 'parent=' + encodeURIComponent(parent) +
+            '&video_codec=' + encodeURIComponent(document.getElementById("directory_video_codec").value);
+        // Only send the current version if the query has not changed
+        let version = (query === lastQuery) ? lastVersion : '';
+        jQuery.get('directories?' + query + '&version=' + version, function (data) {
+            lastQuery = query;
+            lastVersion = data.version;
+            if (data.unchanged) {
+                return;
+            }
+            parent = data.parent;
+            processBreadcrumb(data.parent);
+            processCodecSummary(data.codecs);
+            processDirectoriesList(data.directories);
+        });
+    };
+
+    const openDirectory = function (event) {
+        event.preventDefault();
+        parent = event.currentTarget.dataset.path;
+        fetchDirectories();
+    };
+
+    return {
+        //main function to initiate the module
+        update: function () {
+            fetchDirectories();
+        },
+        // Populate the codec drop-down from the library stats
+        setFilterOptions: function (data) {
+            setSelectOptions(document.getElementById("directory_video_codec"), data.video_codecs.map(function (item) {
+                return item.video_codec;
+            }));
+        }
+    };
+
+}();
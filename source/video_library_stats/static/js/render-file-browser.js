@@ -0,0 +1,144 @@
+var FileBrowser = function () {
+
+    // Format a number of bytes as a human readable size
+    const formatBytes = function (bytes) {
+        if (!bytes) {
+            return '-';
+        }
+        const units = ['B', 'KB', 'MB', 'GB', 'TB', 'PB'];
+        let i = Math.min(Math.floor(Math.log(bytes) / Math.log(1024)), units.length - 1);
+        return (bytes / Math.pow(1024, i)).toFixed(i > 1 ? 1 : 0) + ' ' + units[i];
+    };
+
+    // Format a number of bits per second as a human readable bitrate
+    const formatBitRate = function (bitRate) {
+        if (!bitRate) {
+            return '-';
+        }
+        return (bitRate / 1000000).toFixed(2) + ' Mb/s';
+    };
+
+    const addTableRow = function (tbody, values) {
+        let tr = document.createElement("tr");
+        for (let i = 0; i < values.length; i++) {
+            let td = document.createElement("td");
+            td.appendChild(document.createTextNode(values[i]));
+            tr.appendChild(td);
+        }
+        tbody.appendChild(tr);
+    };
+
+    // Replace the options of a select element, keeping the current selection if it is still available
+    const setSelectOptions = function (select, values) {
+        let selected = select.value;
+        select.innerHTML = '';
+        let option = document.createElement("option");
+        option.value = '';
+        option.appendChild(document.createTextNode('All'));
+        select.appendChild(option);
+        for (let i = 0; i < values.length; i++) {
+            option = document.createElement("option");
+            option.value = values[i];
+            option.appendChild(document.createTextNode(values[i]));
+            if (values[i] === selected) {
+                option.selected = true;
+            }
+            select.appendChild(option);
+        }
+    };
+
+    const processFilesList = function (files) {
+        let tbody = document.getElementById("fileBrowserList");
+        // Clear out list
+        tbody.innerHTML = '';
+        for (let i = 0; i < files.length; i++) {
+            let item = files[i];
+            addTableRow(tbody, [
+                item.abspath,
+                item.container_name,
+                item.video_codec,
+                item.video_width + 'x' + item.video_height,
+                formatBytes(item.file_size),
+                formatBitRate(item.video_bit_rate),
+            ]);
+        }
+    };
+
+    // The cursors of each page up to the current page. The first page has no cursor
+    let pageCursors = [''];
+    let nextCursor = null;
+    // The version of the data currently displayed and the query it was fetched with
+    let lastVersion = '';
+    let lastQuery = null;
+
+    const buildQuery = function () {
+        let query = 'filter=' + encodeURI(document.getElementById("pathFilter").value);
+        let fields = ['sort', 'order', 'video_codec', 'container_name', 'resolution'];
+        for (let i = 0; i < fields.length; i++) {
+            let value = document.getElementById("fileBrowser_" + fields[i]).value;
+            query += '&' + fields[i] + '=' + encodeURIComponent(value);
+        }
+        query += '&cursor=' + encodeURIComponent(pageCursors[pageCursors.length - 1]);
+        return query;
+    };
+
+    const updatePageButtons = function () {
+        document.getElementById("fileBrowserPrevious").disabled = (pageCursors.length < 2);
+        document.getElementById("fileBrowserNext").disabled = !nextCursor;
+        document.getElementById("fileBrowserPage").textContent = 'Page ' + pageCursors.length;
+    };
+
+    const fetchFiles = function () {
+        let query = buildQuery();
+        // Only send the current version if the query has not changed
+        let version = (query === lastQuery) ? lastVersion : '';
+        jQuery.get('files?' + query + '&version=' + version, function (data) {
+            lastQuery = query;
+            lastVersion = data.version;
+            if (data.unchanged) {
+                return;
+            }
+            nextCursor = data.next_cursor;
+            processFilesList(data.files);
+            updatePageButtons();
+        });
+    };
+
+    return {
+        //main function to initiate the module
+        update: function () {
+            fetchFiles();
+        },
+        // Return to the first page (used when the filters or sort order change)
+        reset: function () {
+            pageCursors = [''];
+            nextCursor = null;
+            fetchFiles();
+        },
+        next: function () {
+            if (nextCursor) {
+                pageCursors.push(nextCursor);
+                fetchFiles();
+            }
+        },
+        previous: function () {
+            if (pageCursors.length > 1) {
+                pageCursors.pop();
+                fetchFiles();
+            }
+        },
+        // Populate the filter drop-downs from the library stats
+        setFilterOptions: function (data) {
+            setSelectOptions(document.getElementById("fileBrowser_video_codec"), data.video_codecs.map(function (item) {
+                return item.video_codec;
+            }));
+            setSelectOptions(document.getElementById("fileBrowser_container_name"), data.container_names.map(function (item) {
+                return item.container_name;
+            }));
+            setSelectOptions(document.getElementById("fileBrowser_resolution"), data.video_resolutions.map(function (item) {
+                return item.resolution;
+            }));
+        }
+    };
+
+}();
@@ -0,0 +1,135 @@
+var SavingsStats = function () {
+
+    // Format a number of bytes as a human readable size
+    const formatBytes = function (bytes) {
+        if (!bytes) {
+            return '-';
+        }
+        const units = ['B', 'KB', 'MB', 'GB', 'TB', 'PB'];
+        let i = Math.min(Math.floor(Math.log(bytes) / Math.log(1024)), units.length - 1);
+        return (bytes / Math.pow(1024, i)).toFixed(i > 1 ? 1 : 0) + ' ' + units[i];
+    };
+
+    const addTableRow = function (tbody, values) {
+        let tr = document.createElement("tr");
+        for (let i = 0; i < values.length; i++) {
+            let td = document.createElement("td");
+            td.appendChild(document.createTextNode(values[i]));
+            tr.appendChild(td);
+        }
+        tbody.appendChild(tr);
+    };
+
+    const processDirectoriesList = function (directories) {
+        let tbody = document.getElementById("savingsDirectoriesList");
+        // Clear out list
+        tbody.innerHTML = '';
+        for (let i = 0; i < directories.length; i++) {
+            let item = directories[i];
+            addTableRow(tbody, [
+                item.directory,
+                item.count,
+                formatBytes(item.file_size),
+                formatBytes(item.estimated_savings),
+            ]);
+        }
+    };
+
+    const processFilesList = function (files) {
+        let tbody = document.getElementById("savingsFilesList");
+        // Clear out list
+        tbody.innerHTML = '';
+        for (let i = 0; i < files.length; i++) {
+            let item = files[i];
+            addTableRow(tbody, [
+                item.abspath,
+                item.video_codec_name + ' ' + item.video_width + 'x' + item.video_height,
+                formatBytes(item.file_size),
+                formatBytes(item.estimated_savings),
+            ]);
+        }
+    };
+
+    // Format a number of seconds as hours
+    const formatHours = function (seconds) {
+        if (!seconds) {
+            return '-';
+        }
+        return (seconds / 3600).toFixed(1) + ' h';
+    };
+
+    const processChainsList = function (chains) {
+        let tbody = document.getElementById("processingChainsList");
+        // Clear out list
+        tbody.innerHTML = '';
+        for (let i = 0; i < chains.length; i++) {
+            let item = chains[i];
+            addTableRow(tbody, [
+                item.library_id,
+                item.plugin_chain || '-',
+                item.successful_tasks + ' / ' + item.tasks,
+                formatBytes(item.size_saved),
+                formatHours(item.wall_time),
+                item.gb_saved_per_hour === null ? '-' : item.gb_saved_per_hour,
+            ]);
+        }
+    };
+
+    const processPluginsList = function (plugins) {
+        let tbody = document.getElementById("processingPluginsList");
+        // Clear out list
+        tbody.innerHTML = '';
+        for (let i = 0; i < plugins.length; i++) {
+            let item = plugins[i];
+            addTableRow(tbody, [
+                item.plugin,
+                item.successful_tasks + ' / ' + item.tasks,
+                formatBytes(item.size_saved),
+                formatHours(item.wall_time),
+                item.gb_saved_per_hour === null ? '-' : item.gb_saved_per_hour,
+            ]);
+        }
+    };
+
+    // The version of the processing returns currently displayed
+    let lastReturnsVersion = '';
+
+    const fetchProcessingReturns = function () {
+        jQuery.get('processingReturns?version=' + lastReturnsVersion, function (data) {
+            lastReturnsVersion = data.version;
+            if (data.unchanged) {
+                return;
+            }
+            processChainsList(data.chains)
+            processPluginsList(data.plugins)
+        });
+    };
+
+    // The version of the data currently displayed and the filter it was fetched with
+    let lastVersion = '';
+    let lastFilter = null;
+
+    const fetchSavings = function () {
+        let filter = encodeURI(document.getElementById("pathFilter").value);
+        // Only send the current version if the filter has not changed
+        let version = (filter === lastFilter) ? lastVersion : '';
+        jQuery.get('savings?filter=' + filter + '&version=' + version, function (data) {
+            lastFilter = filter;
+            lastVersion = data.version;
+            if (data.unchanged) {
+                return;
+            }
+            processDirectoriesList(data.directories)
+            processFilesList(data.files)
+        });
+    };
+
+    return {
+        //main function to initiate the module
+        update: function () {
+            fetchSavings();
+            fetchProcessingReturns();
+        }
+    };
+
+}();
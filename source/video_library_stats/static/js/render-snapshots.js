@@ -0,0 +1,198 @@
+var SnapshotStats = function () {
+
+    // Format a number of bytes as a human readable size
+    const formatBytes = function (bytes) {
+        if (!bytes) {
+            return '0 B';
+        }
+        const units = ['B', 'KB', 'MB', 'GB', 'TB', 'PB'];
+        let sign = bytes < 0 ? '-' : '';
+        bytes = Math.abs(bytes);
+        let i = Math.min(Math.floor(Math.log(bytes) / Math.log(1024)), units.length - 1);
+        return sign + (bytes / Math.pow(1024, i)).toFixed(i > 1 ? 1 : 0) + ' ' + units[i];
+    };
+
+    const formatChange = function (value, formatter) {
+        let text = formatter ? formatter(value) : String(value);
+        return value > 0 ? '+' + text : text;
+    };
+
+    // Library size by video codec
+    let compositionChart = new Chart(document.getElementById("libraryComposition"), {
+        type: 'line',
+        data: {
+            labels: [],
+            datasets: [],
+        },
+        options: {
+            maintainAspectRatio: false,
+            tooltips: {
+                backgroundColor: "rgb(255,255,255)",
+                bodyFontColor: "#858796",
+                titleFontColor: "#6e707e",
+                borderColor: '#dddfeb',
+                borderWidth: 1,
+                xPadding: 15,
+                yPadding: 15,
+                caretPadding: 10,
+                mode: 'index',
+                intersect: false,
+                callbacks: {
+                    label: function (tooltipItem, chart) {
+                        let label = chart.datasets[tooltipItem.datasetIndex].label || '';
+                        return label + ': ' + formatBytes(tooltipItem.yLabel);
+                    }
+                }
+            },
+            scales: {
+                yAxes: [{
+                    ticks: {
+                        callback: function (value) {
+                            return formatBytes(value);
+                        }
+                    }
+                }],
+            },
+        },
+    });
+
+    const processSnapshots = function (snapshots) {
+        // Collect every video codec across all snapshots
+        let codecs = [];
+        for (let i = 0; i < snapshots.length; i++) {
+            for (let codec in snapshots[i].video_codecs) {
+                if (codecs.indexOf(codec) < 0) {
+                    codecs.push(codec);
+                }
+            }
+        }
+        compositionChart.data.labels = snapshots.map(function (snapshot) {
+            return snapshot.taken_at;
+        });
+        compositionChart.data.datasets = codecs.map(function (codec, index) {
+            return {
+                label: codec,
+                data: snapshots.map(function (snapshot) {
+                    return snapshot.video_codecs[codec] || 0;
+                }),
+                borderColor: chartBackgroundColours[index % chartBackgroundColours.length],
+                backgroundColor: chartBackgroundColours[index % chartBackgroundColours.length],
+                fill: false,
+            };
+        });
+        compositionChart.update();
+
+        // Populate the snapshot selections for the diff (newest first)
+        let fromSelect = document.getElementById("snapshotDiffFrom");
+        let toSelect = document.getElementById("snapshotDiffTo");
+        let selectedFrom = fromSelect.value;
+        let selectedTo = toSelect.value;
+        fromSelect.innerHTML = '';
+        toSelect.innerHTML = '<option value="">Current</option>';
+        for (let i = snapshots.length - 1; i >= 0; i--) {
+            let snapshot = snapshots[i];
+            let label = snapshot.taken_at + ' (' + snapshot.file_count + ' files, ' + formatBytes(snapshot.total_size) + ')';
+            let fromOption = document.createElement("option");
+            fromOption.value = snapshot.id;
+            fromOption.appendChild(document.createTextNode(label));
+            fromSelect.appendChild(fromOption);
+            let toOption = document.createElement("option");
+            toOption.value = snapshot.id;
+            toOption.appendChild(document.createTextNode(label));
+            toSelect.appendChild(toOption);
+        }
+        if (selectedFrom) {
+            fromSelect.value = selectedFrom;
+        } else if (snapshots.length) {
+            // Default to comparing the oldest snapshot with the current library
+            fromSelect.value = snapshots[0].id;
+        }
+        toSelect.value = selectedTo;
+    };
+
+    const addTableRow = function (tbody, values) {
+        let tr = document.createElement("tr");
+        for (let i = 0; i < values.length; i++) {
+            let td = document.createElement("td");
+            td.appendChild(document.createTextNode(values[i]));
+            tr.appendChild(td);
+        }
+        tbody.appendChild(tr);
+    };
+
+    const processDiff = function (diff) {
+        let summary = 'Library size change from ' + diff.from_taken_at + ' to ' + diff.to_taken_at + ': ' +
+            formatChange(diff.total_size_change, formatBytes);
+        if (diff.total_size_change_per_week !== null) {
+            summary += ' (' + formatChange(diff.total_size_change_per_week, formatBytes) + ' per week)';
+        }
+        document.getElementById("snapshotDiffSummary").textContent = summary;
+
+        const dimensionLabels = {
+            'container_name': 'Container',
+            'video_codec': 'Video codec',
+            'resolution': 'Resolution',
+        };
+        let tbody = document.getElementById("snapshotDiffList");
+        // Clear out list
+        tbody.innerHTML = '';
+        for (let dimension in dimensionLabels) {
+            let changes = diff.dimensions[dimension] || [];
+            for (let i = 0; i < changes.length; i++) {
+                let item = changes[i];
+                addTableRow(tbody, [
+                    dimensionLabels[dimension],
+                    item.value,
+                    formatChange(item.count_change),
+                    formatBytes(item.total_size_before),
+                    formatBytes(item.total_size_after),
+                    formatChange(item.total_size_change, formatBytes),
+                ]);
+            }
+        }
+    };
+
+    // The version of the data currently displayed
+    let lastVersion = '';
+    let lastDiffVersion = '';
+    let lastDiffQuery = null;
+
+    const fetchDiff = function () {
+        let fromId = document.getElementById("snapshotDiffFrom").value;
+        if (!fromId) {
+            return;
+        }
+        let query = 'from=' + fromId + '&to=' + document.getElementById("snapshotDiffTo").value;
+        // Only send the current version if the query has not changed
+        let version = (query === lastDiffQuery) ? lastDiffVersion : '';
+        jQuery.get('snapshotDiff?' + query + '&version=' + version, function (data) {
+            lastDiffQuery = query;
+            lastDiffVersion = data.version;
+            if (data.unchanged || data.error) {
+                return;
+            }
+            processDiff(data);
+        });
+    };
+
+    const fetchSnapshots = function () {
+        jQuery.get('snapshots?version=' + lastVersion, function (data) {
+            lastVersion = data.version;
+            if (!data.unchanged) {
+                processSnapshots(data.snapshots);
+            }
+            fetchDiff();
+        });
+    };
+
+    return {
+        //main function to initiate the module
+        update: function () {
+            fetchSnapshots();
+        },
+        updateDiff: function () {
+            fetchDiff();
+        }
+    };
+
+}();
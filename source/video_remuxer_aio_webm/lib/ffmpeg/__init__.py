@@ -25,6 +25,7 @@
 from __future__ import absolute_import
 import warnings
 
+from .container_compatibility import ContainerCompatibility
 from .parser import Parser
 from .probe import Probe
 from .stream_mapper import StreamMapper
@@ -32,6 +33,7 @@ from .stream_mapper import StreamMapper
 __author__ = 'Josh.5 (jsunnex@gmail.com)'
 
 __all__ = (
+    'ContainerCompatibility',
     'Parser',
     'Probe',
     'StreamMapper',
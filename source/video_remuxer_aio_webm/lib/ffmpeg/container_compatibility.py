@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    plugins.container_compatibility.py
+
+    Written by:               Josh.5 <jsunnex@gmail.com>
+    Date:                     19 Oct 2026, (10:12 AM)
+
+    Copyright:
+        Copyright (C) 2021 Josh Sunnex
+
+        This program is free software: you can redistribute it and/or modify it under the terms of the GNU General
+        Public License as published by the Free Software Foundation, version 3.
+
+        This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+        implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+        for more details.
+
+        You should have received a copy of the GNU General Public License along with this program.
+        If not, see <https://www.gnu.org/licenses/>.
+
+"""
+from fnmatch import fnmatch
+
+
+class ContainerCompatibility(object):
+    """
+    ContainerCompatibility
+
+    A matrix of the codecs that each container is able to hold without transcoding.
+    Codec names match the 'codec_name' value reported by ffprobe. Shell-style wildcards are supported.
+    """
+
+    webm = {
+        'video':      ['vp8', 'vp9', 'av1'],
+        'audio':      ['opus', 'vorbis'],
+        'subtitle':   ['webvtt'],
+        'data':       [],
+        'attachment': [],
+    }
+    mkv = {
+        'video':      [
+            'h264', 'hevc', 'av1', 'vp8', 'vp9', 'mpeg1video', 'mpeg2video', 'mpeg4', 'msmpeg4v2', 'msmpeg4v3',
+            'theora', 'vc1', 'wmv3', 'ffv1', 'prores', 'mjpeg', 'png', 'dirac',
+        ],
+        'audio':      [
+            'aac', 'ac3', 'eac3', 'dts', 'truehd', 'mlp', 'mp2', 'mp3', 'flac', 'alac', 'opus', 'vorbis', 'wavpack',
+            'tta', 'pcm_*',
+        ],
+        'subtitle':   [
+            'subrip', 'ass', 'ssa', 'webvtt', 'hdmv_pgs_subtitle', 'dvd_subtitle', 'dvb_subtitle',
+        ],
+        'data':       [],
+        'attachment': ['*'],
+    }
+    mp4 = {
+        'video':      ['h264', 'hevc', 'av1', 'vp9', 'mpeg2video', 'mpeg4', 'mjpeg', 'png'],
+        'audio':      ['aac', 'ac3', 'eac3', 'mp2', 'mp3', 'flac', 'alac', 'opus'],
+        'subtitle':   ['mov_text'],
+        'data':       ['bin_data'],
+        'attachment': [],
+    }
+
+    def get_container_codecs(self, container):
+        """
+        Return the codec matrix for the given container extension.
+        Unknown containers return None.
+
+        :param container:
+        :return:
+        """
+        container = container.lower().lstrip('.')
+        if container in ['mkv', 'mka', 'mks', 'matroska']:
+            return self.mkv
+        elif container in ['mp4', 'm4v', 'mov']:
+            return self.mp4
+        elif container in ['webm']:
+            return self.webm
+        return None
+
+    def stream_copy_supported(self, container, stream_info: dict):
+        """
+        Returns True if the given probe stream can be copied into the container without being transcoded.
+
+        :param container:
+        :param stream_info:
+        :return:
+        """
+        container_codecs = self.get_container_codecs(container)
+        if container_codecs is None:
+            return False
+        codec_type = stream_info.get('codec_type', '').lower()
+        # Attachments may not report a codec name
+        codec_name = stream_info.get('codec_name', codec_type).lower()
+        for pattern in container_codecs.get(codec_type, []):
+            if fnmatch(codec_name, pattern):
+                return True
+        return False
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    plugins.tools.py
+
+    Written by:               Josh.5 <jsunnex@gmail.com>
+    Date:                     19 Oct 2026, (10:05 AM)
+
+    Copyright:
+        Copyright (C) 2021 Josh Sunnex
+
+        This program is free software: you can redistribute it and/or modify it under the terms of the GNU General
+        Public License as published by the Free Software Foundation, version 3.
+
+        This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+        implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+        for more details.
+
+        You should have received a copy of the GNU General Public License along with this program.
+        If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import functools
+import math
+import os
+
+
+def read_cgroup_cpu_quota():
+    """
+    Read the CPU quota applied to this process' cgroup (cgroup v2 or v1).
+    Returns the number of CPUs the quota allows (may be fractional) or None if no quota is set.
+
+    :return:
+    """
+    # cgroup v2 - "<quota> <period>" or "max <period>"
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[0:2]
+        if quota != 'max' and int(period) > 0:
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    # cgroup v1
+    for cgroup_dir in ['/sys/fs/cgroup/cpu', '/sys/fs/cgroup/cpu,cpuacct']:
+        try:
+            with open(os.path.join(cgroup_dir, 'cpu.cfs_quota_us')) as f:
+                quota = int(f.read().strip())
+            with open(os.path.join(cgroup_dir, 'cpu.cfs_period_us')) as f:
+                period = int(f.read().strip())
+            if quota > 0 and period > 0:
+                return quota / period
+            return None
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def get_available_cpus():
+    """
+    Return the set of CPU IDs that this process is allowed to run on (respects cpusets and taskset)
+
+    :return:
+    """
+    try:
+        return set(os.sched_getaffinity(0))
+    except AttributeError:
+        # Not available on this platform (Windows/macOS)
+        return set(range(os.cpu_count() or 1))
+
+
+@functools.lru_cache(maxsize=None)
+def get_cpu_allowance():
+    """
+    Return the number of CPUs this process can actually use.
+    This is the smaller of the CPU affinity mask and the cgroup CPU quota (eg. 'docker run --cpus=8').
+
+    :return:
+    """
+    cpu_allowance = len(get_available_cpus())
+    cgroup_quota = read_cgroup_cpu_quota()
+    if cgroup_quota:
+        cpu_allowance = min(cpu_allowance, int(math.ceil(cgroup_quota)))
+    return max(1, cpu_allowance)
@@ -25,12 +25,13 @@ import json
 import logging
 import mimetypes
 import os
+import re
 from pprint import pprint
 
-import psutil
 from unmanic.libs.unplugins.settings import PluginSettings
 
-from video_remuxer_aio_webm.lib.ffmpeg import StreamMapper, Probe, Parser
+from video_remuxer_aio_webm.lib import tools
+from video_remuxer_aio_webm.lib.ffmpeg import ContainerCompatibility, StreamMapper, Probe, Parser
 
 # Configure plugin logger
 logger = logging.getLogger("Unmanic.Plugin.video_remuxer_aio_webm")
@@ -52,6 +53,10 @@ class Settings(PluginSettings):
         "bitrate":                     "2",
         "deadline":                    "good",
         "cpu_used":                    "0",
+        "av1_threads":                 0,
+        "av1_auto_tiles":              True,
+        "av1_tile_columns":            0,
+        "av1_tile_rows":               0,
         "audio_codec":                 "opus",
         "subtitle_codec":              "webvtt",
     }
@@ -66,6 +71,10 @@ class Settings(PluginSettings):
             "bitrate":                     self.__set_bitrate_settings(),
             "deadline":                    self.__set_deadline_settings(),
             "cpu_used":                    self.__set_cpu_used_settings(),
+            "av1_threads":                 self.__set_av1_threads_settings(),
+            "av1_auto_tiles":              self.__set_av1_auto_tiles_settings(),
+            "av1_tile_columns":            self.__set_av1_tile_columns_settings(),
+            "av1_tile_rows":               self.__set_av1_tile_rows_settings(),
             "audio_codec":                 self.__set_audio_codec_settings(),
             "subtitle_codec":              self.__set_subtitle_codec_settings(),
         }
@@ -89,6 +98,10 @@ class Settings(PluginSettings):
                     'value': "vp8",
                     'label': "VP8",
                 },
+                {
+                    'value': "av1",
+                    'label': "AV1 (SVT-AV1)",
+                },
             ],
         }
         return values
@@ -128,6 +141,9 @@ class Settings(PluginSettings):
                 },
             ],
         }
+        if self.get_setting('video_codec') in ['av1']:
+            # SVT-AV1 has no lossless mode
+            values['select_options'] = values['select_options'][:-1]
         if self.get_setting('auto_video_encoder_settings') or self.get_setting('video_codec') in ['vp8']:
             values["display"] = 'hidden'
         return values
@@ -194,6 +210,58 @@ class Settings(PluginSettings):
                 "max": 5,
             },
         }
+        if self.get_setting('video_codec') in ['av1']:
+            values["description"] = "For AV1, the deadline and CPU utilization are mapped to a SVT-AV1 preset.\n" \
+                                    "'best' starts at preset 2, 'good' at preset 4 and 'realtime' at preset 8.\n" \
+                                    "Each step of CPU utilization adds one to the preset (faster encode)."
+        return values
+
+    def __set_av1_threads_settings(self):
+        values = {
+            "label":          "AV1 Encoder Threads",
+            "description":    "Number of logical processors SVT-AV1 may use. Set to 0 to use all available CPUs.",
+            "input_type":     "slider",
+            "slider_options": {
+                "min": 0,
+                "max": 128,
+            },
+        }
+        if self.get_setting('video_codec') not in ['av1']:
+            values["display"] = 'hidden'
+        return values
+
+    def __set_av1_auto_tiles_settings(self):
+        values = {
+            "label": "Auto calculate the AV1 tile layout based on source resolution",
+        }
+        if self.get_setting('video_codec') not in ['av1']:
+            values["display"] = 'hidden'
+        return values
+
+    def __set_av1_tile_columns_settings(self):
+        values = {
+            "label":          "AV1 Tile Columns (log2)",
+            "input_type":     "slider",
+            "slider_options": {
+                "min": 0,
+                "max": 4,
+            },
+        }
+        if self.get_setting('video_codec') not in ['av1'] or self.get_setting('av1_auto_tiles'):
+            values["display"] = 'hidden'
+        return values
+
+    def __set_av1_tile_rows_settings(self):
+        values = {
+            "label":          "AV1 Tile Rows (log2)",
+            "input_type":     "slider",
+            "slider_options": {
+                "min": 0,
+                "max": 6,
+            },
+        }
+        if self.get_setting('video_codec') not in ['av1'] or self.get_setting('av1_auto_tiles'):
+            values["display"] = 'hidden'
         return values
 
     #     _   _   _ ____ ___ ___
@@ -241,24 +309,16 @@ class PluginStreamMapper(StreamMapper):
         self.settings = None
         self.container_data = None
         self.filter_complex = []
-        self.settings = None
+        self.compatibility = ContainerCompatibility()
 
     def set_settings(self, settings):
         self.settings = settings
 
     def test_stream_needs_processing(self, stream_info: dict):
-        # Test all stream types
-        if stream_info.get('codec_type').lower() == "video":
-            if stream_info.get('codec_name').lower() not in [self.settings.get_setting('video_codec')]:
-                return True
-        elif stream_info.get('codec_type').lower() == "audio":
-            if stream_info.get('codec_name').lower() not in [self.settings.get_setting('audio_codec')]:
-                return True
-        elif stream_info.get('codec_type').lower() == "subtitle":
-            if stream_info.get('codec_name').lower() not in [self.settings.get_setting('subtitle_codec')]:
-                return True
-
-        return False
+        # Any stream that is already legal in the WebM container is copied as is
+        if self.compatibility.stream_copy_supported('webm', stream_info):
+            return False
+        return True
 
     def custom_stream_mapping(self, stream_info: dict, stream_id: int):
         ident = {
@@ -275,6 +335,8 @@ class PluginStreamMapper(StreamMapper):
                 stream_encoding = self.__vp9_stream_encoding_args(stream_info, stream_id)
             elif self.settings.get_setting('video_codec') == 'vp8':
                 stream_encoding = self.__vp8_stream_encoding_args(stream_info, stream_id)
+            elif self.settings.get_setting('video_codec') == 'av1':
+                stream_encoding = self.__av1_stream_encoding_args(stream_info, stream_id)
             else:
                 stream_encoding = self.__vp9_stream_encoding_args(stream_info, stream_id)
             return {
@@ -350,7 +412,7 @@ class PluginStreamMapper(StreamMapper):
     def __vp9_stream_encoding_args(self, stream_info, stream_id):
         # Defaults
         stream_encoding = []
-        threads = psutil.cpu_count()
+        threads = tools.get_cpu_allowance()
         encoder = 'libvpx-vp9'
 
         # If plugin is to figure out best settings, return them here
@@ -437,7 +499,7 @@ class PluginStreamMapper(StreamMapper):
 
     def __vp8_stream_encoding_args(self, stream_info, stream_id):
         # Defaults
-        threads = psutil.cpu_count()
+        threads = tools.get_cpu_allowance()
         encoder = 'libvpx'
 
         # If plugin is to figure out best settings, return them here
@@ -467,6 +529,102 @@ class PluginStreamMapper(StreamMapper):
             '-cpu-used', str(self.settings.get_setting('cpu_used'))
         ]
 
+    def __av1_preset(self):
+        """
+        Map the libvpx style deadline and cpu-used settings to a SVT-AV1 preset (0-13).
+        Lower presets are slower and produce better quality.
+
+        :return:
+        """
+        preset_base = {
+            'best':     2,
+            'good':     4,
+            'realtime': 8,
+        }
+        preset = preset_base.get(self.settings.get_setting('deadline'), 4) + int(self.settings.get_setting('cpu_used'))
+        return min(preset, 13)
+
+    def __av1_tiles(self, stream_info):
+        """
+        Return the log2 tile columns and rows for the SVT-AV1 encoder
+
+        :param stream_info:
+        :return:
+        """
+        if not self.settings.get_setting('av1_auto_tiles'):
+            return int(self.settings.get_setting('av1_tile_columns')), int(self.settings.get_setting('av1_tile_rows'))
+        width = int(stream_info.get('width', stream_info.get('coded_width', 0)))
+        if width >= 3840:
+            return 2, 1
+        elif width >= 1920:
+            return 1, 0
+        return 0, 0
+
+    def __av1_stream_encoding_args(self, stream_info, stream_id):
+        # Defaults
+        threads = int(self.settings.get_setting('av1_threads'))
+        if threads <= 0:
+            threads = tools.get_cpu_allowance()
+        encoder = 'libsvtav1'
+
+        # SVT-AV1 only supports 8 or 10 bit 4:2:0 input
+        pix_fmt = 'yuv420p'
+        # Match the bit depth suffix of the source format (eg. yuv420p10le or p010le, but not yuv410p)
+        if re.search(r'p0?(10|12)(le|be)?$', stream_info.get('pix_fmt', '')):
+            pix_fmt = 'yuv420p10le'
+
+        tile_columns, tile_rows = self.__av1_tiles(stream_info)
+        common_args = [
+            '-pix_fmt:v:{}'.format(stream_id), pix_fmt,
+            '-preset', str(self.__av1_preset()),
+            '-svtav1-params', 'lp={}:tile-columns={}:tile-rows={}'.format(threads, tile_columns, tile_rows),
+        ]
+
+        # If plugin is to figure out best settings, return them here
+        if self.settings.get_setting('auto_video_encoder_settings'):
+            if stream_info.get('codec_name').lower() in ['h264']:
+                # 50% of the original for H264
+                video_bitrate = self.__calculate_source_video_bitrate(0.5)
+            elif stream_info.get('codec_name').lower() in ['h265', 'hevc', 'vp9']:
+                # 70% of the original for HEVC and VP9
+                video_bitrate = self.__calculate_source_video_bitrate(0.7)
+            else:
+                # 40% of the original for all other older codes
+                video_bitrate = self.__calculate_source_video_bitrate(0.4)
+
+            video_maxrate = int(float(video_bitrate) * 1.4)
+            video_bufsize = int(float(video_maxrate) / 1.5)
+            return [
+                '-c:v:{}'.format(stream_id), encoder,
+                '-maxrate', str(video_maxrate),
+                '-bufsize', str(video_bufsize),
+                '-b:v:{}'.format(stream_id), str(video_bitrate),
+            ] + common_args
+
+        # Set stream encoder bitrate
+        encoder_mode = self.settings.get_setting('video_encoder_mode')
+        if encoder_mode in ['constant_quality', 'lossless']:
+            stream_encoding = [
+                '-c:v:{}'.format(stream_id), encoder,
+                '-crf', str(self.settings.get_setting('crf')),
+                '-b:v:{}'.format(stream_id), '0',
+            ]
+        elif encoder_mode == 'constrained_quality':
+            # Capped CRF
+            stream_encoding = [
+                '-c:v:{}'.format(stream_id), encoder,
+                '-crf', str(self.settings.get_setting('crf')),
+                '-maxrate', '{}K'.format(self.settings.get_setting('bitrate')),
+            ]
+        else:
+            # SVT-AV1 only supports CBR in low-delay mode. Use VBR for both 'average_bitrate' and 'constant_bitrate'
+            stream_encoding = [
+                '-c:v:{}'.format(stream_id), encoder,
+                '-b:v:{}'.format(stream_id), '{}K'.format(self.settings.get_setting('bitrate')),
+            ]
+
+        return stream_encoding + common_args
+
     #     _   _   _ ____ ___ ___
     #    / \ | | | |  _ \_ _/ _ \
     #   / _ \| | | | | | | | | | |
@@ -594,6 +752,8 @@ def on_library_management_file_test(data):
         logger.debug(
             "File '{}' should be added to task list. Probe found file needs to be remuxed.".format(abspath))
     elif mapper.streams_need_processing():
+        # Mark this file to be added to the pending tasks
+        data['add_file_to_pending_tasks'] = True
         logger.debug(
             "File '{}' should be added to task list. Probe found streams need to be processed.".format(abspath))
     else:
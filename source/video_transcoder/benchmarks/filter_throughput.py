@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    plugins.filter_throughput.py
+
+    Written by:               Josh.5 <jsunnex@gmail.com>
+    Date:                     19 Oct 2026, (9:20 AM)
+
+    Copyright:
+        Copyright (C) 2021 Josh Sunnex
+
+        This program is free software: you can redistribute it and/or modify it under the terms of the GNU General
+        Public License as published by the Free Software Foundation, version 3.
+
+        This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+        implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+        for more details.
+
+        You should have received a copy of the GNU General Public License along with this program.
+        If not, see <https://www.gnu.org/licenses/>.
+
+    Measure the throughput of the scale filters that the plugin can generate with the installed FFmpeg.
+    Each scaler is run with a single filter thread and with the CPU allowance of this process.
+    Frames are written to a null output so that no encoder time is included.
+    Run from the Unmanic plugins directory:
+
+        python3 -m video_transcoder.benchmarks.filter_throughput
+        python3 -m video_transcoder.benchmarks.filter_throughput --input /library/movie.mkv --frames 500
+
+    Without an input file, a generated 4K test pattern is used so that the results exclude the decoder.
+
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+from video_transcoder.lib import tools
+from video_transcoder.lib.plugin_stream_mapper import PluginStreamMapper
+
+SCALER_ALGORITHMS = ['fast_bilinear', 'bilinear', 'bicubic', 'lanczos']
+
+
+class BenchmarkSettings(object):
+    """
+    A minimal stand in for the plugin Settings with only the filter settings required to build a scale filter
+    """
+
+    def __init__(self, **settings):
+        self.settings = settings
+
+    def get_setting(self, key):
+        return self.settings.get(key)
+
+
+def build_scale_filter(width, scaler_algorithm, use_zscale):
+    """
+    Build the scale filter exactly as the plugin would for these settings
+
+    :param width:
+    :param scaler_algorithm:
+    :param use_zscale:
+    :return:
+    """
+    mapper = PluginStreamMapper()
+    mapper.settings = BenchmarkSettings(scaler_algorithm=scaler_algorithm, use_zscale=use_zscale)
+    return mapper.build_scale_filter(width)
+
+
+def build_input_args(input_file):
+    if input_file:
+        return ['-i', input_file]
+    # Generate one second of frames and loop it so that generating the pattern does not limit the throughput
+    return ['-f', 'lavfi', '-i', 'testsrc2=size=3840x2160:rate=24,format=yuv420p,loop=loop=-1:size=24']
+
+
+def run_filter(input_args, video_filter, frames, filter_threads):
+    """
+    Run a filter over the input and return the number of frames processed per second
+
+    :param input_args:
+    :param video_filter:
+    :param frames:
+    :param filter_threads:
+    :return:
+    """
+    command = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostats']
+    command += input_args
+    command += [
+        '-filter_complex_threads', str(filter_threads),
+        '-filter_complex', '[0:v:0]{}[out]'.format(video_filter),
+        '-map', '[out]', '-frames:v', str(frames), '-f', 'null', '-',
+    ]
+    start_time = time.monotonic()
+    pipe = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    elapsed = time.monotonic() - start_time
+    if pipe.returncode != 0:
+        raise Exception("FFmpeg failed to run filter '{}':\n{}".format(
+            video_filter, pipe.stderr.decode("utf-8", errors='replace')))
+    return frames / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='video_transcoder.benchmarks.filter_throughput',
+                                     description="Measure the throughput of the video_transcoder scale filters")
+    parser.add_argument('--input', help="A video file to scale. Defaults to a generated 4K test pattern")
+    parser.add_argument('--frames', type=int, default=300, help="The number of frames to process for each run")
+    parser.add_argument('--width', type=int, default=1920, help="The target width of the scale filter")
+    args = parser.parse_args(argv)
+
+    input_args = build_input_args(args.input)
+    thread_counts = sorted({1, tools.get_cpu_allowance()})
+
+    variants = [('scale', algorithm, False) for algorithm in SCALER_ALGORITHMS]
+    if tools.ffmpeg_filter_available('zscale'):
+        variants += [('zscale', algorithm, True) for algorithm in SCALER_ALGORITHMS if algorithm != 'fast_bilinear']
+    else:
+        print("FFmpeg was not built with zscale. Skipping the zscale filters", file=sys.stderr)
+
+    # The input alone, for the cost of reading or generating the frames
+    print("{:<8} {:<14} {:>8} {:>10}".format('filter', 'algorithm', 'threads', 'fps'))
+    print("{:<8} {:<14} {:>8} {:>10.1f}".format('null', '-', 1, run_filter(input_args, 'null', args.frames, 1)))
+    for filter_name, algorithm, use_zscale in variants:
+        video_filter = build_scale_filter(args.width, algorithm, use_zscale)
+        for filter_threads in thread_counts:
+            fps = run_filter(input_args, video_filter, args.frames, filter_threads)
+            print("{:<8} {:<14} {:>8} {:>10.1f}".format(filter_name, algorithm, filter_threads, fps))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
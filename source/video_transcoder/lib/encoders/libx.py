@@ -21,6 +21,7 @@
         If not, see <https://www.gnu.org/licenses/>.
 
 """
+from video_transcoder.lib import tools
 
 
 class LibxEncoder:
@@ -65,9 +66,42 @@ class LibxEncoder:
         """
         return ["hwupload=extra_hw_frames=64,format=qsv"]
 
+    def thread_args(self):
+        """
+        Generate the encoder threading args based on the CPUs available to this process.
+        This respects Docker CPU quotas and cpusets which are not reflected in the host CPU count.
+            - x265: A thread pool is created for each NUMA node with allowed CPUs
+            - x264: The number of threads is limited to the CPU allowance
+
+        :return:
+        """
+        cpu_allowance = tools.get_cpu_allowance()
+        if self.settings.get_setting('video_encoder') in ['libx265']:
+            # Pools are listed per NUMA node. A '-' excludes that node
+            numa_node_allowance = tools.get_numa_node_cpu_allowance()
+            pools = ','.join([str(count) if count else '-' for count in numa_node_allowance])
+            # Use the same frame threads that x265 would select for this number of threads
+            if cpu_allowance >= 32:
+                frame_threads = 6
+            elif cpu_allowance >= 16:
+                frame_threads = 5
+            elif cpu_allowance >= 8:
+                frame_threads = 3
+            elif cpu_allowance >= 4:
+                frame_threads = 2
+            else:
+                frame_threads = 1
+            return ['-x265-params', 'pools={}:frame-threads={}'.format(pools, frame_threads)]
+        elif self.settings.get_setting('video_encoder') in ['libx264']:
+            return ['-threads', str(cpu_allowance)]
+        return []
+
     def args(self, stream_id):
         stream_encoding = []
 
+        # Limit the encoder threads to the CPUs available to this process
+        stream_encoding += self.thread_args()
+
         # Use defaults for basic mode
         if self.settings.get_setting('mode') in ['basic']:
             defaults = self.options()
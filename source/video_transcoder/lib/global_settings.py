@@ -38,8 +38,11 @@ class GlobalSettings:
                 "max_muxing_queue_size": 2048,
             },
             "encoder_selection":      {
-                "video_codec":   "hevc",
-                "video_encoder": "libx265",
+                "video_codec":                   "hevc",
+                "video_encoder":                 "libx265",
+                "force_transcode":               False,
+                "reencode_high_bitrate_sources": False,
+                "max_bits_per_pixel":            0.1,
             },
             "advanced_input_options": {
                 "main_options":     "",
@@ -58,8 +61,11 @@ class GlobalSettings:
                 "apply_smart_filters":     False,
                 "autocrop_black_bars":     False,
                 "target_resolution":       "source",
+                "scaler_algorithm":        "bicubic",
+                "use_zscale":              False,
                 "apply_custom_filters":    False,
                 "custom_software_filters": "",
+                "filter_threads":          0,
             },
         }
 
@@ -167,6 +173,45 @@ class GlobalSettings:
         self.__set_default_option(values['select_options'], 'video_encoder')
         return values
 
+    def get_force_transcode_form_settings(self):
+        return {
+            "label":       "Force transcoding even if the file is already using the desired video codec",
+            "description": "Will force a transcode of the video stream even if it matches the selected video codec.\n"
+                           "A file will only be forced to be transcoded once.\n"
+                           "After that it is flagged to prevent it being added to the pending tasks list again.",
+        }
+
+    def get_reencode_high_bitrate_sources_form_settings(self):
+        values = {
+            "label":       "Transcode video streams already using the desired codec if their bitrate is too high",
+            "description": "Uses the source bitrate, resolution and framerate to calculate the bits per pixel.\n"
+                           "Streams already using the selected video codec are transcoded again if this\n"
+                           "value is above the configured threshold.",
+        }
+        if self.settings.get_setting('force_transcode'):
+            values["display"] = 'hidden'
+        if self.settings.get_setting('mode') not in ['standard']:
+            values["display"] = 'hidden'
+        return values
+
+    def get_max_bits_per_pixel_form_settings(self):
+        values = {
+            "label":          "Max bits per pixel",
+            "sub_setting":    True,
+            "input_type":     "slider",
+            "slider_options": {
+                "min":  0.01,
+                "max":  1.0,
+                "step": 0.01,
+            },
+        }
+        if not self.settings.get_setting('reencode_high_bitrate_sources') or self.settings.get_setting(
+                'force_transcode'):
+            values["display"] = 'hidden'
+        if self.settings.get_setting('mode') not in ['standard']:
+            values["display"] = 'hidden'
+        return values
+
     def get_main_options_form_settings(self):
         values = {
             "label":      "Write your own custom main options",
@@ -231,8 +276,9 @@ class GlobalSettings:
     def get_autocrop_black_bars_form_settings(self):
         values = {
             "label":       "Autocrop black bars",
-            "description": "Runs FFmpeg 'cropdetect' on the file to auto-detect the crop size.\n"
-                           "This detected crop size is then applied during video transcode as a 'crop' filter.",
+            "description": "Runs FFmpeg 'cropdetect' at several points across the file to auto-detect the crop size.\n"
+                           "This detected crop size is then applied during video transcode as a 'crop' filter.\n"
+                           "The result is cached so the detection only runs once per file.",
             "sub_setting": True,
         }
         if not self.settings.get_setting('apply_smart_filters'):
@@ -304,6 +350,55 @@ class GlobalSettings:
             values["display"] = 'hidden'
         return values
 
+    def get_scaler_algorithm_form_settings(self):
+        values = {
+            "label":          "Scaling algorithm",
+            "description":    "'fast_bilinear' is the fastest but lowest quality.\n"
+                              "'lanczos' is the slowest but gives the sharpest result.",
+            "sub_setting":    True,
+            "input_type":     "select",
+            "select_options": [
+                {
+                    "value": "fast_bilinear",
+                    "label": "Fast bilinear",
+                },
+                {
+                    "value": "bilinear",
+                    "label": "Bilinear",
+                },
+                {
+                    "value": "bicubic",
+                    "label": "Bicubic (FFmpeg default)",
+                },
+                {
+                    "value": "lanczos",
+                    "label": "Lanczos",
+                },
+            ],
+        }
+        if not self.settings.get_setting('apply_smart_filters'):
+            values["display"] = 'hidden'
+        if self.settings.get_setting('target_resolution') in ['source']:
+            values["display"] = 'hidden'
+        if self.settings.get_setting('mode') not in ['standard']:
+            values["display"] = 'hidden'
+        return values
+
+    def get_use_zscale_form_settings(self):
+        values = {
+            "label":       "Use the zimg 'zscale' filter for scaling when available",
+            "description": "If FFmpeg was built with zimg, the 'zscale' filter will be used in place of 'scale'.\n"
+                           "If it is not available, the standard 'scale' filter is used.",
+            "sub_setting": True,
+        }
+        if not self.settings.get_setting('apply_smart_filters'):
+            values["display"] = 'hidden'
+        if self.settings.get_setting('target_resolution') in ['source']:
+            values["display"] = 'hidden'
+        if self.settings.get_setting('mode') not in ['standard']:
+            values["display"] = 'hidden'
+        return values
+
     def get_apply_custom_filters_form_settings(self):
         values = {
             "label":   "Enable custom video filters",
@@ -326,3 +421,21 @@ class GlobalSettings:
         if self.settings.get_setting('mode') not in ['standard']:
             values["display"] = 'hidden'
         return values
+
+    def get_filter_threads_form_settings(self):
+        values = {
+            "label":          "Video filter threads",
+            "description":    "Number of threads used to process the video filtergraph.\n"
+                              "Set to 0 to let FFmpeg decide.",
+            "input_type":     "slider",
+            "slider_options": {
+                "min": 0,
+                "max": 64,
+            },
+        }
+        if not self.settings.get_setting('apply_smart_filters') and not self.settings.get_setting(
+                'apply_custom_filters'):
+            values["display"] = 'hidden'
+        if self.settings.get_setting('mode') not in ['standard']:
+            values["display"] = 'hidden'
+        return values
@@ -41,6 +41,7 @@ class PluginStreamMapper(StreamMapper):
         self.settings = None
         self.complex_video_filters = {}
         self.crop_value = None
+        self.forced_encode = False
         self.vaapi_encoders = ['hevc_vaapi', 'h264_vaapi']
 
     def set_default_values(self, settings, abspath, probe):
@@ -59,6 +60,8 @@ class PluginStreamMapper(StreamMapper):
         self.set_input_file(abspath)
         # Configure settings
         self.settings = settings
+        # Force the video stream to be transcoded if configured
+        self.forced_encode = bool(self.settings.get_setting('force_transcode'))
 
         # Build default options of advanced mode
         if self.settings.get_setting('mode') == 'advanced':
@@ -84,12 +87,6 @@ class PluginStreamMapper(StreamMapper):
                 }
                 self.set_ffmpeg_advanced_options(**advanced_kwargs)
 
-            # Check for config specific settings
-            if self.settings.get_setting('apply_smart_filters'):
-                if self.settings.get_setting('autocrop_black_bars'):
-                    # Test if the file has black bars
-                    self.crop_value = tools.detect_plack_bars(abspath, probe.get_probe())
-
         # Build hardware acceleration args based on encoder
         # Note: these are not applied to advanced mode - advanced mode was returned above
         if self.settings.get_setting('video_encoder') in LibxEncoder.encoders:
@@ -107,6 +104,25 @@ class PluginStreamMapper(StreamMapper):
             # TODO: Disable any options not compatible with this encoder
         # TODO: Add NVENC args
 
+    def get_crop_value(self):
+        """
+        Lazily run the black bar detection for this file.
+        The detection is only run the first time it is needed and the result is cached per file in the
+        plugin profile directory, so it will not be re-run on subsequent library scans.
+
+        :return:
+        """
+        # Autocrop is only available in standard mode
+        if self.settings.get_setting('mode') != 'standard':
+            return None
+        if self.crop_value is None:
+            self.crop_value = tools.detect_plack_bars(self.abspath, self.probe.get_probe(),
+                                                      profile_directory=self.settings.get_profile_directory())
+            if self.crop_value is None:
+                # Nothing to crop. Prevent this from being run again for this mapper
+                self.crop_value = ''
+        return self.crop_value
+
     def scale_resolution(self, stream_info: dict):
         def get_test_resolution(settings):
             target_resolution = settings.get_setting('target_resolution')
@@ -141,6 +157,23 @@ class PluginStreamMapper(StreamMapper):
         # Return none (nothing will be done)
         return None, None
 
+    def build_scale_filter(self, vid_width):
+        """
+        Build a scale filter for the given width using the configured scaler
+
+        :param vid_width:
+        :return:
+        """
+        scaler_algorithm = self.settings.get_setting('scaler_algorithm')
+        if self.settings.get_setting('use_zscale') and tools.ffmpeg_filter_available('zscale'):
+            # zscale does not have a 'fast_bilinear' filter
+            zscale_filter = 'bilinear' if scaler_algorithm == 'fast_bilinear' else scaler_algorithm
+            return 'zscale=w={}:h=-1:filter={}'.format(vid_width, zscale_filter)
+        if scaler_algorithm in ['bicubic']:
+            # This is the FFmpeg default, so keep the scale filter unchanged from earlier versions
+            return 'scale={}:-1'.format(vid_width)
+        return 'scale={}:-1:flags={}'.format(vid_width, scaler_algorithm)
+
     def build_filter_chain(self, stream_info, stream_id):
         """
         Builds a complex video filtergraph for the provided stream
@@ -156,13 +189,13 @@ class PluginStreamMapper(StreamMapper):
 
         # Apply smart filters first
         if self.settings.get_setting('apply_smart_filters'):
-            if self.settings.get_setting('autocrop_black_bars') and self.crop_value:
-                software_filters.append('crop={}'.format(self.crop_value))
+            if self.settings.get_setting('autocrop_black_bars') and self.get_crop_value():
+                software_filters.append('crop={}'.format(self.get_crop_value()))
             if self.settings.get_setting('target_resolution') not in ['source']:
                 vid_width, vid_height = self.scale_resolution(stream_info)
                 if vid_width:
                     # Apply scale with only width to keep aspect ratio
-                    software_filters.append('scale={}:-1'.format(vid_width))
+                    software_filters.append(self.build_scale_filter(vid_width))
 
         # Apply custom software filters
         if self.settings.get_setting('apply_custom_filters'):
@@ -220,6 +253,26 @@ class PluginStreamMapper(StreamMapper):
 
         return filter_id, filtergraph
 
+    def has_custom_filters(self):
+        """
+        Check if the settings include video filters written by the user.
+        In advanced mode these are any filter options in the custom encoder or advanced options.
+
+        :return:
+        """
+        if self.settings.get_setting('mode') == 'advanced':
+            options = self.settings.get_setting('advanced_options').split()
+            options += self.settings.get_setting('custom_options').split()
+            for option in options:
+                if option in ['-vf', '-lavfi', '-filter_complex'] or option.startswith('-filter:v'):
+                    return True
+            return False
+        if self.settings.get_setting('apply_custom_filters'):
+            for software_filter in self.settings.get_setting('custom_software_filters').splitlines():
+                if software_filter.strip():
+                    return True
+        return False
+
     def test_stream_needs_processing(self, stream_info: dict):
         """
         Tests if the command will need to transcode the video stream
@@ -233,21 +286,40 @@ class PluginStreamMapper(StreamMapper):
         if stream_info.get('codec_name').lower() in tools.image_video_codecs:
             return False
 
+        # Check if the settings say to force encoding
+        if self.forced_encode:
+            return True
+
+        # Filters configured by the user can only be applied by encoding the stream
+        if self.has_custom_filters():
+            return True
+
+        # Check if the codec is already the correct format
+        if stream_info.get('codec_name').lower() != self.settings.get_setting('video_codec'):
+            # All other streams should be custom mapped
+            return True
+
+        # Optionally re-encode streams that are already the correct codec but have a high bitrate
+        if self.settings.get_setting('reencode_high_bitrate_sources'):
+            bits_per_pixel = tools.get_video_stream_bits_per_pixel(stream_info, self.probe.get_probe())
+            if bits_per_pixel and bits_per_pixel > float(self.settings.get_setting('max_bits_per_pixel')):
+                logger.debug("Stream is already {} but its bits per pixel ({:.3f}) is above the threshold".format(
+                    stream_info.get('codec_name'), bits_per_pixel))
+                return True
+
         # Check if video filters need to be applied (build_filter_chain)
         if self.settings.get_setting('apply_smart_filters'):
-            # Check if autocrop filter needs to be applied
-            if self.settings.get_setting('autocrop_black_bars') and self.crop_value:
-                return True
             # Check if scale filter needs to be applied
             if self.settings.get_setting('target_resolution') not in ['source']:
                 vid_width, vid_height = self.scale_resolution(stream_info)
                 if vid_width:
                     return True
+            # Check if autocrop filter needs to be applied
+            # This is checked last as it will need to run the (cached) black bar detection
+            if self.settings.get_setting('autocrop_black_bars') and self.get_crop_value():
+                return True
 
-        # TODO: Check if the codec is already the correct format
-        # TODO: Add override if settings say to force encoding
-        # All other streams should be custom mapped
-        return True
+        return False
 
     def custom_stream_mapping(self, stream_info: dict, stream_id: int):
         """
@@ -270,6 +342,10 @@ class PluginStreamMapper(StreamMapper):
                 map_identifier = '[{}]'.format(filter_id)
                 # TODO: Apply the filter directly as it may be possible to have more than one video stream (low priority)
                 self.set_ffmpeg_advanced_options(**{"-filter_complex": filter_complex})
+                # Set the number of threads used to process the filtergraph
+                if int(self.settings.get_setting('filter_threads') or 0) > 0:
+                    self.set_ffmpeg_advanced_options(
+                        **{"-filter_complex_threads": str(self.settings.get_setting('filter_threads'))})
 
             stream_encoding = [
                 '-c:{}'.format(stream_specifier), self.settings.get_setting('video_encoder'),
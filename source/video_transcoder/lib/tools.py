@@ -21,9 +21,16 @@
         If not, see <https://www.gnu.org/licenses/>.
 
 """
+import concurrent.futures
+import functools
+import hashlib
 import logging
+import math
+import os
 import re
+import sqlite3
 import subprocess
+import time
 
 from video_transcoder.lib.ffmpeg import StreamMapper
 
@@ -111,6 +118,137 @@ resolution_map = {
 }
 
 
+def read_cgroup_cpu_quota():
+    """
+    Read the CPU quota applied to this process' cgroup (cgroup v2 or v1).
+    Returns the number of CPUs the quota allows (may be fractional) or None if no quota is set.
+
+    :return:
+    """
+    # cgroup v2 - "<quota> <period>" or "max <period>"
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[0:2]
+        if quota != 'max' and int(period) > 0:
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    # cgroup v1
+    for cgroup_dir in ['/sys/fs/cgroup/cpu', '/sys/fs/cgroup/cpu,cpuacct']:
+        try:
+            with open(os.path.join(cgroup_dir, 'cpu.cfs_quota_us')) as f:
+                quota = int(f.read().strip())
+            with open(os.path.join(cgroup_dir, 'cpu.cfs_period_us')) as f:
+                period = int(f.read().strip())
+            if quota > 0 and period > 0:
+                return quota / period
+            return None
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def get_available_cpus():
+    """
+    Return the set of CPU IDs that this process is allowed to run on (respects cpusets and taskset)
+
+    :return:
+    """
+    try:
+        return set(os.sched_getaffinity(0))
+    except AttributeError:
+        # Not available on this platform (Windows/macOS)
+        return set(range(os.cpu_count() or 1))
+
+
+@functools.lru_cache(maxsize=None)
+def get_cpu_allowance():
+    """
+    Return the number of CPUs this process can actually use.
+    This is the smaller of the CPU affinity mask and the cgroup CPU quota (eg. 'docker run --cpus=8').
+
+    :return:
+    """
+    cpu_allowance = len(get_available_cpus())
+    cgroup_quota = read_cgroup_cpu_quota()
+    if cgroup_quota:
+        cpu_allowance = min(cpu_allowance, int(math.ceil(cgroup_quota)))
+    return max(1, cpu_allowance)
+
+
+def parse_cpu_list(cpu_list):
+    """
+    Parse a kernel CPU list string (eg. "0-3,8-11") into a set of CPU IDs
+
+    :param cpu_list:
+    :return:
+    """
+    cpus = set()
+    for part in cpu_list.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+@functools.lru_cache(maxsize=None)
+def get_numa_node_cpu_allowance():
+    """
+    Return a list with the number of usable CPUs on each NUMA node (ordered by node ID).
+    The CPU allowance is distributed across the nodes in proportion to the CPUs this process may use on each node.
+    Returns a single entry list if NUMA information is not available.
+
+    :return:
+    """
+    cpu_allowance = get_cpu_allowance()
+    available_cpus = get_available_cpus()
+    node_dir = '/sys/devices/system/node'
+    node_cpus = []
+    try:
+        node_names = sorted([n for n in os.listdir(node_dir) if re.match(r'^node\d+$', n)], key=lambda n: int(n[4:]))
+        for node_name in node_names:
+            with open(os.path.join(node_dir, node_name, 'cpulist')) as f:
+                node_cpus.append(len(parse_cpu_list(f.read()) & available_cpus))
+    except (OSError, ValueError):
+        node_cpus = []
+    total_cpus = sum(node_cpus)
+    if len(node_cpus) < 2 or not total_cpus:
+        return [cpu_allowance]
+
+    # Scale each node down to the allowance (a cgroup quota may allow fewer CPUs than the cpuset).
+    # Round each node down so that the total does not exceed the allowance, then give the remainder to the first node
+    node_allowance = [cpu_allowance * count // total_cpus for count in node_cpus]
+    first_node = next(i for i, count in enumerate(node_cpus) if count)
+    node_allowance[first_node] += cpu_allowance - sum(node_allowance)
+    return node_allowance
+
+
+@functools.lru_cache(maxsize=None)
+def ffmpeg_filter_available(filter_name):
+    """
+    Check if the installed FFmpeg was built with the given filter
+
+    :param filter_name:
+    :return:
+    """
+    try:
+        pipe = subprocess.Popen(['ffmpeg', '-hide_banner', '-filters'], stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+        out, err = pipe.communicate()
+    except OSError:
+        return False
+    for line in out.decode("utf-8", errors='replace').splitlines():
+        line_parts = line.split()
+        if len(line_parts) > 1 and line_parts[1] == filter_name:
+            return True
+    return False
+
+
 def get_video_stream_data(streams):
     width = 0
     height = 0
@@ -126,30 +264,124 @@ def get_video_stream_data(streams):
     return width, height, video_stream_index
 
 
-def detect_plack_bars(abspath, probe_data):
+def get_video_stream_bits_per_pixel(stream_info, probe_data):
     """
-    Detect if black bars exist
+    Calculate the bits per pixel (bitrate / (width * height * framerate)) of a video stream.
+    The stream bitrate is read from the stream, then from the Matroska 'BPS' tags and finally from the format.
+    Returns None if the value cannot be calculated.
 
-    Fetch the current video width/height from the file probe
+    :param stream_info:
+    :param probe_data:
+    :return:
+    """
+    width = int(stream_info.get('width', stream_info.get('coded_width', 0)) or 0)
+    height = int(stream_info.get('height', stream_info.get('coded_height', 0)) or 0)
+
+    # Parse the framerate fraction (eg. "24000/1001")
+    framerate = 0
+    for key in ['avg_frame_rate', 'r_frame_rate']:
+        value = str(stream_info.get(key, '0/0'))
+        numerator, _, denominator = value.partition('/')
+        try:
+            framerate = float(numerator) / float(denominator or 1)
+        except (ValueError, ZeroDivisionError):
+            framerate = 0
+        if framerate:
+            break
+
+    # Fetch the bitrate
+    tags = stream_info.get('tags', {})
+    bit_rate = stream_info.get('bit_rate', tags.get('BPS', tags.get('BPS-eng')))
+    if not bit_rate:
+        bit_rate = probe_data.get('format', {}).get('bit_rate')
+
+    try:
+        bit_rate = float(bit_rate)
+    except (TypeError, ValueError):
+        return None
+    if not width or not height or not framerate:
+        return None
 
+    return bit_rate / (width * height * framerate)
+
+
+def get_file_fingerprint(abspath, block_size=65536):
+    """
+    Generate a fast fingerprint of a file's contents.
+    Uses the file size and a hash of the first and last blocks of the file, so renamed files keep their fingerprint.
 
     :param abspath:
-    :param probe_data:
+    :param block_size:
     :return:
     """
-    logger = logging.getLogger("Unmanic.Plugin.video_transcoder")
+    file_size = os.path.getsize(abspath)
+    file_hash = hashlib.md5(str(file_size).encode('utf-8'))
+    with open(abspath, 'rb') as f:
+        file_hash.update(f.read(block_size))
+        if file_size > block_size:
+            f.seek(max(block_size, file_size - block_size))
+            file_hash.update(f.read(block_size))
+    return file_hash.hexdigest()
 
-    # Fetch the current video width/height from the file probe
-    vid_width, vid_height, video_stream_index = get_video_stream_data(probe_data.get('streams'))
 
-    # TODO: Detect video duration. Base the ss param off the duration of the video in the probe data
-    duration = 10
+class CropCache(object):
+    """
+    CropCache
+
+    Store the results of the black bar detection in the plugin profile directory keyed by a file fingerprint.
+    This ensures that cropdetect is only run once per file.
+    A failed detection is stored with the time that it failed and is retried once the failure TTL has passed.
+    """
+
+    # Number of seconds before a failed detection is retried
+    failure_ttl = 86400
+
+    def __init__(self, profile_directory):
+        self.db_file = os.path.join(profile_directory, 'crop_cache.db')
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS crop_cache "
+                         "(fingerprint TEXT PRIMARY KEY, crop_value TEXT, failed_at REAL)")
+
+    def get(self, fingerprint):
+        """
+        Returns a tuple of (found, crop_value) for the given fingerprint.
+        A failed detection is only found until the failure TTL has passed.
+
+        :param fingerprint:
+        :return:
+        """
+        with sqlite3.connect(self.db_file) as conn:
+            row = conn.execute("SELECT crop_value, failed_at FROM crop_cache WHERE fingerprint = ?",
+                               (fingerprint,)).fetchone()
+        if row is None:
+            return False, None
+        if row[1] is not None and time.time() - row[1] > self.failure_ttl:
+            return False, None
+        return True, (row[0] or None)
+
+    def set(self, fingerprint, crop_value, failed=False):
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute("INSERT OR REPLACE INTO crop_cache (fingerprint, crop_value, failed_at) VALUES (?, ?, ?)",
+                         (fingerprint, crop_value or '', time.time() if failed else None))
+
+
+def run_cropdetect_sample(abspath, start_time, frames):
+    """
+    Run FFmpeg cropdetect against a number of frames from the given start time.
+    Returns the last detected crop value or None.
+
+    :param abspath:
+    :param start_time:
+    :param frames:
+    :return:
+    """
+    logger = logging.getLogger("Unmanic.Plugin.video_transcoder")
 
     # Run a ffmpeg command to cropdetect
     mapper = StreamMapper(logger, ['video', 'audio', 'subtitle', 'data', 'attachment'])
     mapper.set_input_file(abspath)
-    mapper.set_ffmpeg_generic_options(**{"-ss": str(duration)})
-    mapper.set_ffmpeg_advanced_options(**{"-vframes": '10', '-vf': 'cropdetect'})
+    mapper.set_ffmpeg_generic_options(**{"-ss": str(int(start_time))})
+    mapper.set_ffmpeg_advanced_options('-an', '-sn', **{"-vframes": str(frames), '-vf': 'cropdetect'})
     mapper.set_output_null()
 
     # Build ffmpeg command for detecting black bars
@@ -159,15 +391,79 @@ def detect_plack_bars(abspath, probe_data):
     # Execute ffmpeg
     pipe = subprocess.Popen(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     out, err = pipe.communicate()
-    raw_results = out.decode("utf-8")
+    raw_results = out.decode("utf-8", errors='replace')
 
-    # Parse the output of the ffmpeg command -read the crop value, crop width and crop height into variables
-    crop_value = None
+    # Parse the output of the ffmpeg command - read the last crop value
     regex = re.compile(r'\[Parsed_cropdetect.*\].*crop=(\d+:\d+:\d+:\d+)')
     findall = re.findall(regex, raw_results)
     if findall:
-        crop_value = findall[-1]
+        return findall[-1]
+    return None
+
+
+def detect_plack_bars(abspath, probe_data, profile_directory=None, sample_points=5, frames=10):
+    """
+    Detect if black bars exist
+
+    Fetch the current video width/height from the file probe
+    Run cropdetect in parallel at a number of points spread across the duration of the video.
+    The most conservative crop (the largest area) of all sample points is used so that dark scenes do not over-crop.
+    If a profile directory is given, the result is cached against the file's fingerprint.
+
+    :param abspath:
+    :param probe_data:
+    :param profile_directory:
+    :param sample_points:
+    :param frames:
+    :return:
+    """
+    logger = logging.getLogger("Unmanic.Plugin.video_transcoder")
+
+    # Check for a cached result for this file
+    crop_cache = None
+    fingerprint = None
+    if profile_directory:
+        try:
+            crop_cache = CropCache(profile_directory)
+            fingerprint = get_file_fingerprint(abspath)
+            found, crop_value = crop_cache.get(fingerprint)
+            if found:
+                logger.debug("Using cached cropdetect result for file '{}'.".format(abspath))
+                return crop_value
+        except Exception as e:
+            logger.error("Unable to read cropdetect cache - {}".format(e))
+            crop_cache = None
+
+    # Fetch the current video width/height from the file probe
+    vid_width, vid_height, video_stream_index = get_video_stream_data(probe_data.get('streams'))
+
+    # Base the sample points off the duration of the video in the probe data
+    try:
+        duration = float(probe_data.get('format', {}).get('duration', 0))
+    except (TypeError, ValueError):
+        duration = 0
+    if duration > 0:
+        # Spread the samples evenly, skipping the start and end of the video (intros and credits)
+        sample_times = [(duration * (i + 1)) / (sample_points + 1) for i in range(sample_points)]
     else:
+        sample_times = [10]
+
+    # Run cropdetect at all sample points in parallel
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(sample_times)) as executor:
+        results = list(executor.map(lambda t: run_cropdetect_sample(abspath, t, frames), sample_times))
+
+    # Use the crop with the largest area
+    crop_value = None
+    crop_area = -1
+    for result in results:
+        if not result:
+            continue
+        result_width, result_height = result.split(':')[0:2]
+        if int(result_width) * int(result_height) > crop_area:
+            crop_value = result
+            crop_area = int(result_width) * int(result_height)
+    detection_failed = not crop_value
+    if detection_failed:
         logger.error("Unable to parse cropdetect from FFmpeg on file {}.".format(abspath))
 
     if crop_value:
@@ -179,6 +475,13 @@ def detect_plack_bars(abspath, probe_data):
             # Video is already cropped to the correct resolution
             logger.debug("File '{}' is already cropped to the resolution {}x{}.".format(abspath, crop_width,
                                                                                         crop_height))
-            return None
+            crop_value = None
+
+    # Cache the result for this file
+    if crop_cache is not None and fingerprint:
+        try:
+            crop_cache.set(fingerprint, crop_value, failed=detection_failed)
+        except Exception as e:
+            logger.error("Unable to write cropdetect cache - {}".format(e))
 
     return crop_value
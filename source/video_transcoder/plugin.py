@@ -33,6 +33,9 @@ TODO:
 
 import logging
 import os
+import threading
+from configparser import NoSectionError, NoOptionError
+from types import MappingProxyType
 
 from video_transcoder.lib import plugin_stream_mapper
 from video_transcoder.lib.ffmpeg import Parser, Probe
@@ -42,25 +45,106 @@ from video_transcoder.lib.encoders.qsv import QsvEncoder
 from video_transcoder.lib.encoders.vaapi import VaapiEncoder
 
 from unmanic.libs.unplugins.settings import PluginSettings
+from unmanic.libs.directoryinfo import UnmanicDirectoryInfo
 
 # Configure plugin logger
 logger = logging.getLogger("Unmanic.Plugin.video_transcoder")
 
 
 class Settings(PluginSettings):
+    """
+    The configured settings are read once per library and cached as an immutable snapshot.
+    The snapshot is invalidated when the settings file for that library changes on disk.
+    The form settings are only built when requested by the UI.
+    """
+
+    # Cached settings snapshots keyed by library ID
+    __snapshots = {}
+    __snapshots_lock = threading.Lock()
+    __profile_directory = None
 
     def __init__(self, *args, **kwargs):
         super(Settings, self).__init__(*args, **kwargs)
         self.settings = self.__build_settings_object()
-        self.encoders = {
-            "libx265":    LibxEncoder(self),
-            "libx264":    LibxEncoder(self),
-            "hevc_qsv":   QsvEncoder(self),
-            "h264_qsv":   QsvEncoder(self),
-            "hevc_vaapi": VaapiEncoder(self),
-        }
-        self.global_settings = GlobalSettings(self)
-        self.form_settings = self.__build_form_settings_object()
+        self.encoders = None
+        self.global_settings = None
+        self.form_settings = {}
+
+    def __get_profile_directory(self):
+        if Settings.__profile_directory is None:
+            Settings.__profile_directory = self.get_profile_directory()
+        return Settings.__profile_directory
+
+    def __settings_files_state(self):
+        """
+        Return the modification state of the settings files that this library's settings are read from
+
+        :return:
+        """
+        profile_directory = self.__get_profile_directory()
+        settings_files = [os.path.join(profile_directory, 'settings.json')]
+        if self.library_id:
+            settings_files.append(os.path.join(profile_directory, 'settings.{}.json'.format(self.library_id)))
+        state = []
+        for settings_file in settings_files:
+            try:
+                file_stat = os.stat(settings_file)
+                state.append((file_stat.st_mtime_ns, file_stat.st_size))
+            except OSError:
+                state.append(None)
+        return tuple(state)
+
+    def get_settings_snapshot(self):
+        """
+        Return an immutable snapshot of the configured settings for this library
+
+        :return:
+        """
+        state = self.__settings_files_state()
+        with Settings.__snapshots_lock:
+            cached = Settings.__snapshots.get(self.library_id)
+            if cached and cached[0] == state:
+                return cached[1]
+
+        # Read the settings from disk
+        snapshot = MappingProxyType(dict(super(Settings, self).get_setting()))
+
+        # The settings file may have been created by reading the settings. Fetch the state again
+        state = self.__settings_files_state()
+        with Settings.__snapshots_lock:
+            Settings.__snapshots[self.library_id] = (state, snapshot)
+        return snapshot
+
+    def get_setting(self, key=None):
+        snapshot = self.get_settings_snapshot()
+        if key is None:
+            # Unmanic deep copies and serialises the full settings, so return a mutable copy of the snapshot
+            return dict(snapshot)
+        return snapshot.get(key)
+
+    def set_setting(self, key, value):
+        result = super(Settings, self).set_setting(key, value)
+        with Settings.__snapshots_lock:
+            Settings.__snapshots.pop(self.library_id, None)
+        return result
+
+    def get_form_settings(self):
+        """
+        Build the form settings on first request
+
+        :return:
+        """
+        if not self.form_settings:
+            self.encoders = {
+                "libx265":    LibxEncoder(self),
+                "libx264":    LibxEncoder(self),
+                "hevc_qsv":   QsvEncoder(self),
+                "h264_qsv":   QsvEncoder(self),
+                "hevc_vaapi": VaapiEncoder(self),
+            }
+            self.global_settings = GlobalSettings(self)
+            self.form_settings = self.__build_form_settings_object()
+        return self.form_settings
 
     def __build_form_settings_object(self):
         """
@@ -127,6 +211,28 @@ class Settings(PluginSettings):
         }
 
 
+def file_previously_forced(path):
+    """
+    Check if this file has already been force transcoded by this plugin
+
+    :param path:
+    :return:
+    """
+    directory_info = UnmanicDirectoryInfo(os.path.dirname(path))
+
+    try:
+        previously_forced = directory_info.get('video_transcoder', os.path.basename(path))
+    except NoSectionError:
+        previously_forced = ''
+    except NoOptionError:
+        previously_forced = ''
+    except Exception as e:
+        logger.debug("Unknown exception {}.".format(e))
+        previously_forced = ''
+
+    return previously_forced == 'force_transcoded'
+
+
 def on_library_management_file_test(data):
     """
     Runner function - enables additional actions during the library management file tests.
@@ -169,6 +275,11 @@ def on_library_management_file_test(data):
     mapper = plugin_stream_mapper.PluginStreamMapper()
     mapper.set_default_values(settings, abspath, probe)
 
+    # Only force transcode a file once
+    if mapper.forced_encode and file_previously_forced(abspath):
+        logger.debug("File '{}' has previously been force transcoded.".format(abspath))
+        mapper.forced_encode = False
+
     # Check if this file needs to be processed
     if mapper.streams_need_processing():
         # Mark this file to be added to the pending tasks
@@ -244,3 +355,34 @@ def on_worker_process(data):
         data['command_progress_parser'] = parser.parse_progress
 
     return
+
+
+def on_postprocessor_task_results(data):
+    """
+    Runner function - provides a means for additional postprocessor functions based on the task success.
+
+    The 'data' object argument includes:
+        library_id                      - The library that the current task is associated with.
+        task_processing_success         - Boolean, did all task processes complete successfully.
+        file_move_processes_success     - Boolean, did all postprocessor movement tasks complete successfully.
+        destination_files               - List containing all file paths created by postprocessor file movements.
+        source_data                     - Dictionary containing data pertaining to the original source file.
+
+    :param data:
+    :return:
+
+    """
+    # We only care that the task completed successfully.
+    if not data.get('task_processing_success'):
+        return
+
+    # Get settings
+    settings = Settings(library_id=data.get('library_id'))
+
+    # Flag the destination files so that they are only force transcoded once
+    if settings.get_setting('force_transcode'):
+        for destination_file in data.get('destination_files', []):
+            directory_info = UnmanicDirectoryInfo(os.path.dirname(destination_file))
+            directory_info.set('video_transcoder', os.path.basename(destination_file), 'force_transcoded')
+            directory_info.save()
+            logger.debug("Force transcode info written for '{}'.".format(destination_file))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The plugins are imported by their directory name, as they are by Unmanic
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'source'))
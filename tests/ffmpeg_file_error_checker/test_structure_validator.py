@@ -0,0 +1,54 @@
+import struct
+
+from ffmpeg_file_error_checker.lib.structure_validator import validate_file_structure
+
+SAMPLE_COUNT = 100
+SAMPLE_SIZE = 1000
+
+
+def box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def full_box(box_type, payload):
+    return box(box_type, b'\0\0\0\0' + payload)
+
+
+def build_header(chunk_base):
+    # One track of 100 samples with one sample per chunk at 25 samples per second
+    stbl = box(b'stbl', (
+            full_box(b'stts', struct.pack('>III', 1, SAMPLE_COUNT, 1)) +
+            full_box(b'stsc', struct.pack('>IIII', 1, 1, 1, 1)) +
+            full_box(b'stsz', struct.pack('>II', 0, SAMPLE_COUNT) +
+                     struct.pack('>{}I'.format(SAMPLE_COUNT), *[SAMPLE_SIZE] * SAMPLE_COUNT)) +
+            full_box(b'stco', struct.pack('>I', SAMPLE_COUNT) +
+                     struct.pack('>{}I'.format(SAMPLE_COUNT),
+                                 *[chunk_base + i * SAMPLE_SIZE for i in range(SAMPLE_COUNT)]))
+    ))
+    mdhd = full_box(b'mdhd', struct.pack('>IIII', 0, 0, 25, SAMPLE_COUNT) + b'\0\0\0\0')
+    moov = box(b'moov', box(b'trak', box(b'mdia', mdhd + box(b'minf', stbl))))
+    return box(b'ftyp', b'isom\0\0\0\0isom') + moov
+
+
+def build_faststart_mp4():
+    header = build_header(0)
+    header = build_header(len(header) + 8)
+    mdat = struct.pack('>I4s', 8 + SAMPLE_COUNT * SAMPLE_SIZE, b'mdat') + b'\0' * (SAMPLE_COUNT * SAMPLE_SIZE)
+    return header + mdat, len(header) + 8
+
+
+def test_complete_mp4_has_no_issues(tmp_path):
+    data, media_start = build_faststart_mp4()
+    path = tmp_path / 'complete.mp4'
+    path.write_bytes(data)
+    assert validate_file_structure(str(path)) == []
+
+
+def test_truncated_mp4_reports_time_of_truncation(tmp_path):
+    data, media_start = build_faststart_mp4()
+    path = tmp_path / 'truncated.mp4'
+    # Cut the file part way through the 61st sample
+    path.write_bytes(data[:media_start + 60 * SAMPLE_SIZE + 500])
+    issues = validate_file_structure(str(path))
+    assert "extends past the end of the file" in issues[0]
+    assert issues[1].endswith("Track 1 data at 2.40s is past the end of the file")
@@ -0,0 +1,21 @@
+from video_transcoder.lib import tools
+from video_transcoder.lib.tools import CropCache
+
+
+def test_crop_values_are_cached(tmp_path):
+    crop_cache = CropCache(str(tmp_path))
+    crop_cache.set('cropped', '1920:800:0:140')
+    crop_cache.set('uncropped', None)
+    assert crop_cache.get('cropped') == (True, '1920:800:0:140')
+    assert crop_cache.get('uncropped') == (True, None)
+    assert crop_cache.get('unknown') == (False, None)
+
+
+def test_failed_detections_are_retried_after_the_ttl(tmp_path, monkeypatch):
+    crop_cache = CropCache(str(tmp_path))
+    monkeypatch.setattr(tools.time, 'time', lambda: 1000000.0)
+    crop_cache.set('failed', None, failed=True)
+    assert crop_cache.get('failed') == (True, None)
+    monkeypatch.setattr(tools.time, 'time', lambda: 1000000.0 + CropCache.failure_ttl + 1)
+    assert crop_cache.get('failed') == (False, None)
+
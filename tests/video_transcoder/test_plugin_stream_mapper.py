@@ -0,0 +1,105 @@
+import shutil
+
+import pytest
+
+from video_transcoder.lib.encoders import vaapi
+from video_transcoder.lib.global_settings import GlobalSettings
+from video_transcoder.lib.plugin_stream_mapper import PluginStreamMapper
+
+ENCODERS = [
+    ('hevc', 'libx265'),
+    ('h264', 'libx264'),
+    ('hevc', 'hevc_qsv'),
+    ('h264', 'h264_qsv'),
+    ('hevc', 'hevc_vaapi'),
+    ('h264', 'h264_vaapi'),
+]
+
+
+class FakeSettings(object):
+    def __init__(self, **settings):
+        self.settings = {}
+        for section in GlobalSettings.options().values():
+            self.settings.update(section)
+        self.settings['mode'] = 'standard'
+        self.settings.update(settings)
+
+    def get_setting(self, key):
+        return self.settings.get(key)
+
+
+class FakeProbe(object):
+    def __init__(self, probe):
+        self.probe = probe
+
+    def get_probe(self):
+        return self.probe
+
+
+def video_stream(codec_name, bit_rate):
+    return {
+        'codec_type':     'video',
+        'codec_name':     codec_name,
+        'width':          1920,
+        'height':         1080,
+        'avg_frame_rate': '25/1',
+        'bit_rate':       str(bit_rate),
+    }
+
+
+@pytest.fixture(autouse=True)
+def encoder_environment(monkeypatch):
+    # The stream decision does not run FFmpeg or use the VAAPI device, but the mapper checks that both exist
+    monkeypatch.setattr(shutil, 'which', lambda name: '/usr/bin/{}'.format(name))
+    monkeypatch.setattr(vaapi, 'list_available_vaapi_devices', lambda: [{'hwaccel_device': '/dev/dri/renderD128'}])
+
+
+def needs_processing(stream, **settings):
+    mapper = PluginStreamMapper()
+    mapper.set_default_values(FakeSettings(**settings), '/library/file.mkv', FakeProbe({'streams': [stream]}))
+    return mapper.test_stream_needs_processing(stream)
+
+
+@pytest.mark.parametrize('video_codec,video_encoder', ENCODERS)
+def test_stream_in_target_codec_is_copied(video_codec, video_encoder):
+    stream = video_stream(video_codec, 2000000)
+    assert not needs_processing(stream, video_codec=video_codec, video_encoder=video_encoder)
+
+
+@pytest.mark.parametrize('video_codec,video_encoder', ENCODERS)
+def test_stream_in_other_codec_is_encoded(video_codec, video_encoder):
+    stream = video_stream('mpeg4', 2000000)
+    assert needs_processing(stream, video_codec=video_codec, video_encoder=video_encoder)
+
+
+@pytest.mark.parametrize('video_codec,video_encoder', ENCODERS)
+def test_forced_encode(video_codec, video_encoder):
+    stream = video_stream(video_codec, 2000000)
+    assert needs_processing(stream, video_codec=video_codec, video_encoder=video_encoder, force_transcode=True)
+
+
+@pytest.mark.parametrize('video_codec,video_encoder', ENCODERS)
+@pytest.mark.parametrize('bit_rate,expected', [(2000000, False), (20000000, True)])
+def test_high_bitrate_stream_in_target_codec(video_codec, video_encoder, bit_rate, expected):
+    # 2 Mb/s at 1080p25 is 0.039 bits per pixel and 20 Mb/s is 0.386 bits per pixel
+    stream = video_stream(video_codec, bit_rate)
+    assert needs_processing(stream, video_codec=video_codec, video_encoder=video_encoder,
+                            reencode_high_bitrate_sources=True, max_bits_per_pixel=0.1) is expected
+
+
+@pytest.mark.parametrize('video_codec,video_encoder', ENCODERS)
+def test_custom_filters_are_applied_to_stream_in_target_codec(video_codec, video_encoder):
+    stream = video_stream(video_codec, 2000000)
+    assert needs_processing(stream, video_codec=video_codec, video_encoder=video_encoder,
+                            apply_custom_filters=True, custom_software_filters='hqdn3d\n')
+
+
+def test_advanced_mode_filters_are_applied_to_stream_in_target_codec():
+    stream = video_stream('hevc', 2000000)
+    assert needs_processing(stream, mode='advanced', custom_options='-preset slow\n-vf yadif\n')
+    assert not needs_processing(stream, mode='advanced', custom_options='-preset slow\n')
+
+
+def test_image_streams_are_copied():
+    stream = video_stream('mjpeg', 2000000)
+    assert not needs_processing(stream, force_transcode=True)
@@ -0,0 +1,33 @@
+import copy
+import json
+
+import pytest
+
+pytest.importorskip('unmanic')
+
+from video_transcoder.plugin import Settings
+
+
+@pytest.fixture(autouse=True)
+def profile_directory(monkeypatch, tmp_path):
+    # Keep the settings files out of the Unmanic userdata path and drop any snapshots of earlier tests
+    monkeypatch.setattr(Settings, 'get_profile_directory', lambda self: str(tmp_path))
+    monkeypatch.setattr(Settings, '_Settings__profile_directory', None)
+    monkeypatch.setattr(Settings, '_Settings__snapshots', {})
+    return tmp_path
+
+
+def test_all_settings_can_be_copied_and_serialised():
+    # Unmanic deep copies the full settings before rendering the settings form
+    settings = Settings().get_setting()
+    assert copy.deepcopy(settings) == settings
+    assert json.loads(json.dumps(settings)) == settings
+
+
+def test_all_settings_do_not_modify_the_cached_snapshot():
+    settings = Settings()
+    all_settings = settings.get_setting()
+    all_settings['mode'] = 'advanced'
+    assert settings.get_setting('mode') == 'basic'
+    with pytest.raises(TypeError):
+        settings.get_settings_snapshot()['mode'] = 'advanced'